@@ -4,11 +4,10 @@
 """
 
 from dash import Dash, dcc, html, Input, Output, State
-from finlab import login, data
+from finlab import login
 import os
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
-import pandas as pd
 
 # 載入環境變數
 load_dotenv()
@@ -19,27 +18,32 @@ login(FINLAB_TOKEN)
 
 # ========== 啟動時載入資料 ==========
 print("[INFO] 正在載入 Finlab 資料...")
-data.set_universe('TSE_OTC')
-data.truncate_start = (datetime.now() - timedelta(days=120)).strftime('%Y-%m-%d')
-
-# 載入並快取資料
-CACHED_DATA = {
-    'close': data.get('price:收盤價'),
-    'trade_value': data.get('price:成交金額'),
-    'revenue_yoy': data.get('monthly_revenue:去年同月增減(%)'),
-}
+from modules.data_fetcher import MARKET_DATASETS, fetch_datasets
+
+# 載入並快取資料 (各資料集並行下載，共用 universe 與起始日)
+tables = fetch_datasets(
+    MARKET_DATASETS,
+    start=datetime.now() - timedelta(days=120),
+    universe='TSE_OTC',
+    align=('close', 'trade_value'),
+)
 
 # 載入股票名稱
 from finlab.markets.tw import TWMarket
 market = TWMarket()
-CACHED_DATA['stock_names'] = market.get_asset_id_to_name()
+stock_names = market.get_asset_id_to_name()
 
 # 載入產業分類
 INDUSTRY_CSV = r'C:\Users\user\Documents\_12_BO_strategy\產業分類資料庫.csv'
-CACHED_DATA['industry_df'] = pd.read_csv(INDUSTRY_CSV)
-CACHED_DATA['industry_df']['代碼'] = CACHED_DATA['industry_df']['代碼'].astype(str)
+from modules.industry_registry import get_registry
+industry = get_registry(INDUSTRY_CSV)
+
+# 建立版本化快照；頁面 callback 透過 get_cached_data() 取得目前快照
+from modules.data_refresher import CacheRefresher, build_snapshot
+CACHED_DATA = build_snapshot(tables, stock_names, industry)
+REFRESHER = CacheRefresher(CACHED_DATA)
 
-print(f"[DONE] 資料載入完成！最新交易日: {CACHED_DATA['close'].index[-1].strftime('%Y-%m-%d')}")
+print(f"[DONE] 資料載入完成！最新交易日: {CACHED_DATA['data_date'].strftime('%Y-%m-%d')} (版本 {CACHED_DATA['version']})")
 
 # 載入樣式
 from layouts.styles import COLORS, MAIN_STYLES, SIDEBAR_STYLES
@@ -52,6 +56,10 @@ app = Dash(
 )
 app.title = "台股戰情室 - 選股評分系統"
 
+# callback 延遲 / 回應大小 / 錯誤次數 (Prometheus 格式)
+from modules.telemetry import register_metrics_endpoint
+register_metrics_endpoint(app.server)
+
 # 導入 layouts
 from layouts.sidebar import create_sidebar
 from layouts.selection_page import create_selection_page
@@ -240,6 +248,12 @@ if __name__ == '__main__':
     print("="*50)
     print(f"\n  本機連線: http://127.0.0.1:8050/")
     print(f"  內網連線: http://192.168.x.x:8050/")
+    print(f"  效能指標: http://127.0.0.1:8050/metrics")
     print("\n" + "="*50 + "\n")
 
-    app.run(debug=True, host='0.0.0.0', port=8050)
+    # debug 模式下 reloader 會另開子行程，只在實際服務的行程啟動排程
+    DEBUG = True
+    if not DEBUG or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        REFRESHER.start()
+
+    app.run(debug=DEBUG, host='0.0.0.0', port=8050)
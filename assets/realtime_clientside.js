@@ -0,0 +1,139 @@
+// 即時戰情室 - clientside callbacks
+// 推播模式：伺服器以 SSE 推送快照差異，瀏覽器端合併後直接更新走勢圖
+// 長條圖 / 圓餅圖：由伺服器發布的最新漲跌幅向量 (latest-row-store) 在瀏覽器端繪製
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    realtime: {
+        // 將 SSE 差異合併進 live-snapshot ({v, t, rows: {代碼: [價格, 成交量]}})
+        apply_push: function(message, current) {
+            if (!message) {
+                return window.dash_clientside.no_update;
+            }
+            const diff = JSON.parse(message);
+            const rows = (diff.full || !current) ? {} : Object.assign({}, current.rows);
+            Object.assign(rows, diff.rows);
+            return {v: diff.v, t: diff.t || (current && current.t), rows: rows};
+        },
+
+        // 以最新價格更新走勢圖各線的最後一點 (新的一分鐘則延伸一點)
+        patch_main_graph: function(snapshot, figure) {
+            const no_update = window.dash_clientside.no_update;
+            if (!snapshot || !snapshot.t || !figure || !figure.data) {
+                return no_update;
+            }
+            const t = snapshot.t;
+            const rows = snapshot.rows;
+            const pct = function(symbol, ref) {
+                const row = rows[symbol];
+                return (row && ref) ? (row[0] - ref) / ref * 100 : null;
+            };
+            const average = function(refs) {
+                let sum = 0, count = 0;
+                Object.keys(refs).forEach(function(symbol) {
+                    const value = pct(symbol, refs[symbol]);
+                    if (value !== null) { sum += value; count += 1; }
+                });
+                return count ? sum / count : null;
+            };
+
+            let changed = false;
+            const data = figure.data.map(function(trace) {
+                const meta = trace.meta;
+                if (!meta || !meta.kind || !Array.isArray(trace.x)) {
+                    return trace;
+                }
+                const isAvg = meta.kind === 'avg_line' || meta.kind === 'avg_marker';
+                const value = isAvg ? average(meta.refs) : pct(meta.symbol, meta.ref);
+                if (value === null) {
+                    return trace;
+                }
+                changed = true;
+                if (meta.kind === 'marker' || meta.kind === 'avg_marker') {
+                    return Object.assign({}, trace, {x: [t], y: [value]});
+                }
+                if (!Array.isArray(trace.y)) {
+                    return trace;
+                }
+                const x = trace.x.slice();
+                const y = trace.y.slice();
+                if (x.length && x[x.length - 1] === t) {
+                    y[y.length - 1] = value;
+                } else {
+                    x.push(t);
+                    y.push(value);
+                }
+                return Object.assign({}, trace, {x: x, y: y});
+            });
+            return changed ? Object.assign({}, figure, {data: data}) : no_update;
+        },
+
+        // 以最新漲跌幅向量繪製排行長條圖與漲跌家數圓餅圖
+        // row: {symbols, labels, refs, pct}；live: 推播模式的 live-snapshot (可省略)
+        render_breadth: function(row, live) {
+            const empty = {
+                data: [],
+                layout: {title: {text: 'Waiting for data...'}, xaxis: {visible: false}, yaxis: {visible: false}}
+            };
+            if (!row || !row.symbols || !row.symbols.length) {
+                return [empty, empty];
+            }
+
+            const items = [];
+            row.symbols.forEach(function(symbol, i) {
+                let value = row.pct[i];
+                const liveRow = live && live.rows && live.rows[symbol];
+                if (liveRow && row.refs[i]) {
+                    value = (liveRow[0] - row.refs[i]) / row.refs[i] * 100;
+                }
+                if (value !== null && value !== undefined && !isNaN(value)) {
+                    const ratio = row.vol_ratio ? row.vol_ratio[i] : null;
+                    const spike = row.spike ? row.spike[i] : false;
+                    items.push({label: row.labels[i], value: value, ratio: ratio, spike: spike});
+                }
+            });
+
+            let up = 0, down = 0, flat = 0;
+            items.forEach(function(item) {
+                if (item.value > 0) { up += 1; } else if (item.value < 0) { down += 1; } else { flat += 1; }
+            });
+
+            const grid = {gridcolor: '#EBF0F8', zerolinecolor: '#444', linecolor: '#EBF0F8'};
+            const pie = {
+                data: [{
+                    type: 'pie', labels: ['Up', 'Down', 'Flat'], values: [up, down, flat],
+                    hole: 0.5, marker: {colors: ['#d62728', '#2ca02c', 'gray']},
+                    textinfo: 'label+value', hoverinfo: 'label+percent'
+                }],
+                layout: {
+                    title: {text: 'Market Breadth'}, margin: {l: 10, r: 10, t: 40, b: 10},
+                    showlegend: false, uirevision: 'constant'
+                }
+            };
+
+            items.sort(function(a, b) { return a.value - b.value; });
+            const bar = {
+                data: [{
+                    type: 'bar', orientation: 'h',
+                    x: items.map(function(item) { return item.value; }),
+                    y: items.map(function(item) { return item.label; }),
+                    marker: {color: items.map(function(item) { return item.value > 0 ? '#d62728' : '#2ca02c'; })},
+                    text: items.map(function(item) {
+                        // 爆量 (量比達門檻) 顯示量比
+                        return item.value.toFixed(2) + '%' + (item.spike ? ' 🔥' + item.ratio.toFixed(1) + 'x' : '');
+                    }),
+                    customdata: items.map(function(item) { return item.ratio === null ? '-' : item.ratio.toFixed(2); }),
+                    hovertemplate: '%{y}: %{x:.2f}%<br>量比: %{customdata}<extra></extra>',
+                    textposition: 'auto'
+                }],
+                layout: {
+                    title: {text: 'Rankings'},
+                    margin: {l: 100, r: 40, t: 40, b: 20},
+                    xaxis: Object.assign({range: [-10, 10], zeroline: true, side: 'top'}, grid),
+                    yaxis: Object.assign({type: 'category', dtick: 1}, grid),
+                    plot_bgcolor: 'white', paper_bgcolor: 'white', uirevision: 'constant',
+                    height: Math.max(300, 80 + items.length * 30), autosize: false
+                }
+            };
+            return [bar, pie];
+        }
+    }
+});
@@ -0,0 +1,3 @@
+"""
+效能基準測試 - 以合成的 TSE_OTC 規模資料量測評分流程
+"""
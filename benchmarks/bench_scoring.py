@@ -0,0 +1,251 @@
+"""
+評分流程效能基準測試 - 以 TSE_OTC 規模的合成資料量測各階段耗時與峰值記憶體
+用法: python -m benchmarks.bench_scoring [--save-baseline] [--tolerance 0.2] [--repeat 3]
+範例: python -m benchmarks.bench_scoring --only precompute_all_scores
+
+量測項目:
+    get_score               score_calculator.get_score (單日即時評分)
+    precompute_all_scores   precompute_scores.precompute_all_scores (60 天批次預計算)
+    calculate_ranking       layouts.ranking_page.calculate_ranking (排行榜 callback)
+    process_dataframes      modules.realtime_store.DataStore.process_dataframes (戰情室快照)
+
+Finlab 的 data.get / login 會被替換成合成資料，不需要網路與 token。
+結果與 benchmarks/baselines.json 比較，超過容忍度即標示為退化並以 exit code 1 結束。
+"""
+
+import argparse
+import contextlib
+import gc
+import io
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from unittest import mock
+
+import pandas as pd
+
+from benchmarks.synthetic import (
+    N_STOCKS, N_DAYS, N_INDUSTRY_ROWS,
+    make_market_data, make_industry_df, make_stock_codes, make_ticks,
+)
+
+BASELINE_PATH = Path(__file__).parent / 'baselines.json'
+DEFAULT_TOLERANCE = 0.2
+
+FINLAB_DATASETS = {
+    'price:收盤價': 'close',
+    'price:成交金額': 'trade_value',
+    'price:成交股數': 'volume',
+    'monthly_revenue:去年同月增減(%)': 'revenue_yoy',
+}
+
+
+def measure(fn, repeat: int = 3) -> dict:
+    """
+    量測函數的耗時與峰值記憶體
+
+    耗時取 repeat 次中的最小值；峰值記憶體另外以 tracemalloc 跑一次
+    (避免 tracemalloc 的額外開銷影響耗時)。
+
+    Returns:
+        dict: {'wall_time_s', 'peak_mem_mb'}
+    """
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'wall_time_s': round(min(timings), 4),
+        'peak_mem_mb': round(peak / 1024 / 1024, 1),
+    }
+
+
+class SyntheticFinlab:
+    """以合成資料取代 finlab.data.get，並遵守 data.truncate_start"""
+
+    def __init__(self, market: dict):
+        self.market = market
+
+    def get(self, dataset: str):
+        from finlab import data
+        df = self.market[FINLAB_DATASETS[dataset]]
+        if data.truncate_start:
+            df = df[df.index >= pd.Timestamp(data.truncate_start)]
+        return df.copy()
+
+
+def build_fixtures(n_stocks: int, n_days: int, workdir: Path) -> dict:
+    """建立所有量測共用的合成資料"""
+    market = make_market_data(n_stocks, n_days)
+    codes = make_stock_codes(n_stocks)
+    industry_df = make_industry_df(codes, n_rows=max(N_INDUSTRY_ROWS * n_stocks // N_STOCKS, n_stocks))
+    industry_csv = workdir / 'industry.csv'
+    industry_df.to_csv(industry_csv, index=False)
+
+    return {
+        'market': market,
+        'codes': codes,
+        'industry_df': industry_df,
+        'industry_csv': str(industry_csv),
+        'workdir': workdir,
+    }
+
+
+def bench_get_score(fx: dict, repeat: int) -> dict:
+    import score_calculator
+    with mock.patch.object(score_calculator, 'INDUSTRY_CSV', fx['industry_csv']):
+        return measure(lambda: score_calculator.get_score(), repeat)
+
+
+def bench_precompute_all_scores(fx: dict, repeat: int) -> dict:
+    import precompute_scores
+    with mock.patch.object(precompute_scores, 'INDUSTRY_CSV', fx['industry_csv']), \
+            mock.patch.object(precompute_scores, 'OUTPUT_DIR', fx['workdir']):
+        return measure(lambda: precompute_scores.precompute_all_scores(60), repeat)
+
+
+def bench_calculate_ranking(fx: dict, repeat: int) -> dict:
+    from modules.data_refresher import build_snapshot
+    from layouts import ranking_page
+
+    # 與 app.py 相同：只保留最近 120 天
+    start = pd.Timestamp.today().normalize() - pd.Timedelta(days=120)
+    tables = {
+        name: fx['market'][name][fx['market'][name].index >= start]
+        for name in ('close', 'trade_value', 'revenue_yoy')
+    }
+    names = {code: code for code in fx['codes']}
+    snapshot = build_snapshot(tables, names, fx['industry_df'])
+    target_date = tables['close'].index[-1].strftime('%Y-%m-%d')
+
+    with mock.patch.object(ranking_page, 'get_cached_data', return_value=snapshot):
+        return measure(lambda: ranking_page.calculate_ranking(1, target_date), repeat)
+
+
+def bench_process_dataframes(fx: dict, repeat: int) -> dict:
+    from modules.realtime_store import DataStore
+
+    industry_df = fx['industry_df']
+    stock_categories = industry_df.groupby('代碼')['細產業別'].agg(list).to_dict()
+    yesterday_close = fx['market']['close'].iloc[-1]
+
+    store = DataStore(stock_categories, yesterday_close)
+    for symbol, time_str, price, volume in make_ticks(fx['codes'], ticks_per_minute=1):
+        store.update_raw(symbol, time_str, price, volume)
+
+    return measure(store.process_dataframes, repeat)
+
+
+BENCHMARKS = {
+    'get_score': bench_get_score,
+    'precompute_all_scores': bench_precompute_all_scores,
+    'calculate_ranking': bench_calculate_ranking,
+    'process_dataframes': bench_process_dataframes,
+}
+
+
+def compare_with_baseline(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    與基準值比較
+
+    Returns:
+        list: 退化項目說明
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        for metric in ('wall_time_s', 'peak_mem_mb'):
+            if base.get(metric) and result[metric] > base[metric] * (1 + tolerance):
+                ratio = result[metric] / base[metric]
+                regressions.append(f"{name}.{metric}: {base[metric]} -> {result[metric]} ({ratio:.2f}x)")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='評分流程效能基準測試')
+    parser.add_argument('--stocks', type=int, default=N_STOCKS, help='合成股票數')
+    parser.add_argument('--days', type=int, default=N_DAYS, help='合成交易日數')
+    parser.add_argument('--repeat', type=int, default=3, help='每項重複次數 (取最小耗時)')
+    parser.add_argument('--only', nargs='*', choices=list(BENCHMARKS), help='只執行指定項目')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help='退化容忍度 (0.2 = 20%%)')
+    parser.add_argument('--save-baseline', action='store_true', help='將本次結果存為基準值')
+    parser.add_argument('--output', type=str, help='結果 JSON 輸出路徑')
+    args = parser.parse_args(argv)
+
+    print(f"\n{'='*60}")
+    print(f"  評分流程效能基準 - {args.stocks} 檔 x {args.days} 天")
+    print(f"{'='*60}\n")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fx = build_fixtures(args.stocks, args.days, Path(tmp))
+        finlab_stub = SyntheticFinlab(fx['market'])
+
+        results = {}
+        with mock.patch('finlab.login'), mock.patch('finlab.data.get', side_effect=finlab_stub.get):
+            for name, bench in BENCHMARKS.items():
+                if args.only and name not in args.only:
+                    continue
+                # 被量測的程式會大量 print，量測期間先收起來
+                with contextlib.redirect_stdout(io.StringIO()):
+                    results[name] = bench(fx, args.repeat)
+                print(f"[BENCH] {name:<24} {results[name]['wall_time_s']:>8.3f} s"
+                      f" {results[name]['peak_mem_mb']:>8.1f} MB")
+
+    meta = {'stocks': args.stocks, 'days': args.days, 'python': sys.version.split()[0],
+            'pandas': pd.__version__}
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'meta': meta, 'results': results}, f, ensure_ascii=False, indent=2)
+
+    baseline = {}
+    if BASELINE_PATH.exists():
+        with open(BASELINE_PATH, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    if args.save_baseline:
+        baseline.update(results)
+        baseline['meta'] = meta
+        with open(BASELINE_PATH, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, ensure_ascii=False, indent=2)
+        print(f"\n[SAVE] 基準值已更新: {BASELINE_PATH}")
+        return 0
+
+    if not baseline:
+        print("\n[INFO] 尚無基準值，可使用 --save-baseline 建立")
+        return 0
+
+    base_meta = baseline.get('meta', {})
+    if (base_meta.get('stocks'), base_meta.get('days')) != (args.stocks, args.days):
+        print(f"\n[WARN] 基準值規模不同 ({base_meta.get('stocks')} 檔 x {base_meta.get('days')} 天)，不進行比較")
+        return 0
+
+    regressions = compare_with_baseline(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\n[REGRESSION] 超過基準 {args.tolerance:.0%}:")
+        for line in regressions:
+            print(f"   - {line}")
+        return 1
+
+    print(f"\n[DONE] 全部項目在基準 {args.tolerance:.0%} 以內")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
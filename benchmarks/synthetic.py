@@ -0,0 +1,103 @@
+"""
+合成資料產生器 - 產生與正式環境 (TSE_OTC) 相同規模的價格、營收、產業與 tick 資料
+"""
+
+import numpy as np
+import pandas as pd
+
+# 正式環境規模
+N_STOCKS = 2000
+N_DAYS = 500
+N_INDUSTRY_ROWS = 2100
+N_SECTORS = 180
+
+
+def make_stock_codes(n_stocks: int = N_STOCKS) -> list:
+    """產生股票代碼 ('1101', '1102', ...)"""
+    return [str(1101 + i) for i in range(n_stocks)]
+
+
+def make_market_data(n_stocks: int = N_STOCKS, n_days: int = N_DAYS, seed: int = 0) -> dict:
+    """
+    產生全市場日資料 (以今天為最後一個交易日)
+
+    Args:
+        n_stocks: 股票數
+        n_days: 交易日數
+        seed: 亂數種子
+
+    Returns:
+        dict: {'close', 'trade_value', 'volume', 'revenue_yoy'} DataFrame
+    """
+    rng = np.random.default_rng(seed)
+    codes = make_stock_codes(n_stocks)
+    dates = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=n_days, name='date')
+
+    # 對數常態隨機漫步股價，部分股票有缺值 (上市較晚)
+    log_returns = rng.normal(0.0003, 0.02, size=(n_days, n_stocks))
+    start_price = rng.uniform(10, 600, size=n_stocks)
+    close = pd.DataFrame(start_price * np.exp(np.cumsum(log_returns, axis=0)), index=dates, columns=codes)
+    late_listed = rng.choice(n_stocks, size=n_stocks // 50, replace=False)
+    for col in late_listed:
+        close.iloc[:rng.integers(1, n_days // 2), col] = np.nan
+
+    volume = pd.DataFrame(rng.lognormal(7, 1.5, size=(n_days, n_stocks)), index=dates, columns=codes)
+    trade_value = volume * close * 1000
+
+    # 月營收：每月 10 日公告一筆
+    months = pd.date_range(end=dates[-1], periods=max(1, n_days // 21), freq='MS') + pd.Timedelta(days=9)
+    revenue_yoy = pd.DataFrame(rng.normal(10, 30, size=(len(months), n_stocks)), index=months, columns=codes)
+
+    return {
+        'close': close,
+        'trade_value': trade_value,
+        'volume': volume,
+        'revenue_yoy': revenue_yoy,
+    }
+
+
+def make_industry_df(codes: list, n_rows: int = N_INDUSTRY_ROWS, n_sectors: int = N_SECTORS,
+                     seed: int = 0) -> pd.DataFrame:
+    """
+    產生產業分類資料 (欄位與 產業分類資料庫.csv 相同)
+
+    每檔股票至少屬於一個族群，多出的列讓部分股票同時屬於多個族群。
+    """
+    rng = np.random.default_rng(seed)
+    sectors = [f'族群{i:03d}' for i in range(n_sectors)]
+
+    stock_col = list(codes) + list(rng.choice(codes, size=max(0, n_rows - len(codes))))
+    sector_col = rng.choice(sectors, size=len(stock_col))
+
+    df = pd.DataFrame({'細產業別': sector_col, '代碼': stock_col, '商品': stock_col})
+    return df.drop_duplicates(['細產業別', '代碼']).reset_index(drop=True)
+
+
+def make_ticks(codes: list, minutes: int = 270, ticks_per_minute: int = 3, seed: int = 0):
+    """
+    產生盤中 tick (symbol, 'HH:MM', price, volume)，依時間排序
+
+    Args:
+        codes: 股票代碼
+        minutes: 盤中分鐘數 (09:00 起算)
+        ticks_per_minute: 每檔每分鐘的 tick 數
+    """
+    rng = np.random.default_rng(seed)
+    prices = rng.uniform(10, 600, size=len(codes))
+    for m in range(minutes):
+        time_str = f"{9 + m // 60:02d}:{m % 60:02d}"
+        for _ in range(ticks_per_minute):
+            prices *= np.exp(rng.normal(0, 0.002, size=len(codes)))
+            for code, price in zip(codes, prices):
+                yield code, time_str, float(price), 1
+
+
+__all__ = [
+    'N_STOCKS',
+    'N_DAYS',
+    'N_INDUSTRY_ROWS',
+    'make_stock_codes',
+    'make_market_data',
+    'make_industry_df',
+    'make_ticks',
+]
@@ -3,22 +3,28 @@
 顯示每個交易日分數前50名
 """
 
+import os
+
 from dash import html, dcc, dash_table, Input, Output, State, callback
 import pandas as pd
 import numpy as np
 
+from modules.data_refresher import get_cached_data
+from modules.score_history import SCORE_HISTORY_FILE, SPARKLINE_DAYS, load_score_history
+from modules.score_events import SCORE_EVENTS_DIR, ScoreEventLog, component_names
+from modules.telemetry import instrument_callback
 from .styles import (
     COLORS, MAIN_STYLES, CARD_STYLES, TABLE_STYLES,
     BUTTON_STYLES, BADGE_STYLES, get_score_badge_style
 )
 
-
-def calculate_macd(close_series, fast=12, slow=26, signal=9):
-    """計算 MACD"""
-    ema_fast = close_series.ewm(span=fast, adjust=False).mean()
-    ema_slow = close_series.ewm(span=slow, adjust=False).mean()
-    macd_line = ema_fast - ema_slow
-    return macd_line
+# precompute_scores.py 產生的評分歷史索引 (供走勢欄使用，不存在時該欄留白)
+SCORE_HISTORY_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', SCORE_HISTORY_FILE)
+TREND_COLUMN = f'近{SPARKLINE_DAYS}日'
+SCORE_EVENTS_PATH = os.path.join(os.path.dirname(SCORE_HISTORY_PATH), SCORE_EVENTS_DIR)
+# 本週新進：最近 5 個交易日上穿 70 分
+ENTRANT_LEVEL = 70
+ENTRANT_DAYS = 5
 
 
 def create_stat_card(value, label, color):
@@ -32,6 +38,39 @@ def create_stat_card(value, label, color):
     ], style=CARD_STYLES['stat'])
 
 
+def create_entrants_card(entrants: pd.DataFrame, stock_names: dict):
+    """
+    建立本週新進卡片
+
+    Args:
+        entrants: ScoreEventLog.entrants 的結果
+        stock_names: 股票代碼 -> 名稱
+
+    Returns:
+        html.Div: 無事件時返回 None
+    """
+    if entrants is None or entrants.empty:
+        return None
+
+    # 同一檔在期間內多次上穿只顯示最近一次
+    latest = entrants.sort_values('date').drop_duplicates('code', keep='last')
+    badges = []
+    for row in latest.sort_values('date', ascending=False).itertuples():
+        gained = ' / '.join(component_names(row.gained))
+        badges.append(html.Span(
+            f"{row.code} {stock_names.get(row.code, row.code)}",
+            title=f"{row.date.strftime('%Y-%m-%d')} {max(row.old_score, 0)} → {row.new_score}" + (f"，新增 {gained}" if gained else ''),
+            style={**get_score_badge_style(row.new_score), 'margin': '0 8px 8px 0'},
+        ))
+    return html.Div([
+        html.Div([
+            html.Span('🆕', style={'fontSize': '18px'}),
+            f'本週新進 {ENTRANT_LEVEL} 分 ({len(latest)} 檔)',
+        ], style=CARD_STYLES['title']),
+        html.Div(badges, style={'display': 'flex', 'flexWrap': 'wrap'}),
+    ], style=CARD_STYLES['base'])
+
+
 def create_ranking_page() -> html.Div:
     """
     建立每日排行榜頁面
@@ -95,6 +134,9 @@ def create_ranking_page() -> html.Div:
         # 狀態訊息
         html.Div(id='ranking-status', style={'marginBottom': '16px'}),
 
+        # 本週新進 (評分事件表)
+        html.Div(id='ranking-new-entrants'),
+
         # 排行榜表格卡片
         html.Div([
             html.Div([
@@ -115,8 +157,7 @@ def create_ranking_page() -> html.Div:
 )
 def init_date_picker(_):
     """初始化日期選擇器"""
-    import app
-    close = app.CACHED_DATA['close']
+    close = get_cached_data()['close']
 
     min_date = close.index[60].strftime('%Y-%m-%d')
     max_date = close.index[-1].strftime('%Y-%m-%d')
@@ -128,23 +169,27 @@ def init_date_picker(_):
 @callback(
     [Output('ranking-table-container', 'children'),
      Output('ranking-status', 'children'),
-     Output('ranking-stat-cards', 'children')],
+     Output('ranking-stat-cards', 'children'),
+     Output('ranking-new-entrants', 'children')],
     Input('ranking-calculate-btn', 'n_clicks'),
     State('ranking-date-picker', 'date'),
     prevent_initial_call=True
 )
+@instrument_callback()
 def calculate_ranking(n_clicks, selected_date):
     """計算指定日期的排行榜"""
     if not selected_date:
-        return None, html.Div("請選擇日期", style={'color': COLORS['orange']}), []
+        return None, html.Div("請選擇日期", style={'color': COLORS['orange']}), [], None
 
     try:
-        import app
-        close = app.CACHED_DATA['close']
-        trade_value = app.CACHED_DATA['trade_value']
-        revenue_yoy = app.CACHED_DATA['revenue_yoy']
-        all_stock_names = app.CACHED_DATA['stock_names']
-        industry_df = app.CACHED_DATA['industry_df']
+        # 整個 callback 使用同一份快照，背景刷新不影響本次計算
+        cached_data = get_cached_data()
+        close = cached_data['close']
+        trade_value = cached_data['trade_value']
+        revenue_yoy = cached_data['revenue_yoy']
+        all_stock_names = cached_data['stock_names']
+        industry = cached_data['industry']
+        indicators = cached_data['indicators']
 
         target_date = pd.to_datetime(selected_date)
         if target_date not in close.index:
@@ -153,7 +198,7 @@ def calculate_ranking(n_clicks, selected_date):
                 return None, html.Div(
                     f"找不到 {selected_date} 或之前的資料",
                     style={'color': COLORS['up']}
-                ), []
+                ), [], None
             target_date = available_dates[-1]
 
         target_idx = close.index.get_loc(target_date)
@@ -163,27 +208,19 @@ def calculate_ranking(n_clicks, selected_date):
         avg_trade_value = trade_value.iloc[target_idx - lookback + 1:target_idx + 1].mean()
         valid_stocks = avg_trade_value[avg_trade_value >= 3e8].index.tolist()
 
-        # 計算均線
-        ma10 = close.rolling(10).mean()
-        ma20 = close.rolling(20).mean()
-        ma60 = close.rolling(60).mean()
+        # 均線 (快照已預先計算)
+        ma10 = indicators['ma10']
+        ma20 = indicators['ma20']
+        ma60 = indicators['ma60']
 
         ma_bullish = (ma10.iloc[target_idx] > ma20.iloc[target_idx]) & \
                      (ma20.iloc[target_idx] > ma60.iloc[target_idx])
 
-        # 計算 MACD
-        macd_scores = {}
-        for stock in valid_stocks:
-            if stock not in close.columns:
-                continue
-            try:
-                macd_line = calculate_macd(close[stock])
-                macd_today = macd_line.iloc[target_idx]
-                macd_yesterday = macd_line.iloc[target_idx - 1]
-                macd_scores[stock] = (macd_today > 0 and macd_today > macd_yesterday)
-            except:
-                macd_scores[stock] = False
-        macd_bullish = pd.Series(macd_scores)
+        # MACD > 0 且向上彎 (快照已預先計算)
+        macd_line = indicators['macd']
+        macd_today = macd_line.iloc[target_idx]
+        macd_yesterday = macd_line.iloc[target_idx - 1]
+        macd_bullish = (macd_today > 0) & (macd_today > macd_yesterday)
 
         # 營收 YoY > 20%
         revenue_latest = revenue_yoy.iloc[:target_idx+1].ffill().iloc[-1]
@@ -195,11 +232,7 @@ def calculate_ranking(n_clicks, selected_date):
 
         sector_returns = {}
         sector_stocks = {}
-        for sector in industry_df['細產業別'].unique():
-            stocks_in_sector = industry_df[industry_df['細產業別'] == sector]['代碼'].tolist()
-            stocks_in_sector = [s for s in stocks_in_sector if s in close.columns]
-            if len(stocks_in_sector) < 2:
-                continue
+        for sector, stocks_in_sector in industry.sector_stocks(universe=close.columns, min_size=2).items():
             avg_price_today = close_today[stocks_in_sector].mean()
             avg_price_10d = close_10d_ago[stocks_in_sector].mean()
             if pd.notna(avg_price_today) and pd.notna(avg_price_10d) and avg_price_10d > 0:
@@ -250,8 +283,9 @@ def calculate_ranking(n_clicks, selected_date):
                 details.append("成交熱絡")
 
             if score > 0:
-                price = round(close_today.get(stock, 0), 2)
-                amount = round(trade_value.iloc[target_idx].get(stock, 0) / 1e8, 2)
+                # 快照為 float32，先轉回 Python float 再四捨五入，避免顯示 123.4499969 之類的尾數
+                price = round(float(close_today.get(stock, 0)), 2)
+                amount = round(float(trade_value.iloc[target_idx].get(stock, 0)) / 1e8, 2)
 
                 results.append({
                     '排名': 0,
@@ -268,6 +302,12 @@ def calculate_ranking(n_clicks, selected_date):
         df_result = df_result.sort_values('總分', ascending=False).head(50).reset_index(drop=True)
         df_result['排名'] = range(1, len(df_result) + 1)
 
+        # 近 N 日總分走勢 (每檔只讀取自己的歷史列)
+        history = load_score_history(SCORE_HISTORY_PATH)
+        trend = [history.sparkline(code, end=target_date) if history is not None else ''
+                 for code in df_result['代碼']]
+        df_result.insert(df_result.columns.get_loc('總分') + 1, TREND_COLUMN, trend)
+
         # 現代化表格樣式
         table = dash_table.DataTable(
             id='ranking-table',
@@ -304,6 +344,8 @@ def calculate_ranking(n_clicks, selected_date):
                 {'if': {'column_id': '代碼'}, 'width': '80px', 'fontWeight': '600'},
                 {'if': {'column_id': '名稱'}, 'width': '100px'},
                 {'if': {'column_id': '總分'}, 'width': '80px', 'textAlign': 'center'},
+                {'if': {'column_id': TREND_COLUMN}, 'width': '170px', 'fontFamily': 'monospace',
+                 'letterSpacing': '1px', 'color': COLORS['accent']},
                 {'if': {'column_id': '收盤價'}, 'width': '100px', 'textAlign': 'right'},
                 {'if': {'column_id': '成交金額(億)'}, 'width': '110px', 'textAlign': 'right'},
                 {'if': {'column_id': '評分說明'}, 'color': COLORS['text_secondary'], 'fontSize': '13px'},
@@ -366,7 +408,12 @@ def calculate_ranking(n_clicks, selected_date):
             ),
         ])
 
-        return table, status, stat_cards
+        # 最近 5 個交易日的上穿事件 (只讀事件表對應日期的分段)
+        week_start = close.index[max(0, target_idx - ENTRANT_DAYS + 1)]
+        entrants = ScoreEventLog(SCORE_EVENTS_PATH).entrants(ENTRANT_LEVEL, week_start, target_date)
+        entrants_card = create_entrants_card(entrants, all_stock_names)
+
+        return table, status, stat_cards, entrants_card
 
     except Exception as e:
         import traceback
@@ -374,7 +421,7 @@ def calculate_ranking(n_clicks, selected_date):
         return None, html.Div(
             f"計算失敗: {str(e)}",
             style={'color': COLORS['up']}
-        ), []
+        ), [], None
 
 
 __all__ = ['create_ranking_page']
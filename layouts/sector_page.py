@@ -8,6 +8,8 @@ import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
 
+from modules.data_refresher import get_cached_data
+from modules.telemetry import instrument_callback
 from .styles import COLORS, MAIN_STYLES, CARD_STYLES, BUTTON_STYLES
 
 
@@ -168,16 +170,14 @@ def create_sector_page() -> html.Div:
     })
 
 
-def calculate_sector_returns(close, industry_df):
+def calculate_sector_returns(close, industry):
     """計算族群每日漲跌幅"""
     daily_returns = (close - close.shift(1)) / close.shift(1)
 
-    sector_returns = {}
-    for sector, group in industry_df.groupby('細產業別'):
-        stock_ids = group['代碼'].astype(str).tolist()
-        valid_ids = [s for s in stock_ids if s in daily_returns.columns]
-        if len(valid_ids) >= 2:
-            sector_returns[sector] = daily_returns[valid_ids].mean(axis=1)
+    sector_returns = {
+        sector: daily_returns[valid_ids].mean(axis=1)
+        for sector, valid_ids in industry.sector_stocks(universe=daily_returns.columns, min_size=2).items()
+    }
 
     return pd.DataFrame(sector_returns)
 
@@ -188,18 +188,19 @@ def calculate_sector_returns(close, industry_df):
      Input('sector-days-input', 'value'),
      Input('sector-count-input', 'value')]
 )
+@instrument_callback()
 def update_sector_heatmap(n_clicks, days, top_n):
     """更新熱力圖"""
-    import app
-    close = app.CACHED_DATA['close']
-    industry_df = app.CACHED_DATA['industry_df']
+    cached_data = get_cached_data()
+    close = cached_data['close']
+    industry = cached_data['industry']
 
     # 預設值
     days = days or 20
     top_n = top_n or 20
 
     # 計算族群漲跌幅
-    sector_returns = calculate_sector_returns(close, industry_df)
+    sector_returns = calculate_sector_returns(close, industry)
 
     # 取最近 N 天
     returns_recent = sector_returns.tail(days)
@@ -226,7 +227,7 @@ def update_sector_heatmap(n_clicks, days, top_n):
         zmid=0,
         zmin=-5,
         zmax=5,
-        text=np.round(returns_plot.T.values, 2),
+        text=np.round(returns_plot.T.values.astype(float), 2),
         texttemplate='%{text}',
         textfont={'size': 10, 'color': '#374151'},
         hovertemplate='<b>%{y}</b><br>日期: %{x}<br>漲跌幅: %{z:.2f}%<extra></extra>',
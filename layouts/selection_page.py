@@ -6,6 +6,9 @@ from dash import html, dcc, dash_table, Input, Output, State, callback
 import pandas as pd
 import numpy as np
 
+from modules.data_refresher import get_cached_data
+from modules.telemetry import instrument_callback
+
 
 def create_selection_page() -> html.Div:
     """
@@ -103,14 +106,6 @@ def create_selection_page() -> html.Div:
     ], style={'padding': '20px'})
 
 
-def calculate_macd(close_series, fast=12, slow=26, signal=9):
-    """計算 MACD"""
-    ema_fast = close_series.ewm(span=fast, adjust=False).mean()
-    ema_slow = close_series.ewm(span=slow, adjust=False).mean()
-    macd_line = ema_fast - ema_slow
-    return macd_line
-
-
 # Callback: 計算評分
 @callback(
     [Output('score-table-container', 'children'),
@@ -119,6 +114,7 @@ def calculate_macd(close_series, fast=12, slow=26, signal=9):
     State('stock-input', 'value'),
     prevent_initial_call=True
 )
+@instrument_callback()
 def calculate_scores(n_clicks, stock_input):
     """
     計算股票評分（使用啟動時快取的資料）
@@ -130,42 +126,34 @@ def calculate_scores(n_clicks, stock_input):
         # 解析股票代碼
         stock_codes = [code.strip() for code in stock_input.split(',')]
 
-        # 從 app.py 取得快取資料
-        import app
-        close = app.CACHED_DATA['close']
-        trade_value = app.CACHED_DATA['trade_value']
-        revenue_yoy = app.CACHED_DATA['revenue_yoy']
-        all_stock_names = app.CACHED_DATA['stock_names']
-        industry_df = app.CACHED_DATA['industry_df']
+        # 取得目前的資料快照 (整個 callback 使用同一份)
+        cached_data = get_cached_data()
+        close = cached_data['close']
+        trade_value = cached_data['trade_value']
+        revenue_yoy = cached_data['revenue_yoy']
+        all_stock_names = cached_data['stock_names']
+        industry = cached_data['industry']
+        indicators = cached_data['indicators']
 
         print(f"📊 計算 {len(stock_codes)} 檔股票評分（使用快取資料）")
 
         # 目標日期 = 最新交易日
         target_idx = len(close) - 1
 
-        # 計算均線
-        ma10 = close.rolling(10).mean()
-        ma20 = close.rolling(20).mean()
-        ma60 = close.rolling(60).mean()
+        # 均線 (快照已預先計算)
+        ma10 = indicators['ma10']
+        ma20 = indicators['ma20']
+        ma60 = indicators['ma60']
 
         # 均線多頭排列: MA10 > MA20 > MA60
         ma_bullish = (ma10.iloc[target_idx] > ma20.iloc[target_idx]) & \
                      (ma20.iloc[target_idx] > ma60.iloc[target_idx])
 
-        # 計算 MACD
-        macd_scores = {}
-        for stock in stock_codes:
-            if stock not in close.columns:
-                macd_scores[stock] = False
-                continue
-            try:
-                macd_line = calculate_macd(close[stock])
-                macd_today = macd_line.iloc[target_idx]
-                macd_yesterday = macd_line.iloc[target_idx - 1]
-                macd_scores[stock] = (macd_today > 0 and macd_today > macd_yesterday)
-            except:
-                macd_scores[stock] = False
-        macd_bullish = pd.Series(macd_scores)
+        # MACD > 0 且向上彎 (快照已預先計算)
+        macd_line = indicators['macd']
+        macd_today = macd_line.iloc[target_idx]
+        macd_yesterday = macd_line.iloc[target_idx - 1]
+        macd_bullish = (macd_today > 0) & (macd_today > macd_yesterday)
 
         # 營收成長 YoY > 20%
         revenue_latest = revenue_yoy.iloc[:target_idx+1].ffill().iloc[-1]
@@ -177,11 +165,7 @@ def calculate_scores(n_clicks, stock_input):
 
         sector_returns = {}
         sector_stocks = {}
-        for sector in industry_df['細產業別'].unique():
-            stocks_in_sector = industry_df[industry_df['細產業別'] == sector]['代碼'].tolist()
-            stocks_in_sector = [s for s in stocks_in_sector if s in close.columns]
-            if len(stocks_in_sector) < 2:
-                continue
+        for sector, stocks_in_sector in industry.sector_stocks(universe=close.columns, min_size=2).items():
             avg_price_today = close_today[stocks_in_sector].mean()
             avg_price_10d = close_10d_ago[stocks_in_sector].mean()
             if pd.notna(avg_price_today) and pd.notna(avg_price_10d) and avg_price_10d > 0:
@@ -238,7 +222,7 @@ def calculate_scores(n_clicks, stock_input):
             # 基本面: 熱門族群 (+10)
             if stock in hot_sector_stocks:
                 score += 10
-                stock_sectors = industry_df[industry_df['代碼'] == stock]['細產業別'].tolist()
+                stock_sectors = industry.sectors_of(stock)
                 hot_sectors = [s for s in stock_sectors if s in top5_sector_names]
                 details.append(f"熱門族群(+10)")
 
@@ -248,9 +232,10 @@ def calculate_scores(n_clicks, stock_input):
                 details.append("成交熱絡(+10)")
 
             # 取得資料
-            price = round(close_today.get(stock, 0), 2)
-            amount = round(trade_value.iloc[target_idx].get(stock, 0) / 1e8, 2)
-            rev_yoy = round(revenue_latest.get(stock, 0), 2) if stock in revenue_latest.index else 0
+            # 快照為 float32，先轉回 Python float 再四捨五入，避免顯示 123.4499969 之類的尾數
+            price = round(float(close_today.get(stock, 0)), 2)
+            amount = round(float(trade_value.iloc[target_idx].get(stock, 0)) / 1e8, 2)
+            rev_yoy = round(float(revenue_latest.get(stock, 0)), 2) if stock in revenue_latest.index else 0
 
             results.append({
                 '代碼': stock,
@@ -331,10 +316,10 @@ def display_stock_chart(selected_rows, table_data):
     stock_code = selected_stock['代碼']
     stock_name = selected_stock['名稱']
 
-    # 使用 Agent 4 的圖表模組
+    # 使用 Agent 4 的圖表模組 (伺服器端快取，重複點選同一檔直接回傳)
     try:
-        from modules.charts import create_candlestick_chart
-        return create_candlestick_chart(stock_code)
+        from modules.charts import get_candlestick_figure
+        return get_candlestick_figure(stock_code)
     except Exception as e:
         # 如果圖表生成失敗，顯示錯誤訊息
         import plotly.graph_objects as go
@@ -5,6 +5,20 @@
 - data_fetcher: 資料取得模組 (Agent 2) ✅
 - scoring: 評分計算引擎 (Agent 2) ✅
 - charts: 圖表繪製模組 (Agent 4) ✅
+- data_refresher: 資料快照排程刷新
+- realtime_store: 即時戰情室 tick 存儲
+- telemetry: callback 延遲指標 (/metrics)
+- latency: 即時 tick 延遲追蹤
+- realtime_push: 即時快照差異 SSE 推播
+- minute_bars: 盤中分鐘 K 棒 (OHLCV / VWAP)
+- live_scoring: 盤中暫定評分 (逐 tick 更新均線 / MACD)
+- volume_profile: 盤中累積成交量曲線與量比
+- score_index: 評分項目位元索引 (多條件篩選)
+- score_history: 個股評分歷史與連續區段 (軌跡查詢)
+- score_events: 總分跨越門檻事件表 (新進 / 跌出)
+- alerts: 門檻提醒引擎 (盤中快照 / 每日評分)
+- industry_registry: 產業分類註冊表 (族群 / 股票整數編碼與成員表)
+- compact: 精簡資料型別 (float32 價格 / uint8 評分)
 
 使用方式：
     from modules.charts import create_candlestick_chart
@@ -19,5 +33,19 @@ __author__ = 'Claude AI Agents'
 __all__ = [
     'data_fetcher',
     'scoring',
-    'charts'
+    'charts',
+    'data_refresher',
+    'realtime_store',
+    'telemetry',
+    'latency',
+    'realtime_push',
+    'minute_bars',
+    'live_scoring',
+    'volume_profile',
+    'score_index',
+    'score_history',
+    'score_events',
+    'alerts',
+    'industry_registry',
+    'compact'
 ]
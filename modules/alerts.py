@@ -0,0 +1,319 @@
+"""
+門檻提醒模組 - 以快照串流增量檢查使用者規則 (總分 >= X、評分項目轉為成立、漲跌幅、觸及漲停)
+
+規則依股票位置建成 CSR 索引 (同一檔的規則連續存放)。每次快照只比對各欄位與上次的差異，
+取出有變動的股票，再以陣列一次評估這些股票的規則；規則數增加不會變成逐條掃描整個市場。
+
+每條規則只在「由不成立轉為成立」時觸發一次，條件消失後再次成立才會再觸發。
+初始狀態視為不成立 (開盤後第一次成立即提醒)；每日檢查則先以前一日資料建立基準 (prime)。
+
+規則檔 (JSON list)，symbols 可列出多檔 (展開為多條規則)：
+    [
+        {"id": "3017-60", "symbol": "3017", "field": "score", "op": ">=", "value": 60},
+        {"id": "watch-limit", "symbols": ["2330", "2454"], "field": "limit_up"},
+        {"id": "watch-drop", "symbols": ["2330"], "field": "pct", "op": "<=", "value": -5}
+    ]
+"""
+
+import json
+import os
+import queue
+import threading
+import urllib.request
+from datetime import datetime
+
+import numpy as np
+
+ALERT_RULES_FILE = 'alert_rules.json'
+ALERT_LOG_FILE = 'alerts.log'
+
+# 可用欄位：數值欄位需指定 op / value，布林欄位 (評分項目、漲停) 只看是否成立
+NUMERIC_FIELDS = ('score', 'price', 'pct', 'vol_ratio')
+BOOL_FIELDS = ('limit_up', 'ma', 'macd', 'revenue', 'sector', 'volume')
+RULE_FIELDS = NUMERIC_FIELDS + BOOL_FIELDS
+OPERATORS = {'>=': 1.0, '<=': -1.0}
+
+
+def load_rules(path) -> list:
+    """
+    讀取規則檔
+
+    Returns:
+        list: 規則 dict，檔案不存在時返回空 list
+    """
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+class LogSink:
+    """提醒寫入文字檔 (每筆一行 JSON)"""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._lock = threading.Lock()
+
+    def __call__(self, alerts: list):
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            for alert in alerts:
+                f.write(json.dumps(alert, ensure_ascii=False) + '\n')
+
+
+class WebhookSink:
+    """
+    提醒以 JSON POST 到 webhook (背景執行緒送出，不阻塞快照處理)
+
+    Args:
+        url: webhook 網址
+        timeout: 單次請求逾時 (秒)
+    """
+
+    def __init__(self, url: str, timeout: float = 5.0):
+        self.url = url
+        self.timeout = timeout
+        self._queue = queue.Queue()
+        threading.Thread(target=self._worker, daemon=True).start()
+
+    def __call__(self, alerts: list):
+        self._queue.put(alerts)
+
+    def _worker(self):
+        while True:
+            alerts = self._queue.get()
+            body = json.dumps({'alerts': alerts}, ensure_ascii=False).encode('utf-8')
+            request = urllib.request.Request(self.url, data=body, headers={'Content-Type': 'application/json'})
+            try:
+                urllib.request.urlopen(request, timeout=self.timeout).close()
+            except Exception as e:
+                print(f"[WARN] webhook 提醒送出失敗: {e}")
+
+
+class RedisStreamSink:
+    """
+    提醒寫入 Redis Stream (XADD，保留最近 maxlen 筆)
+
+    Args:
+        client: redis.Redis
+        stream: Stream 名稱
+        maxlen: 保留筆數 (近似)
+    """
+
+    def __init__(self, client, stream: str = 'alerts', maxlen: int = 10000):
+        self.client = client
+        self.stream = stream
+        self.maxlen = maxlen
+
+    def __call__(self, alerts: list):
+        pipe = self.client.pipeline(transaction=False)
+        for alert in alerts:
+            fields = {key: '' if value is None else str(value) for key, value in alert.items()}
+            pipe.xadd(self.stream, fields, maxlen=self.maxlen, approximate=True)
+        pipe.execute()
+
+
+class AlertEngine:
+    """
+    增量門檻提醒引擎
+
+    Args:
+        columns: 股票代碼 (欄位順序，與 DataStore 的 CategoryIndex 一致)
+        rules: 規則 dict list (格式見模組說明)；不在 columns 內的股票忽略
+        sinks: 提醒輸出 (callable，參數為提醒 dict list)
+    """
+
+    def __init__(self, columns, rules: list, sinks=()):
+        self.columns = np.asarray(list(columns), dtype=object)
+        position = {symbol: i for i, symbol in enumerate(self.columns)}
+        self.sinks = list(sinks)
+        self._lock = threading.Lock()
+
+        pos, field, sign, threshold, ids = [], [], [], [], []
+        for n, rule in enumerate(rules):
+            name = rule.get('field')
+            if name not in RULE_FIELDS:
+                raise ValueError(f"未知的提醒欄位: {name} (可用: {', '.join(RULE_FIELDS)})")
+            op = rule.get('op', '>=')
+            if op not in OPERATORS:
+                raise ValueError(f"不支援的運算子: {op} (可用: {', '.join(OPERATORS)})")
+            if name in NUMERIC_FIELDS and 'value' not in rule:
+                raise ValueError(f"規則 {rule.get('id', n)} 缺少 value")
+            symbols = rule.get('symbols') or [rule.get('symbol')]
+            for symbol in symbols:
+                p = position.get(str(symbol))
+                if p is None:
+                    continue
+                pos.append(p)
+                field.append(RULE_FIELDS.index(name))
+                # 布林欄位以 1.0 / 0.0 比較 >= 1
+                sign.append(OPERATORS[op] if name in NUMERIC_FIELDS else 1.0)
+                threshold.append(float(rule['value']) if name in NUMERIC_FIELDS else 1.0)
+                ids.append(str(rule.get('id', n)))
+
+        # 依股票位置排序並建立 CSR：第 p 檔的規則為 order[indptr[p]:indptr[p+1]]
+        order = np.argsort(np.asarray(pos, dtype=np.intp), kind='stable')
+        self.rule_pos = np.asarray(pos, dtype=np.intp)[order]
+        self.rule_field = np.asarray(field, dtype=np.int8)[order]
+        self.rule_sign = np.asarray(sign)[order]
+        self.rule_threshold = np.asarray(threshold)[order]
+        self.rule_ids = np.asarray(ids, dtype=object)[order]
+        self.indptr = np.zeros(len(self.columns) + 1, dtype=np.intp)
+        np.cumsum(np.bincount(self.rule_pos, minlength=len(self.columns)), out=self.indptr[1:])
+        self.fields_in_use = {RULE_FIELDS[f] for f in np.unique(self.rule_field)}
+
+        self._active = np.zeros(len(self.rule_pos), dtype=bool)
+        self._last = {}
+
+    def __len__(self):
+        return len(self.rule_pos)
+
+    def _changed_positions(self, values: dict) -> np.ndarray:
+        """與上次相比有變動的股票位置 (NaN 視為相同)"""
+        changed = np.zeros(len(self.columns), dtype=bool)
+        for name, array in values.items():
+            array = np.asarray(array, dtype=float)
+            last = self._last.get(name)
+            if last is None:
+                changed |= ~np.isnan(array)
+            else:
+                changed |= (array != last) & ~(np.isnan(array) & np.isnan(last))
+            self._last[name] = array.copy()
+        return changed.nonzero()[0]
+
+    def _rules_of(self, positions: np.ndarray) -> np.ndarray:
+        """指定股票位置的所有規則索引 (CSR 區段串接)"""
+        starts, ends = self.indptr[positions], self.indptr[positions + 1]
+        has_rules = ends > starts
+        starts, ends = starts[has_rules], ends[has_rules]
+        if not len(starts):
+            return np.empty(0, dtype=np.intp)
+        lengths = ends - starts
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        return offsets + np.arange(lengths.sum())
+
+    def evaluate(self, values: dict, when=None, source: str = 'live', emit: bool = True) -> list:
+        """
+        以一次快照的欄位值檢查規則 (只檢查有變動的股票)
+
+        Args:
+            values: {欄位名稱: 陣列 (欄位順序同 columns)}，布林欄位可為 bool 陣列
+            when: 快照時間 (顯示用)，預設為現在
+            source: 'live' / 'daily'
+            emit: False 時只更新狀態不送出 (建立基準用)
+
+        Returns:
+            list: 觸發的提醒 dict
+        """
+        values = {name: array for name, array in values.items() if name in self.fields_in_use}
+        if not values or not len(self.rule_pos):
+            return []
+
+        with self._lock:
+            rules = self._rules_of(self._changed_positions(values))
+            fired = []
+            for name, array in values.items():
+                sel = rules[self.rule_field[rules] == RULE_FIELDS.index(name)]
+                if not len(sel):
+                    continue
+                value = np.asarray(array, dtype=float)[self.rule_pos[sel]]
+                with np.errstate(invalid='ignore'):
+                    met = self.rule_sign[sel] * (value - self.rule_threshold[sel]) >= 0
+                rising = met & ~self._active[sel]
+                self._active[sel] = met
+                if emit and rising.any():
+                    fired.append((name, sel[rising], value[rising]))
+
+        if not fired:
+            return []
+
+        when = when or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        alerts = []
+        for name, newly, value in fired:
+            for i, v in zip(newly.tolist(), value.tolist()):
+                alerts.append({
+                    'time': when,
+                    'source': source,
+                    'rule': self.rule_ids[i],
+                    'symbol': self.columns[self.rule_pos[i]],
+                    'field': name,
+                    'op': '>=' if self.rule_sign[i] > 0 else '<=',
+                    'threshold': None if name in BOOL_FIELDS else float(self.rule_threshold[i]),
+                    'value': bool(v) if name in BOOL_FIELDS else round(v, 4),
+                })
+        for sink in self.sinks:
+            try:
+                sink(alerts)
+            except Exception as e:
+                print(f"[WARN] 提醒輸出失敗 ({type(sink).__name__}): {e}")
+        return alerts
+
+    def attach(self, store, limit_up_prices=None):
+        """
+        掛到 DataStore 快照與盤中暫定評分的 listener
+
+        Args:
+            store: DataStore (有 scorer 時同時檢查 score / ma / macd)
+            limit_up_prices: 漲停價陣列 (欄位順序同 columns)，None 表示不檢查 limit_up
+        """
+        limit_up = None if limit_up_prices is None else np.asarray(limit_up_prices, dtype=float)
+
+        def on_snapshot(version):
+            snapshot = store.get_snapshot()
+            prices, ref = snapshot['prices'], snapshot['ref_prices']
+            with np.errstate(invalid='ignore', divide='ignore'):
+                values = {
+                    'price': prices,
+                    'pct': (prices - ref) / ref * 100,
+                    'vol_ratio': snapshot['volume_ratio'],
+                }
+                if limit_up is not None:
+                    values['limit_up'] = prices >= limit_up - 1e-6
+            times = snapshot['trend_times']
+            self.evaluate(values, when=times[-1] if times else None)
+
+        def on_score(snapshot):
+            self.evaluate({
+                'score': snapshot['score'],
+                'ma': snapshot['ma_bullish'],
+                'macd': snapshot['macd_bullish'],
+            }, when=snapshot['time'])
+
+        store.listeners.append(on_snapshot)
+        if store.scorer is not None:
+            store.scorer.listeners.append(on_score)
+
+
+def check_daily(engine: AlertEngine, total_score, components: dict) -> list:
+    """
+    以每日評分檢查規則：前一交易日建立基準，最新交易日成立者提醒
+
+    Args:
+        engine: AlertEngine (columns 需同 total_score.columns)
+        total_score: 總分 (日期 x 股票)
+        components: {項目名稱: 分數 DataFrame}，值 > 0 視為成立
+
+    Returns:
+        list: 觸發的提醒 dict
+    """
+    def row(i):
+        values = {'score': total_score.iloc[i].to_numpy(dtype=float)}
+        for name, frame in components.items():
+            values[name] = frame.iloc[i].reindex(total_score.columns).to_numpy(dtype=float) > 0
+        return values
+
+    if len(total_score) >= 2:
+        engine.evaluate(row(-2), source='daily', emit=False)
+    return engine.evaluate(row(-1), when=total_score.index[-1].strftime('%Y-%m-%d'), source='daily')
+
+
+__all__ = [
+    'ALERT_RULES_FILE',
+    'ALERT_LOG_FILE',
+    'RULE_FIELDS',
+    'AlertEngine',
+    'LogSink',
+    'WebhookSink',
+    'RedisStreamSink',
+    'check_daily',
+    'load_rules',
+]
@@ -5,10 +5,81 @@
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import pandas as pd
-from datetime import datetime, timedelta
+import numpy as np
+import json
+import threading
+from collections import OrderedDict
+
+from modules.data_fetcher import load_ohlcv, resample_ohlcv, get_indicator, stock_cache_version
+
+# 自動降採樣門檻 (交易日數)：超過即改用週 K / 月 K
+WEEKLY_THRESHOLD_DAYS = 250
+MONTHLY_THRESHOLD_DAYS = 1250
+# 伺服器端 K 線圖快取數量 (所有使用者共用)
+FIGURE_CACHE_SIZE = 128
+
+# 降採樣頻率 -> (pandas 頻率, 標題標籤)
+DOWNSAMPLE_RULES = {
+    'D': (None, '日K'),
+    'W': ('W-FRI', '週K'),
+    'M': ('ME', '月K'),
+}
+
+
+def _resolve_downsample(days: int, downsample) -> str:
+    """決定 K 線週期 ('D' / 'W' / 'M')"""
+    if downsample == 'auto':
+        if days > MONTHLY_THRESHOLD_DAYS:
+            return 'M'
+        if days > WEEKLY_THRESHOLD_DAYS:
+            return 'W'
+        return 'D'
+    return downsample if downsample in DOWNSAMPLE_RULES else 'D'
+
+
+def load_chart_data(stock_code: str, days: int = 60, downsample='auto') -> dict:
+    """
+    載入繪製 K 線圖所需的 OHLCV 與 MA / MACD 疊加資料
 
-# 注意：這些函數由 Agent 2 提供
-# from modules.data_fetcher import fetch_stock_data, calculate_technical_indicators
+    指標在快取中的完整歷史上計算 (同一快取版本內經由指標快取共用) 後才切出最後 N 根，
+    短區間的 MA60 / MACD 與長區間圖表的同一天數值一致。
+
+    Args:
+        stock_code: 股票代碼
+        days: 顯示天數 (交易日)
+        downsample: 'auto' / 'D' / 'W' / 'M'
+
+    Returns:
+        dict: {'ohlcv', 'ma10', 'ma20', 'ma60', 'macd', 'macd_signal', 'macd_histogram', 'period'}，
+              無資料時返回 None
+    """
+    ohlcv, version = load_ohlcv(stock_code)
+    if ohlcv.empty:
+        return None
+
+    period = _resolve_downsample(days, downsample)
+    rule, _ = DOWNSAMPLE_RULES[period]
+    bars = days
+    if rule is not None:
+        ohlcv = resample_ohlcv(ohlcv, rule)
+        bars = max(1, days // (5 if period == 'W' else 21))
+
+    close = ohlcv['close']
+    key = None if version is None else f"{version}:{stock_code}:{period}"
+    macd_params = {'fast': 12, 'slow': 26}
+
+    chart_data = {
+        'ma10': get_indicator(close, 'ma', key, window=10),
+        'ma20': get_indicator(close, 'ma', key, window=20),
+        'ma60': get_indicator(close, 'ma', key, window=60),
+        'macd': get_indicator(close, 'macd', key, **macd_params),
+        'macd_signal': get_indicator(close, 'macd_signal', key, signal=9, **macd_params),
+        'macd_histogram': get_indicator(close, 'macd_histogram', key, signal=9, **macd_params),
+    }
+    chart_data = {name: series.iloc[-bars:] for name, series in chart_data.items()}
+    chart_data['ohlcv'] = ohlcv.iloc[-bars:]
+    chart_data['period'] = period
+    return chart_data
 
 
 def create_candlestick_chart(
@@ -16,7 +87,8 @@ def create_candlestick_chart(
     days: int = 60,
     show_ma: bool = True,
     show_macd: bool = True,
-    show_volume: bool = True
+    show_volume: bool = True,
+    downsample='auto'
 ) -> go.Figure:
     """
     建立股票 K線圖（含技術指標）
@@ -27,46 +99,31 @@ def create_candlestick_chart(
         show_ma: 是否顯示均線
         show_macd: 是否顯示 MACD
         show_volume: 是否顯示成交量
+        downsample: K 線週期，'auto' 依天數自動改用週 K / 月 K，或指定 'D' / 'W' / 'M'
 
     Returns:
         go.Figure: Plotly 圖表物件
     """
     try:
-        # TODO: 取消註解以下程式碼（等 Agent 2 完成）
-        # from modules.data_fetcher import fetch_stock_data, calculate_technical_indicators
-        #
-        # # 取得資料
-        # stock_data = fetch_stock_data([stock_code])
-        # if not stock_data:
-        #     return _create_error_figure("資料取得失敗")
-        #
-        # close = stock_data['close'][stock_code]
-        # volume = stock_data['volume'][stock_code]
-        #
-        # # 計算技術指標
-        # tech_indicators = calculate_technical_indicators(stock_data['close'])
-
-        # 暫時使用模擬資料
-        dates = pd.date_range(end=datetime.now(), periods=days, freq='D')
-        close = pd.Series([580 + i * 0.5 for i in range(days)], index=dates)
-        volume = pd.Series([100000 + i * 1000 for i in range(days)], index=dates)
-
-        # 模擬 OHLC 資料
-        open_price = close * 0.98
-        high_price = close * 1.02
-        low_price = close * 0.97
-
-        # 計算均線
-        ma10 = close.rolling(window=10).mean()
-        ma20 = close.rolling(window=20).mean()
-        ma60 = close.rolling(window=60).mean()
-
-        # 計算 MACD
-        ema12 = close.ewm(span=12, adjust=False).mean()
-        ema26 = close.ewm(span=26, adjust=False).mean()
-        macd = ema12 - ema26
-        macd_signal = macd.ewm(span=9, adjust=False).mean()
-        macd_histogram = macd - macd_signal
+        chart_data = load_chart_data(stock_code, days, downsample)
+        if chart_data is None:
+            return _create_error_figure(f"{stock_code} 無價格資料")
+
+        ohlcv = chart_data['ohlcv']
+        dates = ohlcv.index
+        open_price = ohlcv['open']
+        high_price = ohlcv['high']
+        low_price = ohlcv['low']
+        close = ohlcv['close']
+        volume = ohlcv['volume']
+
+        ma10 = chart_data['ma10']
+        ma20 = chart_data['ma20']
+        ma60 = chart_data['ma60']
+        macd = chart_data['macd']
+        macd_signal = chart_data['macd_signal']
+        macd_histogram = chart_data['macd_histogram']
+        period_label = DOWNSAMPLE_RULES[chart_data['period']][1]
 
         # 建立子圖
         rows = 1 + (1 if show_macd else 0) + (1 if show_volume else 0)
@@ -75,13 +132,13 @@ def create_candlestick_chart(
 
         if rows == 1:
             row_heights = [1.0]
-            subplot_titles = [f'{stock_code} 股價走勢']
+            subplot_titles = [f'{stock_code} 股價走勢 ({period_label})']
         elif rows == 2:
             row_heights = [0.7, 0.3]
-            subplot_titles = [f'{stock_code} 股價走勢', 'MACD' if show_macd else '成交量']
+            subplot_titles = [f'{stock_code} 股價走勢 ({period_label})', 'MACD' if show_macd else '成交量']
         elif rows == 3:
             row_heights = [0.6, 0.2, 0.2]
-            subplot_titles = [f'{stock_code} 股價走勢', 'MACD', '成交量']
+            subplot_titles = [f'{stock_code} 股價走勢 ({period_label})', 'MACD', '成交量']
 
         fig = make_subplots(
             rows=rows,
@@ -144,7 +201,7 @@ def create_candlestick_chart(
             current_row += 1
 
             # MACD 柱狀圖
-            colors = ['#ef5350' if val >= 0 else '#26a69a' for val in macd_histogram]
+            colors = np.where(macd_histogram.to_numpy() >= 0, '#ef5350', '#26a69a')
             fig.add_trace(
                 go.Bar(
                     x=dates,
@@ -186,8 +243,7 @@ def create_candlestick_chart(
             current_row += 1
 
             # 成交量顏色（紅綠）
-            volume_colors = ['#ef5350' if close.iloc[i] >= open_price.iloc[i] else '#26a69a'
-                             for i in range(len(close))]
+            volume_colors = np.where(close.to_numpy() >= open_price.to_numpy(), '#ef5350', '#26a69a')
 
             fig.add_trace(
                 go.Bar(
@@ -332,6 +388,93 @@ def create_score_distribution_chart(scores_df: pd.DataFrame) -> go.Figure:
         return _create_error_figure(f"圖表建立失敗: {str(e)}")
 
 
+class FigureCache:
+    """
+    圖表 (已解析的 figure dict) 的 LRU 快取 (整個 process 共用，跨使用者 session)
+
+    存放解析後的 dict，命中時 callback 可直接回傳，不必每次再 json.loads。
+    """
+
+    def __init__(self, maxsize: int = FIGURE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """取得快取的圖表，未命中返回 None"""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+
+    def put(self, key, figure: dict):
+        """存入圖表，超過容量時淘汰最久未使用者"""
+        with self._lock:
+            self._entries[key] = figure
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """清空快取"""
+        with self._lock:
+            self._entries.clear()
+
+
+FIGURE_CACHE = FigureCache()
+
+
+def get_candlestick_figure(
+    stock_code: str,
+    days: int = 60,
+    show_ma: bool = True,
+    show_macd: bool = True,
+    show_volume: bool = True,
+    downsample='auto'
+) -> dict:
+    """
+    取得 K 線圖 (以 股票, 天數, 疊加指標, 資料版本 為鍵快取)
+
+    資料版本只讀取快取清單，不會觸發 Finlab 抓取；可直接作為 dcc.Graph 的 figure 回傳。
+
+    Args:
+        與 create_candlestick_chart 相同
+
+    Returns:
+        dict: Plotly 圖表 (快取共用物件，請勿修改)
+    """
+    key = (stock_code, days, (show_ma, show_macd, show_volume), downsample, stock_cache_version())
+
+    figure = FIGURE_CACHE.get(key)
+    if figure is not None:
+        return figure
+
+    fig = create_candlestick_chart(stock_code, days, show_ma, show_macd, show_volume, downsample)
+    # 經 JSON 轉成純 Python 物件 (numpy 陣列轉為 list)，只在建立時做一次
+    figure = json.loads(fig.to_json())
+
+    # 錯誤圖表 (沒有任何 trace) 不快取，下次重新嘗試
+    if fig.data:
+        FIGURE_CACHE.put(key, figure)
+    return figure
+
+
+def get_candlestick_figure_json(stock_code: str, days: int = 60, show_ma: bool = True, show_macd: bool = True,
+                                show_volume: bool = True, downsample='auto') -> str:
+    """
+    取得 K 線圖的 JSON (快取同 get_candlestick_figure)
+
+    Returns:
+        str: Plotly 圖表 JSON
+    """
+    return json.dumps(get_candlestick_figure(stock_code, days, show_ma, show_macd, show_volume, downsample))
+
+
 def _create_error_figure(error_message: str) -> go.Figure:
     """
     建立錯誤提示圖表
@@ -364,7 +507,11 @@ def _create_error_figure(error_message: str) -> go.Figure:
 
 # 匯出函數
 __all__ = [
+    'load_chart_data',
     'create_candlestick_chart',
+    'get_candlestick_figure',
+    'get_candlestick_figure_json',
+    'FIGURE_CACHE',
     'create_simple_line_chart',
     'create_score_distribution_chart'
 ]
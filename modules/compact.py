@@ -0,0 +1,127 @@
+"""
+精簡資料型別模組 - 價格 / 成交值 / 指標以 float32、評分項目以 uint8、股票代碼以 categorical 存放
+
+Finlab 回傳的資料與中間結果預設皆為 float64，布林訊號經 .astype(int) * 20 後變成 int64 分數表；
+多年份的 (日期 x 股票) 矩陣在記憶體、parquet 與 app 快照中因此放大 4~8 倍。
+精簡模式 (預設開啟) 下：
+    - 價格、成交值、營收 YoY、均線 / MACD: float32 (7 位有效數字，足以表示台股價格與成交值)
+    - 各評分項目: uint8 (0 / 10 / 20)
+    - 總分: float32 (需以 NaN 表示未達月均成交值門檻)
+    - 長表格 (族群種子、評分事件) 的股票代碼 / 族群: categorical
+設定環境變數 COMPACT_DTYPES=0 可回到 float64 / int64 (例如比對舊版結果)。
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+COMPACT_DTYPES = os.environ.get('COMPACT_DTYPES', '1') != '0'
+
+PRICE_DTYPE = np.float32
+SCORE_DTYPE = np.uint8
+
+
+def compact_prices(df):
+    """
+    價格類數值 (float64) 轉為 float32；非 float64 欄位維持不變
+
+    Args:
+        df: DataFrame 或 Series
+
+    Returns:
+        DataFrame 或 Series: 精簡模式關閉時原樣返回
+    """
+    if not COMPACT_DTYPES or df is None:
+        return df
+    if isinstance(df, pd.Series):
+        return df.astype(PRICE_DTYPE) if df.dtype == np.float64 else df
+    floats = (df.dtypes == np.float64).to_numpy()
+    if floats.all():
+        return df.astype(PRICE_DTYPE)
+    if floats.any():
+        return df.astype({column: PRICE_DTYPE for column in df.columns[floats]})
+    return df
+
+
+def score_frame(mask, points: int):
+    """
+    布林訊號轉為評分項目分數
+
+    Args:
+        mask: 布林 DataFrame / Series (NaN 視為不成立)
+        points: 成立時的分數
+
+    Returns:
+        DataFrame 或 Series: 精簡模式為 uint8，否則為 int64
+    """
+    mask = mask.fillna(False).astype(bool)
+    if COMPACT_DTYPES:
+        return mask.astype(SCORE_DTYPE) * SCORE_DTYPE(points)
+    return mask.astype(int) * points
+
+
+def total_score_frame(scores: list, valid):
+    """
+    加總各評分項目並套用有效名單
+
+    Args:
+        scores: score_frame 的結果 list (加總不超過 255)
+        valid: 有效名單 (布林)，不成立者為 NaN
+
+    Returns:
+        DataFrame: 精簡模式為 float32，否則為 float64
+    """
+    total = scores[0]
+    for score in scores[1:]:
+        total = total + score
+    return compact_prices(total.where(valid).astype(float))
+
+
+def categorical_columns(df: pd.DataFrame, columns) -> pd.DataFrame:
+    """
+    長表格中重複出現的代碼 / 名稱欄位轉為 categorical
+
+    Args:
+        df: 長表格
+        columns: 要轉換的欄位
+
+    Returns:
+        DataFrame: 精簡模式關閉時原樣返回
+    """
+    if not COMPACT_DTYPES:
+        return df
+    return df.astype({column: 'category' for column in columns if column in df.columns})
+
+
+def frame_nbytes(frames) -> int:
+    """
+    DataFrame / Series 的記憶體用量 (含 index)
+
+    Args:
+        frames: DataFrame / Series，或其 dict / list
+
+    Returns:
+        int: bytes
+    """
+    if isinstance(frames, dict):
+        frames = frames.values()
+    elif isinstance(frames, (pd.DataFrame, pd.Series)):
+        frames = [frames]
+    total = 0
+    for frame in frames:
+        usage = frame.memory_usage(index=True, deep=False)
+        total += int(usage.sum() if isinstance(usage, pd.Series) else usage)
+    return total
+
+
+__all__ = [
+    'COMPACT_DTYPES',
+    'PRICE_DTYPE',
+    'SCORE_DTYPE',
+    'categorical_columns',
+    'compact_prices',
+    'frame_nbytes',
+    'score_frame',
+    'total_score_frame',
+]
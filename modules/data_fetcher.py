@@ -7,16 +7,179 @@ from datetime import datetime, timedelta
 import pandas as pd
 import numpy as np
 import os
-import pickle
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import pyarrow.parquet as pq
+
+from modules.compact import compact_prices
+from modules.industry_registry import get_registry
 
 # 資料存儲目錄
 DATA_DIR = 'data'
 
+# 欄式快取目錄 (每個資料表一個子目錄，依日期切分 parquet 檔)
+CACHE_DIR = os.path.join(DATA_DIR, 'stock_cache')
+CACHE_TABLES = ['open', 'high', 'low', 'close', 'volume', 'amount', 'revenue_yoy']
+OHLCV_TABLES = ['open', 'high', 'low', 'close', 'volume']
+# 個股 OHLCV 切片快取數量
+OHLCV_CACHE_SIZE = 256
+# 每個 parquet 分段檔的最大資料列數
+CACHE_PART_ROWS = 120
+# Finlab 當日資料約於收盤後 15:00 完成
+DATA_READY_TIME = (15, 0)
+# 快取尚未有最新交易日資料時 (Finlab 尚未發布或遇假日) 的重試間隔
+CACHE_RETRY_MINUTES = 30
+
+# 並行抓取 Finlab 資料集的執行緒數
+FETCH_WORKERS = 8
+# 評分流程共用的資料集
+MARKET_DATASETS = {
+    'close': 'price:收盤價',
+    'trade_value': 'price:成交金額',
+    'revenue_yoy': 'monthly_revenue:去年同月增減(%)',
+}
+
+# 技術指標快取容量上限 (bytes)
+INDICATOR_CACHE_BYTES = 512 * 1024 * 1024
+
 # 設定資料範圍
 data.set_universe('TSE_OTC')
 data.truncate_start = (datetime.now() - timedelta(days=120)).strftime('%Y-%m-%d')
 
 
+# data.truncate_start / universe 為 finlab 全域設定：所有 data.get 皆須在此鎖內呼叫，並於結束後還原
+_fetch_lock = threading.Lock()
+
+
+def fetch_new_rows(dataset: str, since) -> pd.DataFrame:
+    """
+    只抓取 since 之後的資料列
+
+    Args:
+        dataset: Finlab 資料集名稱
+        since: 起始日期
+
+    Returns:
+        DataFrame: since 之後的資料
+    """
+    with _fetch_lock:
+        prev_start = data.truncate_start
+        try:
+            data.truncate_start = pd.Timestamp(since).strftime('%Y-%m-%d')
+            return data.get(dataset)
+        finally:
+            data.truncate_start = prev_start
+
+
+def fetch_datasets(datasets: dict, start=None, universe: str = 'TSE_OTC', align=None,
+                   max_workers: int = FETCH_WORKERS, timings: dict = None) -> dict:
+    """
+    以共用的 universe / 起始日並行抓取多個 Finlab 資料集
+
+    data.truncate_start 與 universe 為 finlab 全域設定：在 _fetch_lock 內設定一次後，
+    各資料集於執行緒池同時下載 (以網路 I/O 為主)，牆鐘時間約等於最慢的單一資料集；
+    結束後兩者皆還原為原本的設定，不影響其他呼叫端。
+
+    Args:
+        datasets: {名稱: Finlab 資料集}，例如 MARKET_DATASETS
+        start: 起始日期，None 表示沿用目前的 data.truncate_start
+        universe: 市場範圍，None 表示不變更
+        align: 需對齊的日頻資料名稱 (日期取交集、欄位取聯集)，例如 ('close', 'trade_value')；
+            任一資料集尚未更新到最新交易日時，整組一致地停在共同的最後一日
+        max_workers: 執行緒數
+        timings: 傳入 dict 時寫入各資料集的下載秒數
+
+    Returns:
+        dict: {名稱: DataFrame}
+    """
+    def _get(name, dataset):
+        started = time.perf_counter()
+        df = data.get(dataset)
+        if timings is not None:
+            timings[name] = round(time.perf_counter() - started, 3)
+        return df
+
+    with _fetch_lock:
+        prev_start = data.truncate_start
+        prev_universe = data.universe_stocks
+        try:
+            if universe is not None:
+                data.set_universe(universe)
+            if start is not None:
+                data.truncate_start = pd.Timestamp(start).strftime('%Y-%m-%d')
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(datasets)) or 1) as pool:
+                futures = {name: pool.submit(_get, name, dataset) for name, dataset in datasets.items()}
+                tables = {name: future.result() for name, future in futures.items()}
+        finally:
+            data.truncate_start = prev_start
+            data.universe_stocks = prev_universe
+
+    names = [name for name in (align or ()) if name in tables]
+    if len(names) > 1:
+        index = tables[names[0]].index
+        columns = tables[names[0]].columns
+        for name in names[1:]:
+            index = index.intersection(tables[name].index)
+            columns = columns.union(tables[name].columns, sort=False)
+        for name in names:
+            tables[name] = tables[name].reindex(index=index, columns=columns)
+    return tables
+
+
+def merge_new_rows(old_df: pd.DataFrame, new_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    將新抓取的資料列合併進既有資料 (重疊日期以新資料為準)
+
+    Args:
+        old_df: 既有資料
+        new_df: 增量抓取的資料
+
+    Returns:
+        DataFrame: 合併後的資料
+    """
+    if old_df is None or old_df.empty:
+        return new_df
+    if new_df is None or new_df.empty:
+        return old_df
+
+    kept = old_df[old_df.index < new_df.index[0]]
+    return pd.concat([kept, new_df]).sort_index()
+
+
+def fetch_market_data(since=None) -> dict:
+    """
+    取得全市場資料
+
+    Args:
+        since: 只取此日期之後的資料列，None 表示依 data.truncate_start
+
+    Returns:
+        dict: {'open', 'high', 'low', 'close', 'volume', 'amount', 'revenue_yoy', 'stock_names'}
+    """
+    # 價格與營收資料集並行抓取 (Finlab 會自動更新到最新日期)，價格表對齊日期與欄位
+    tables = fetch_datasets({
+        'open': 'price:開盤價',
+        'high': 'price:最高價',
+        'low': 'price:最低價',
+        'close': 'price:收盤價',
+        'volume': 'price:成交股數',
+        'amount': 'price:成交金額',
+        'revenue_yoy': 'monthly_revenue:去年同月增減(%)',
+    }, start=since, universe=None, align=OHLCV_TABLES + ['amount'])
+    tables['volume'] = tables['volume'] / 1000  # 轉換為千股
+
+    # 取得股票名稱
+    from finlab.markets.tw import TWMarket
+    market = TWMarket()
+    stock_names = market.get_asset_id_to_name()
+
+    return {**tables, 'stock_names': stock_names}
+
+
 def fetch_stock_data(stock_codes: list) -> dict:
     """
     取得指定股票清單的所有必要資料（總是取得最新資料）
@@ -27,6 +190,9 @@ def fetch_stock_data(stock_codes: list) -> dict:
     Returns:
         dict: 包含各項資料的字典
         {
+            'open': DataFrame,  # 開盤價
+            'high': DataFrame,  # 最高價
+            'low': DataFrame,  # 最低價
             'close': DataFrame,  # 收盤價
             'volume': DataFrame,  # 成交量
             'amount': DataFrame,  # 成交金額
@@ -36,45 +202,171 @@ def fetch_stock_data(stock_codes: list) -> dict:
     """
     try:
         print(f"📊 正在取得 {len(stock_codes)} 檔股票的最新資料...")
-        
-        # 取得價格資料（Finlab 會自動更新到最新日期）
-        close = data.get('price:收盤價')
-        volume = data.get('price:成交股數') / 1000  # 轉換為千股
-        amount = data.get('price:成交金額')
-
-        # 取得基本面資料
-        revenue_yoy = data.get('monthly_revenue:去年同月增減(%)')
-
-        # 取得股票名稱
-        from finlab.markets.tw import TWMarket
-        market = TWMarket()
-        all_stock_names = market.get_asset_id_to_name()
+
+        market_data = fetch_market_data()
+        all_stock_names = market_data['stock_names']
         stock_names = {code: all_stock_names.get(code, code) for code in stock_codes}
 
-        # 篩選指定股票
-        close = close[stock_codes] if isinstance(close, pd.DataFrame) else close
-        volume = volume[stock_codes] if isinstance(volume, pd.DataFrame) else volume
-        amount = amount[stock_codes] if isinstance(amount, pd.DataFrame) else amount
-
-        return {
-            'close': close,
-            'volume': volume,
-            'amount': amount,
-            'revenue_yoy': revenue_yoy,
-            'stock_names': stock_names
+        # 篩選指定股票 (月營收維持全市場)
+        stock_data = {
+            name: market_data[name][stock_codes]
+            for name in ['open', 'high', 'low', 'close', 'volume', 'amount']
         }
+        stock_data['revenue_yoy'] = market_data['revenue_yoy']
+        stock_data['stock_names'] = stock_names
+
+        return stock_data
 
     except Exception as e:
         print(f"資料取得失敗: {str(e)}")
         return None
 
 
-def calculate_technical_indicators(close_df: pd.DataFrame) -> dict:
+class IndicatorCache:
+    """
+    技術指標快取 - 以 (資料版本, 指標, 參數) 為鍵的 LRU，依記憶體用量淘汰
+
+    同一資料版本內重複的圖表/評分請求直接共用結果；
+    新的參數組合只會計算一次。快取內的 DataFrame 為共用物件，呼叫端不可修改。
+    """
+
+    def __init__(self, max_bytes: int = INDICATOR_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (value, nbytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _nbytes(value) -> int:
+        if isinstance(value, pd.DataFrame):
+            return int(value.memory_usage(index=True).sum())
+        if isinstance(value, pd.Series):
+            return int(value.memory_usage(index=True))
+        return int(getattr(value, 'nbytes', 0))
+
+    def get_or_compute(self, key, compute):
+        """
+        取得快取結果，未命中時計算並存入
+
+        Args:
+            key: 快取鍵 (需可 hash)
+            compute: 無參數的計算函數
+
+        Returns:
+            計算結果 (共用物件)
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # 同一鍵只讓一個執行緒計算，其餘等待後直接取用
+        with key_lock:
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return self._entries[key][0]
+
+            try:
+                value = compute()
+                nbytes = self._nbytes(value)
+
+                with self._lock:
+                    self.misses += 1
+                    if nbytes <= self.max_bytes:
+                        self._entries[key] = (value, nbytes)
+                        self._bytes += nbytes
+                        while self._bytes > self.max_bytes:
+                            _, (_, evicted) = self._entries.popitem(last=False)
+                            self._bytes -= evicted
+            finally:
+                # 計算失敗時也要移除，避免每個失敗的鍵永久留下一把鎖
+                with self._lock:
+                    self._key_locks.pop(key, None)
+            return value
+
+    def clear(self):
+        """清空快取"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        """快取使用狀況"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+# 全域指標快取 (整個 process 共用)
+INDICATOR_CACHE = IndicatorCache()
+
+
+def _compute_indicator(close_df, name: str, version, params: dict):
+    """依指標名稱計算，MACD 系列會重用快取中的 EMA / MACD (結果為精簡型別)"""
+    if name == 'ma':
+        result = close_df.rolling(window=params['window']).mean()
+    elif name == 'ema':
+        result = close_df.ewm(span=params['span'], adjust=False).mean()
+    elif name == 'macd':
+        ema_fast = get_indicator(close_df, 'ema', version, span=params['fast'])
+        ema_slow = get_indicator(close_df, 'ema', version, span=params['slow'])
+        result = ema_fast - ema_slow
+    elif name == 'macd_signal':
+        macd = get_indicator(close_df, 'macd', version, fast=params['fast'], slow=params['slow'])
+        result = macd.ewm(span=params['signal'], adjust=False).mean()
+    elif name == 'macd_histogram':
+        macd = get_indicator(close_df, 'macd', version, fast=params['fast'], slow=params['slow'])
+        macd_signal = get_indicator(close_df, 'macd_signal', version, **params)
+        result = macd - macd_signal
+    else:
+        raise ValueError(f"未知的技術指標: {name}")
+    return compact_prices(result)
+
+
+def get_indicator(close_df, name: str, version=None, **params):
+    """
+    取得單一技術指標 (同一資料版本內會快取)
+
+    Args:
+        close_df: 收盤價 DataFrame 或 Series
+        name: 指標名稱 ('ma' / 'ema' / 'macd' / 'macd_signal' / 'macd_histogram')
+        version: 資料版本，None 表示不使用快取
+        **params: 指標參數，例如 window=20、span=12、fast=12, slow=26, signal=9
+
+    Returns:
+        DataFrame 或 Series: 指標數值 (快取共用物件，請勿修改)
+    """
+    if version is None:
+        return _compute_indicator(close_df, name, None, params)
+
+    # 版本之外再加上資料外形與欄位 (Series 為名稱)，避免同版本、同外形的不同股票誤用彼此的結果
+    labels = tuple(close_df.columns) if isinstance(close_df, pd.DataFrame) else close_df.name
+    fingerprint = (close_df.shape, close_df.index[-1] if len(close_df) else None, labels)
+    key = (version, name, tuple(sorted(params.items())), fingerprint)
+    return INDICATOR_CACHE.get_or_compute(
+        key, lambda: _compute_indicator(close_df, name, version, params)
+    )
+
+
+def calculate_technical_indicators(close_df: pd.DataFrame, version=None) -> dict:
     """
     計算技術指標 (均線、MACD)
 
     Args:
         close_df: 收盤價 DataFrame
+        version: 資料版本，指定時結果會存入指標快取供後續請求共用
 
     Returns:
         dict: 包含各項技術指標
@@ -87,25 +379,15 @@ def calculate_technical_indicators(close_df: pd.DataFrame) -> dict:
             'macd_histogram': DataFrame
         }
     """
-    # 計算均線
-    ma10 = close_df.rolling(window=10).mean()
-    ma20 = close_df.rolling(window=20).mean()
-    ma60 = close_df.rolling(window=60).mean()
-
-    # 計算 MACD
-    ema12 = close_df.ewm(span=12, adjust=False).mean()
-    ema26 = close_df.ewm(span=26, adjust=False).mean()
-    macd = ema12 - ema26
-    macd_signal = macd.ewm(span=9, adjust=False).mean()
-    macd_histogram = macd - macd_signal
+    macd_params = {'fast': 12, 'slow': 26}
 
     return {
-        'ma10': ma10,
-        'ma20': ma20,
-        'ma60': ma60,
-        'macd': macd,
-        'macd_signal': macd_signal,
-        'macd_histogram': macd_histogram
+        'ma10': get_indicator(close_df, 'ma', version, window=10),
+        'ma20': get_indicator(close_df, 'ma', version, window=20),
+        'ma60': get_indicator(close_df, 'ma', version, window=60),
+        'macd': get_indicator(close_df, 'macd', version, **macd_params),
+        'macd_signal': get_indicator(close_df, 'macd_signal', version, signal=9, **macd_params),
+        'macd_histogram': get_indicator(close_df, 'macd_histogram', version, signal=9, **macd_params)
     }
 
 
@@ -128,16 +410,14 @@ def load_industry_data(csv_path: str = None) -> pd.DataFrame:
         csv_path = os.path.join(project_dir, '產業分類資料庫.csv')
     
     try:
-        df = pd.read_csv(csv_path, encoding='utf-8-sig')
+        # 由產業分類註冊表還原 (共用編譯結果，代碼已是字串)
+        df = get_registry(csv_path).to_frame()
         # 重新命名欄位以符合程式碼預期
-        df = df.rename(columns={
+        return df.rename(columns={
             '細產業別': 'industry',
             '代碼': 'stock_code',
             '商品': 'name'
         })
-        # 確保 stock_code 是字串
-        df['stock_code'] = df['stock_code'].astype(str)
-        return df
     except FileNotFoundError:
         print(f"警告: 找不到產業分類檔案 {csv_path}")
         return pd.DataFrame(columns=['stock_code', 'industry'])
@@ -211,68 +491,304 @@ def get_top_industries(industry_trend_df: pd.DataFrame, top_n: int = 5) -> list:
 
 
 
-# ========== Bug 2 修復：資料存儲功能 ==========
+# ========== 資料存儲：欄式快取 ==========
+#
+# data/stock_cache/
+#   manifest.json            版本、各表分段清單、最後檢查時間
+#   stock_names.json         股票名稱對照表
+#   close/20240102_20240628.parquet ...
+#
+# 全市場資料依日期切分為 parquet 分段檔，讀取時只投影需要的股票欄位；
+# 新交易日只改寫最後一個分段 (或新增分段)，快取可跨日持續使用。
+
+def _manifest_path(cache_dir: str) -> str:
+    return os.path.join(cache_dir, 'manifest.json')
+
+
+def _read_manifest(cache_dir: str = None) -> dict:
+    """讀取快取清單，不存在則返回 None"""
+    path = _manifest_path(cache_dir or CACHE_DIR)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _write_manifest(manifest: dict, cache_dir: str):
+    """原子寫入快取清單"""
+    path = _manifest_path(cache_dir)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _part_name(df: pd.DataFrame) -> str:
+    return f"{df.index[0].strftime('%Y%m%d')}_{df.index[-1].strftime('%Y%m%d')}.parquet"
+
+
+def _has_new_rows(parts: list, new_df: pd.DataFrame) -> bool:
+    """新資料是否含有比資料表最後一個分段更新的日期"""
+    if new_df is None or new_df.empty:
+        return False
+    if not parts:
+        return True
+    last = pd.Timestamp(parts[-1][:-len('.parquet')].split('_')[1])
+    return new_df.index.max() > last
+
+
+def _append_table(table_dir: str, parts: list, new_df: pd.DataFrame) -> tuple:
+    """
+    將新資料列附加到資料表 (只改寫最後一個分段)
+
+    分段以暫存檔再替換的方式寫入；被取代的舊分段不在此刪除，
+    由呼叫端在新的快取清單寫入後才移除，避免清單指向已刪除的檔案。
+
+    Args:
+        table_dir: 資料表目錄
+        parts: 目前的分段檔名清單 (依日期排序)
+        new_df: 新資料列
+
+    Returns:
+        tuple: (更新後的分段檔名清單, 被取代的舊分段路徑 list)
+    """
+    if new_df is None or new_df.empty:
+        return parts, []
+
+    os.makedirs(table_dir, exist_ok=True)
+
+    if parts:
+        last_part = pd.read_parquet(os.path.join(table_dir, parts[-1]))
+        new_df = new_df[new_df.index >= last_part.index[0]]
+        if new_df.empty:
+            return parts, []
+        merged = merge_new_rows(last_part, new_df)
+        kept_parts = parts[:-1]
+    else:
+        merged = new_df.sort_index()
+        kept_parts = []
+
+    merged = compact_prices(merged)
+    merged.columns = merged.columns.astype(str)
+    new_parts = []
+    for start in range(0, len(merged), CACHE_PART_ROWS):
+        chunk = merged.iloc[start:start + CACHE_PART_ROWS]
+        name = _part_name(chunk)
+        path = os.path.join(table_dir, name)
+        chunk.to_parquet(path + '.tmp')
+        os.replace(path + '.tmp', path)
+        new_parts.append(name)
+
+    obsolete = [os.path.join(table_dir, parts[-1])] if parts and parts[-1] not in new_parts else []
+    return kept_parts + new_parts, obsolete
+
+
+def _read_table(table_dir: str, parts: list, columns: list = None) -> pd.DataFrame:
+    """
+    讀取資料表，只投影指定的股票欄位
+
+    Args:
+        table_dir: 資料表目錄
+        parts: 分段檔名清單
+        columns: 股票代碼清單，None 表示全部
 
-def save_stock_data(stock_data: dict, filename: str = None):
+    Returns:
+        DataFrame: 資料表
     """
-    將股票資料存儲到 data 資料夾
+    frames = []
+    for name in parts:
+        path = os.path.join(table_dir, name)
+        if columns is None:
+            frames.append(pd.read_parquet(path))
+            continue
+        # 舊分段可能沒有後來才上市的股票
+        available = set(pq.read_schema(path).names)
+        frames.append(pd.read_parquet(path, columns=[c for c in columns if c in available]))
+
+    if not frames:
+        return pd.DataFrame(columns=columns)
+
+    df = pd.concat(frames)
+    return df if columns is None else df.reindex(columns=columns)
+
+
+def latest_trading_day(now: datetime = None) -> pd.Timestamp:
+    """
+    推估資料應更新到的最新交易日 (不含國定假日判斷)
 
     Args:
-        stock_data: 股票資料字典（來自 fetch_stock_data）
-        filename: 檔案名稱，預設使用日期
+        now: 目前時間，預設 datetime.now()
+
+    Returns:
+        Timestamp: 最新交易日
     """
-    # 建立 data 資料夾
-    if not os.path.exists(DATA_DIR):
-        os.makedirs(DATA_DIR)
-        print(f"✅ 建立資料夾: {DATA_DIR}")
+    now = now or datetime.now()
+    day = pd.Timestamp(now.date())
+    if (now.hour, now.minute) < DATA_READY_TIME:
+        day -= pd.Timedelta(days=1)
+    while day.weekday() >= 5:
+        day -= pd.Timedelta(days=1)
+    return day
 
-    # 預設檔案名稱：使用今天日期
-    if filename is None:
-        filename = f"stock_data_{datetime.now().strftime('%Y%m%d')}.pkl"
 
-    filepath = os.path.join(DATA_DIR, filename)
+def is_cache_stale(manifest: dict, now: datetime = None) -> bool:
+    """
+    檢查快取是否落後最新交易日
+
+    以快取的最後日期判斷：尚未有預期交易日的資料就視為落後 (Finlab 尚未發布時不會被當成已更新)；
+    為避免假日或資料延遲時不斷重抓，距上次檢查未滿 CACHE_RETRY_MINUTES 分鐘則先不重試。
+
+    Args:
+        manifest: 快取清單
+        now: 目前時間，預設 datetime.now()
+
+    Returns:
+        bool: 是否需要更新
+    """
+    if manifest is None:
+        return True
+
+    now = now or datetime.now()
+    if pd.Timestamp(manifest['last_date']) >= latest_trading_day(now):
+        return False
+
+    last_checked = manifest.get('last_checked')
+    if last_checked is None:
+        return True
+    return pd.Timestamp(now) - pd.Timestamp(last_checked) >= pd.Timedelta(minutes=CACHE_RETRY_MINUTES)
+
+
+def save_stock_data(stock_data: dict, cache_dir: str = None) -> dict:
+    """
+    將全市場資料附加到欄式快取
+
+    只有比快取更新的日期會被寫入 (最後一個分段會以新資料覆蓋重疊日期)；
+    沒有任何新日期時 (Finlab 尚未發布或遇假日) 不改寫分段也不遞增版本，只記錄檢查時間，
+    以免使依版本失效的指標 / OHLCV / 圖表快取無故重算。
+
+    Args:
+        stock_data: 全市場資料字典（來自 fetch_market_data）
+        cache_dir: 快取目錄，預設 data/stock_cache
+
+    Returns:
+        dict: 更新後的快取清單
+    """
+    cache_dir = cache_dir or CACHE_DIR
+    os.makedirs(cache_dir, exist_ok=True)
+
+    manifest = _read_manifest(cache_dir) or {'version': 0, 'tables': {}, 'columns': []}
 
     try:
-        with open(filepath, 'wb') as f:
-            pickle.dump(stock_data, f)
-        print(f"✅ 資料已存儲: {filepath}")
+        if manifest['version'] and not any(
+            _has_new_rows(manifest['tables'].get(name, []), stock_data.get(name)) for name in CACHE_TABLES
+        ):
+            manifest['last_checked'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            _write_manifest(manifest, cache_dir)
+            print(f"[INFO] 沒有新資料，快取維持版本 {manifest['version']} (最新 {manifest['last_date']})")
+            return manifest
+
+        obsolete = []
+        for name in CACHE_TABLES:
+            parts = manifest['tables'].get(name, [])
+            manifest['tables'][name], replaced = _append_table(
+                os.path.join(cache_dir, name), parts, stock_data.get(name)
+            )
+            obsolete.extend(replaced)
+
+        names_path = os.path.join(cache_dir, 'stock_names.json')
+        with open(names_path, 'w', encoding='utf-8') as f:
+            json.dump(stock_data.get('stock_names', {}), f, ensure_ascii=False)
+
+        close = stock_data['close']
+        manifest['version'] += 1
+        manifest['columns'] = sorted(set(manifest['columns']) | set(close.columns.astype(str)))
+        manifest['last_date'] = max(
+            pd.Timestamp(manifest.get('last_date', close.index[-1])), close.index[-1]
+        ).strftime('%Y-%m-%d')
+        manifest['last_checked'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        _write_manifest(manifest, cache_dir)
+        # 清單已指向新分段後才移除被取代的舊分段
+        for path in obsolete:
+            if os.path.exists(path):
+                os.remove(path)
+        print(f"✅ 資料已存儲: {cache_dir} (版本 {manifest['version']}, 最新 {manifest['last_date']})")
     except Exception as e:
         print(f"❌ 資料存儲失敗: {str(e)}")
 
+    return manifest
+
 
-def load_stock_data(filename: str = None) -> dict:
+def load_stock_data(stock_codes: list = None, cache_dir: str = None) -> dict:
     """
-    從 data 資料夾載入股票資料
+    從欄式快取載入股票資料 (只讀取指定股票的欄位)
 
     Args:
-        filename: 檔案名稱，預設使用今天日期
+        stock_codes: 股票代碼清單，None 表示全市場
+        cache_dir: 快取目錄，預設 data/stock_cache
 
     Returns:
-        dict: 股票資料字典，如果檔案不存在則返回 None
+        dict: 股票資料字典 (另含 'version' 快取版本)，如果快取不存在則返回 None
     """
-    if filename is None:
-        filename = f"stock_data_{datetime.now().strftime('%Y%m%d')}.pkl"
+    cache_dir = cache_dir or CACHE_DIR
+    manifest = _read_manifest(cache_dir)
 
-    filepath = os.path.join(DATA_DIR, filename)
-
-    if not os.path.exists(filepath):
-        print(f"⚠️ 檔案不存在: {filepath}")
+    if manifest is None:
+        print(f"⚠️ 快取不存在: {cache_dir}")
         return None
 
     try:
-        with open(filepath, 'rb') as f:
-            stock_data = pickle.load(f)
-        print(f"✅ 資料已載入: {filepath}")
+        stock_data = {}
+        for name in CACHE_TABLES:
+            # 月營收為全市場橫截面，與 fetch_stock_data 相同不做篩選
+            columns = None if name == 'revenue_yoy' else stock_codes
+            stock_data[name] = _read_table(
+                os.path.join(cache_dir, name), manifest['tables'].get(name, []), columns
+            )
+
+        with open(os.path.join(cache_dir, 'stock_names.json'), 'r', encoding='utf-8') as f:
+            all_stock_names = json.load(f)
+        codes = stock_codes if stock_codes is not None else all_stock_names.keys()
+        stock_data['stock_names'] = {code: all_stock_names.get(code, code) for code in codes}
+        stock_data['version'] = f"cache-{manifest['version']}"
+
+        print(f"✅ 資料已載入: {cache_dir} (版本 {manifest['version']})")
         return stock_data
     except Exception as e:
         print(f"❌ 資料載入失敗: {str(e)}")
         return None
 
 
+def update_stock_cache(force_update: bool = False) -> dict:
+    """
+    快取落後最新交易日時，只抓取新的日期附加進快取
+
+    Args:
+        force_update: 是否強制重新抓取全部資料
+
+    Returns:
+        dict: 最新的快取清單
+    """
+    manifest = _read_manifest()
+
+    if not force_update and not is_cache_stale(manifest):
+        return manifest
+
+    if manifest is None or force_update:
+        print("📥 從 Finlab 取得最新資料...")
+        market_data = fetch_market_data()
+    else:
+        print(f"📥 從 Finlab 取得 {manifest['last_date']} 之後的資料...")
+        market_data = fetch_market_data(since=manifest['last_date'])
+
+    return save_stock_data(market_data)
+
+
 def fetch_and_save_stock_data(stock_codes: list, force_update: bool = False) -> dict:
     """
     取得股票資料並存儲（帶快取功能）
 
+    快取落後最新交易日時只抓取新的日期附加進快取，再投影出指定股票。
+
     Args:
         stock_codes: 股票代碼清單
         force_update: 是否強制更新資料（忽略快取）
@@ -280,31 +796,104 @@ def fetch_and_save_stock_data(stock_codes: list, force_update: bool = False) ->
     Returns:
         dict: 股票資料字典
     """
-    # 如果不強制更新，先嘗試載入今日快取
-    if not force_update:
-        cached_data = load_stock_data()
-        if cached_data is not None:
-            print("✅ 使用快取資料")
-            return cached_data
+    manifest = update_stock_cache(force_update)
+
+    missing = [code for code in stock_codes if code not in set(manifest.get('columns', []))]
+    if missing:
+        print(f"⚠️ 快取中沒有以下股票: {', '.join(missing)}")
+
+    return load_stock_data(stock_codes)
+
+
+@lru_cache(maxsize=OHLCV_CACHE_SIZE)
+def _load_ohlcv_cached(stock_code: str, version: int, cache_dir: str) -> pd.DataFrame:
+    """依快取版本記憶的個股 OHLCV 切片 (版本變動即自然失效)"""
+    manifest = _read_manifest(cache_dir)
+    columns = {}
+    for name in OHLCV_TABLES:
+        table = _read_table(os.path.join(cache_dir, name), manifest['tables'].get(name, []), [stock_code])
+        columns[name] = table[stock_code]
+
+    return pd.DataFrame(columns).dropna(subset=['close'])
+
+
+def stock_cache_version(cache_dir: str = None):
+    """
+    欄式快取目前的版本 (只讀取快取清單，不會抓取資料)
+
+    Returns:
+        int: 快取版本，快取不存在時返回 None
+    """
+    manifest = _read_manifest(cache_dir or CACHE_DIR)
+    return manifest['version'] if manifest else None
+
+
+def load_ohlcv(stock_code: str, cache_dir: str = None) -> tuple:
+    """
+    從欄式快取載入單一股票的 OHLCV (只讀取該股票的欄位)
+
+    只讀取既有快取，不會抓取 Finlab；快取由背景排程 (CacheRefresher) 以 update_stock_cache 更新。
+
+    Args:
+        stock_code: 股票代碼
+        cache_dir: 快取目錄，預設 data/stock_cache
+
+    Returns:
+        tuple: (DataFrame[open, high, low, close, volume], 快取版本字串)
+               快取內的 DataFrame 為共用物件，請勿修改
+    """
+    cache_dir = cache_dir or CACHE_DIR
+    manifest = _read_manifest(cache_dir)
+
+    if manifest is None or stock_code not in set(manifest.get('columns', [])):
+        return pd.DataFrame(columns=OHLCV_TABLES), None
 
-    # 從 Finlab 取得最新資料
-    print("📥 從 Finlab 取得最新資料...")
-    stock_data = fetch_stock_data(stock_codes)
+    version = manifest['version']
+    return _load_ohlcv_cached(stock_code, version, cache_dir), f"cache-{version}"
 
-    # 存儲資料
-    if stock_data is not None:
-        save_stock_data(stock_data)
 
-    return stock_data
+def resample_ohlcv(ohlcv: pd.DataFrame, rule: str) -> pd.DataFrame:
+    """
+    將日 K 彙整為週 / 月 K
+
+    Args:
+        ohlcv: 日 OHLCV DataFrame
+        rule: pandas 頻率字串，例如 'W-FRI'、'ME'
+
+    Returns:
+        DataFrame: 彙整後的 OHLCV
+    """
+    resampled = ohlcv.resample(rule).agg({
+        'open': 'first',
+        'high': 'max',
+        'low': 'min',
+        'close': 'last',
+        'volume': 'sum',
+    })
+    return resampled.dropna(subset=['close'])
 
 
 # 匯出函數
 __all__ = [
     'fetch_stock_data',
-    'fetch_and_save_stock_data',  # 新增
-    'save_stock_data',             # 新增
-    'load_stock_data',             # 新增
+    'fetch_market_data',
+    'fetch_new_rows',
+    'fetch_datasets',
+    'merge_new_rows',
+    'MARKET_DATASETS',
+    'fetch_and_save_stock_data',
+    'update_stock_cache',
+    'save_stock_data',
+    'load_stock_data',
+    'load_ohlcv',
+    'stock_cache_version',
+    'resample_ohlcv',
+    'latest_trading_day',
+    'is_cache_stale',
     'calculate_technical_indicators',
+    'get_indicator',
+    'IndicatorCache',
+    'INDICATOR_CACHE',
     'load_industry_data',
     'calculate_industry_trend',
     'get_top_industries'
@@ -0,0 +1,275 @@
+"""
+資料刷新模組 - 背景排程更新 Finlab 快取資料，並以版本化快照原子替換
+
+收盤後與月營收公告期間自動抓取新資料列，於背景重建技術指標後，
+以單一參照替換的方式發布新快照，進行中的 callback 仍持有舊快照而不受影響。
+"""
+
+import threading
+from datetime import datetime, timedelta
+from types import MappingProxyType
+
+import pandas as pd
+
+from modules.data_fetcher import calculate_technical_indicators, fetch_datasets, merge_new_rows, update_stock_cache
+from modules.compact import compact_prices
+from modules.industry_registry import IndustryRegistry, get_registry
+
+# 收盤後更新價格資料 (Finlab 約於 15:00 後完成當日資料)
+PRICE_REFRESH_TIME = '15:30'
+# 價格尚未更新時的重試間隔與截止時間
+PRICE_RETRY_MINUTES = 30
+PRICE_RETRY_UNTIL = '21:00'
+# 月營收於每月 10 日前公告，1~12 日每天傍晚檢查一次
+REVENUE_REFRESH_TIME = '18:00'
+REVENUE_RELEASE_DAYS = range(1, 13)
+# 增量抓取時往前重疊的天數 (涵蓋資料修正)
+OVERLAP_DAYS = 7
+# 排程檢查間隔 (秒)
+CHECK_INTERVAL = 60
+
+PRICE_DATASETS = {
+    'close': 'price:收盤價',
+    'trade_value': 'price:成交金額',
+}
+REVENUE_DATASETS = {
+    'revenue_yoy': 'monthly_revenue:去年同月增減(%)',
+}
+
+# 目前發布中的快照 (整個 process 共用，透過參照替換更新)
+_current_snapshot = None
+
+
+def get_cached_data():
+    """
+    取得目前發布中的資料快照
+
+    callback 應在開頭取得一次快照並全程使用，以確保資料一致。
+
+    Returns:
+        MappingProxyType: 唯讀快照，包含 close / trade_value / revenue_yoy /
+        stock_names / industry / industry_df / indicators / version / data_date
+    """
+    return _current_snapshot
+
+
+def publish_snapshot(snapshot):
+    """
+    發布新快照 (單一參照替換)
+
+    Args:
+        snapshot: build_snapshot 建立的快照
+    """
+    global _current_snapshot
+    _current_snapshot = snapshot
+
+
+def build_snapshot(tables: dict, stock_names: dict, industry, seq: int = 0):
+    """
+    建立唯讀的版本化資料快照 (含技術指標)
+
+    Args:
+        tables: {'close', 'trade_value', 'revenue_yoy'} DataFrame 字典
+        stock_names: 股票名稱對照表
+        industry: IndustryRegistry 或產業分類 DataFrame (欄位 細產業別 / 代碼)
+        seq: 快照序號，每次替換遞增
+
+    Returns:
+        MappingProxyType: 唯讀快照
+    """
+    if not isinstance(industry, IndustryRegistry):
+        industry = IndustryRegistry.from_frame(industry)
+
+    # 快照與指標快取皆以精簡型別 (float32) 存放
+    close = compact_prices(tables['close'])
+    data_date = close.index[-1]
+    version = f"{data_date.strftime('%Y%m%d')}.{seq}"
+
+    snapshot = {
+        'close': close,
+        'trade_value': compact_prices(tables['trade_value']),
+        'revenue_yoy': compact_prices(tables['revenue_yoy']),
+        'stock_names': stock_names,
+        'industry': industry,
+        'industry_df': industry.to_frame(),
+        'indicators': MappingProxyType(calculate_technical_indicators(close, version=version)),
+        'version': version,
+        'seq': seq,
+        'data_date': data_date,
+        'loaded_at': datetime.now(),
+    }
+    return MappingProxyType(snapshot)
+
+
+def _at_or_after(now: datetime, hhmm: str) -> bool:
+    """判斷 now 是否已過當日的 hh:mm"""
+    hour, minute = map(int, hhmm.split(':'))
+    return (now.hour, now.minute) >= (hour, minute)
+
+
+class CacheRefresher:
+    """
+    背景排程器：收盤後與月營收公告期間增量更新資料並替換快照
+    """
+
+    def __init__(self, snapshot, window_days: int = 120):
+        """
+        Args:
+            snapshot: 啟動時載入的初始快照
+            window_days: 保留的資料天數 (與啟動時的 truncate_start 一致)
+        """
+        self.window_days = window_days
+        self._refresh_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._last_attempt = {'price': None, 'revenue': None}
+        publish_snapshot(snapshot)
+
+    def refresh(self, kinds=('price', 'revenue')) -> bool:
+        """
+        立即增量更新指定資料並於有變動時發布新快照
+
+        Args:
+            kinds: 要更新的資料類別 ('price' / 'revenue')
+
+        Returns:
+            bool: 是否發布了新快照
+        """
+        with self._refresh_lock:
+            current = get_cached_data()
+            tables = {name: current[name] for name in ('close', 'trade_value', 'revenue_yoy')}
+
+            datasets = {}
+            if 'price' in kinds:
+                datasets.update(PRICE_DATASETS)
+            if 'revenue' in kinds:
+                datasets.update(REVENUE_DATASETS)
+
+            window_start = pd.Timestamp(datetime.now() - timedelta(days=self.window_days))
+            # 各資料集共用同一個起始日並行抓取 (取最早需要的日期，重疊部分由 merge_new_rows 以新資料為準)
+            since = min(
+                tables[name].index[-1] - timedelta(days=OVERLAP_DAYS) if not tables[name].empty else window_start
+                for name in datasets
+            )
+            new_rows = fetch_datasets(datasets, start=since, universe=None,
+                                      align=[name for name in PRICE_DATASETS if name in datasets])
+            changed = False
+            for name in datasets:
+                old_df = tables[name]
+                merged = compact_prices(merge_new_rows(old_df, new_rows[name]))
+                merged = merged[merged.index >= window_start]
+                if not merged.equals(old_df):
+                    tables[name] = merged
+                    changed = True
+
+            if not changed:
+                print(f"[REFRESH] {'/'.join(kinds)} 無新資料 (版本 {current['version']})")
+                return False
+
+            snapshot = build_snapshot(
+                tables,
+                stock_names=current['stock_names'],
+                industry=current['industry'],
+                seq=current['seq'] + 1,
+            )
+            publish_snapshot(snapshot)
+            print(f"[REFRESH] 已替換快照 {current['version']} -> {snapshot['version']}")
+            return True
+
+    def _due_jobs(self, now: datetime) -> list:
+        """回傳目前到期的排程工作"""
+        jobs = []
+        today = now.date()
+
+        # 價格：交易日收盤後，當日資料尚未進來就每 PRICE_RETRY_MINUTES 重試
+        last = self._last_attempt['price']
+        if (now.weekday() < 5
+                and _at_or_after(now, PRICE_REFRESH_TIME)
+                and not _at_or_after(now, PRICE_RETRY_UNTIL)
+                and get_cached_data()['data_date'].date() < today
+                and (last is None or now - last >= timedelta(minutes=PRICE_RETRY_MINUTES))):
+            jobs.append('price')
+
+        # 月營收：公告期間每天檢查一次
+        last = self._last_attempt['revenue']
+        if (now.day in REVENUE_RELEASE_DAYS
+                and _at_or_after(now, REVENUE_REFRESH_TIME)
+                and (last is None or last.date() < today)):
+            jobs.append('revenue')
+
+        return jobs
+
+    def reload_industry(self) -> bool:
+        """
+        產業分類 CSV 有更新時以新的註冊表發布快照 (價格資料不變)
+
+        Returns:
+            bool: 是否發布了新快照
+        """
+        with self._refresh_lock:
+            current = get_cached_data()
+            industry = current['industry']
+            if industry.path is None:
+                return False
+            registry = get_registry(industry.path)
+            if registry is industry:
+                return False
+
+            tables = {name: current[name] for name in ('close', 'trade_value', 'revenue_yoy')}
+            snapshot = build_snapshot(tables, current['stock_names'], registry, seq=current['seq'] + 1)
+            publish_snapshot(snapshot)
+            print(f"[REFRESH] 產業分類已更新，替換快照 {current['version']} -> {snapshot['version']}")
+            return True
+
+    def refresh_stock_cache(self):
+        """
+        K 線圖欄式快取落後最新交易日時增量更新
+
+        在背景執行緒呼叫；callback 中的 load_ohlcv 只讀取快取，不會同步抓取 Finlab。
+        """
+        try:
+            update_stock_cache()
+        except Exception as e:
+            print(f"[REFRESH] K 線快取更新失敗: {e}")
+
+    def _run(self):
+        """排程迴圈"""
+        self.refresh_stock_cache()
+        while not self._stop_event.wait(CHECK_INTERVAL):
+            try:
+                self.reload_industry()
+            except Exception as e:
+                print(f"[REFRESH] 產業分類重新載入失敗: {e}")
+            self.refresh_stock_cache()
+
+            now = datetime.now()
+            jobs = self._due_jobs(now)
+            if not jobs:
+                continue
+            for job in jobs:
+                self._last_attempt[job] = now
+            try:
+                self.refresh(jobs)
+            except Exception as e:
+                print(f"[REFRESH] 更新失敗: {e}")
+
+    def start(self):
+        """啟動背景排程執行緒 (重複呼叫不會重複啟動)"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='cache-refresher', daemon=True)
+        self._thread.start()
+        print(f"[REFRESH] 排程啟動：價格 {PRICE_REFRESH_TIME} 後、月營收 {REVENUE_REFRESH_TIME} 後更新")
+
+    def stop(self):
+        """停止背景排程"""
+        self._stop_event.set()
+
+
+__all__ = [
+    'get_cached_data',
+    'publish_snapshot',
+    'build_snapshot',
+    'CacheRefresher',
+]
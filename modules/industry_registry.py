@@ -0,0 +1,237 @@
+"""
+產業分類註冊表 - 將產業分類 CSV 編譯為整數編碼的股票 / 族群與 CSR 成員陣列
+
+各程式原本各自 read_csv 後以 groupby().apply(list) 建立 股票 -> 族群 對照表；
+改由此模組編譯一次：
+    - codes / sectors: 排序後的股票代碼與族群名稱 (位置即整數 id)
+    - sector_indptr / sector_members: 族群 -> 成分股 id (CSR)
+    - stock_indptr / stock_sectors: 股票 -> 所屬族群 id (CSR)
+編譯結果存成 CSV 旁的二進位 sidecar ({csv}.registry.npz，記錄來源檔的 mtime / 大小)，
+下次直接載入；get_registry 每次呼叫只 stat 一次檔案，CSV 更新後自動重新編譯 (hot reload)。
+"""
+
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+# 專案根目錄下的產業分類資料庫
+DEFAULT_INDUSTRY_CSV = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '產業分類資料庫.csv')
+SIDECAR_SUFFIX = '.registry.npz'
+
+SECTOR_COLUMN = '細產業別'
+CODE_COLUMN = '代碼'
+NAME_COLUMN = '商品'
+
+
+def _csr(rows: np.ndarray, values: np.ndarray, n_rows: int):
+    """(rows, values) 配對依 rows 排序後建立 CSR (indptr, values)"""
+    order = np.lexsort((values, rows))
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+    return indptr, values[order].astype(np.int32)
+
+
+class IndustryRegistry:
+    """
+    產業分類註冊表 (唯讀)
+
+    Args:
+        codes: 股票代碼 (排序)
+        sectors: 族群名稱 (排序)
+        names: 股票名稱 (同 codes 順序，無名稱為空字串)
+        pair_sector: 每個 (族群, 股票) 配對的族群 id
+        pair_stock: 每個配對的股票 id
+        source: (路徑, mtime, 大小)
+    """
+
+    def __init__(self, codes, sectors, names, pair_sector, pair_stock, source=(None, None, None)):
+        self.codes = np.asarray(codes, dtype=object)
+        self.sectors = np.asarray(sectors, dtype=object)
+        self.names = np.asarray(names, dtype=object)
+        self.code_id = {code: i for i, code in enumerate(self.codes)}
+        self.sector_id = {sector: i for i, sector in enumerate(self.sectors)}
+        self.pair_sector = np.asarray(pair_sector, dtype=np.int32)
+        self.pair_stock = np.asarray(pair_stock, dtype=np.int32)
+        self.path, self.mtime, self.size = source
+
+        self.sector_indptr, self.sector_members = _csr(self.pair_sector, self.pair_stock, len(self.sectors))
+        self.stock_indptr, self.stock_sectors = _csr(self.pair_stock, self.pair_sector, len(self.codes))
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, source=(None, None, None)):
+        """
+        由產業分類 DataFrame (欄位 細產業別 / 代碼，選用 商品) 編譯
+
+        Returns:
+            IndustryRegistry
+        """
+        df = df.dropna(subset=[SECTOR_COLUMN, CODE_COLUMN])
+        code_cat = pd.Categorical(df[CODE_COLUMN].astype(str).str.strip())
+        sector_cat = pd.Categorical(df[SECTOR_COLUMN].astype(str))
+        pairs = np.unique(np.stack([sector_cat.codes, code_cat.codes], axis=1), axis=0)
+
+        names = np.full(len(code_cat.categories), '', dtype=object)
+        if NAME_COLUMN in df.columns:
+            named = df[NAME_COLUMN].notna().to_numpy()
+            names[code_cat.codes[named]] = df.loc[named, NAME_COLUMN].astype(str).to_numpy()
+
+        return cls(code_cat.categories, sector_cat.categories, names, pairs[:, 0], pairs[:, 1], source)
+
+    @classmethod
+    def compile(cls, csv_path: str):
+        """
+        由 CSV 編譯
+
+        Returns:
+            IndustryRegistry
+        """
+        stat = os.stat(csv_path)
+        df = pd.read_csv(csv_path, encoding='utf-8-sig', dtype={CODE_COLUMN: str})
+        return cls.from_frame(df, (csv_path, stat.st_mtime, stat.st_size))
+
+    def save(self, path):
+        """存成 sidecar (npz)"""
+        np.savez(
+            path,
+            codes=self.codes.astype(str), sectors=self.sectors.astype(str), names=self.names.astype(str),
+            pair_sector=self.pair_sector, pair_stock=self.pair_stock,
+            source=np.asarray([self.mtime, self.size], dtype=float),
+        )
+
+    @classmethod
+    def load(cls, csv_path: str):
+        """
+        讀取註冊表：sidecar 與 CSV 的 mtime / 大小相符時直接載入，否則重新編譯並更新 sidecar
+
+        Returns:
+            IndustryRegistry
+        """
+        stat = os.stat(csv_path)
+        sidecar = csv_path + SIDECAR_SUFFIX
+        try:
+            with np.load(sidecar) as f:
+                mtime, size = f['source'].tolist()
+                if mtime == stat.st_mtime and size == stat.st_size:
+                    return cls(f['codes'].tolist(), f['sectors'].tolist(), f['names'].tolist(),
+                               f['pair_sector'], f['pair_stock'], (csv_path, mtime, int(size)))
+        except (FileNotFoundError, KeyError, ValueError, OSError):
+            pass
+
+        registry = cls.compile(csv_path)
+        try:
+            # 寫到暫存檔再替換，避免其他程序讀到寫一半的 sidecar
+            tmp = sidecar + '.tmp.npz'
+            registry.save(tmp)
+            os.replace(tmp, sidecar)
+        except OSError as e:
+            print(f"[WARN] 無法寫入產業分類 sidecar {sidecar}: {e}")
+        return registry
+
+    def stocks_of(self, sector: str) -> list:
+        """族群成分股代碼"""
+        i = self.sector_id.get(sector)
+        if i is None:
+            return []
+        return self.codes[self.sector_members[self.sector_indptr[i]:self.sector_indptr[i + 1]]].tolist()
+
+    def sectors_of(self, code: str) -> list:
+        """股票所屬族群"""
+        i = self.code_id.get(code)
+        if i is None:
+            return []
+        return self.sectors[self.stock_sectors[self.stock_indptr[i]:self.stock_indptr[i + 1]]].tolist()
+
+    def _member_mask(self, universe) -> np.ndarray:
+        """各配對 (依 CSR 成員順序) 的股票是否在 universe 內"""
+        if universe is None:
+            return np.ones(len(self.sector_members), dtype=bool)
+        inside = np.zeros(len(self.codes), dtype=bool)
+        ids = [self.code_id[code] for code in universe if code in self.code_id]
+        inside[ids] = True
+        return inside[self.sector_members]
+
+    def sector_stocks(self, universe=None, min_size: int = 1) -> dict:
+        """
+        族群 -> 成分股代碼
+
+        Args:
+            universe: 只保留此集合內的股票 (例如 close.columns)，None 表示全部
+            min_size: 限縮後成分股數少於此值的族群不列入
+
+        Returns:
+            dict: {族群: [股票代碼, ...]}
+        """
+        keep = self._member_mask(universe)
+        member_sector = np.repeat(np.arange(len(self.sectors)), np.diff(self.sector_indptr))
+        counts = np.bincount(member_sector[keep], minlength=len(self.sectors))
+        result = {}
+        for i in np.flatnonzero(counts >= max(min_size, 1)).tolist():
+            start, end = self.sector_indptr[i], self.sector_indptr[i + 1]
+            members = self.sector_members[start:end][keep[start:end]]
+            result[self.sectors[i]] = self.codes[members].tolist()
+        return result
+
+    def stock_to_sectors(self, universe=None, min_size: int = 1) -> dict:
+        """
+        股票 -> 所屬族群 (族群篩選規則同 sector_stocks)
+
+        Returns:
+            dict: {股票代碼: [族群, ...]}
+        """
+        mapping = {}
+        for sector, codes in self.sector_stocks(universe, min_size).items():
+            for code in codes:
+                mapping.setdefault(code, []).append(sector)
+        return mapping
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        還原為產業分類 DataFrame (欄位 細產業別 / 代碼 / 商品，依族群、代碼排序)
+
+        Returns:
+            pd.DataFrame
+        """
+        stocks = self.sector_members
+        sectors = np.repeat(np.arange(len(self.sectors)), np.diff(self.sector_indptr))
+        return pd.DataFrame({
+            SECTOR_COLUMN: self.sectors[sectors],
+            CODE_COLUMN: self.codes[stocks],
+            NAME_COLUMN: self.names[stocks],
+        })
+
+
+_registries = {}
+_registry_lock = threading.Lock()
+
+
+def get_registry(csv_path: str = None) -> IndustryRegistry:
+    """
+    取得產業分類註冊表 (同一路徑共用；CSV 更新後下次呼叫自動重新載入)
+
+    Args:
+        csv_path: CSV 路徑，預設為專案目錄下的 產業分類資料庫.csv
+
+    Returns:
+        IndustryRegistry
+    """
+    path = os.path.abspath(str(csv_path or DEFAULT_INDUSTRY_CSV))
+    stat = os.stat(path)
+    registry = _registries.get(path)
+    if registry is not None and registry.mtime == stat.st_mtime and registry.size == stat.st_size:
+        return registry
+    with _registry_lock:
+        registry = _registries.get(path)
+        if registry is None or registry.mtime != stat.st_mtime or registry.size != stat.st_size:
+            if registry is not None:
+                print(f"[INFO] 產業分類已更新，重新載入 {path}")
+            registry = _registries[path] = IndustryRegistry.load(path)
+        return registry
+
+
+__all__ = [
+    'DEFAULT_INDUSTRY_CSV',
+    'IndustryRegistry',
+    'get_registry',
+]
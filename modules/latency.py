@@ -0,0 +1,172 @@
+"""
+即時延遲追蹤模組 - 量測 tick 從交易所時間到入庫 / 快照 / 畫面更新的延遲
+
+各階段延遲皆以交易所成交時間為起點 (需本機時鐘與交易所校時)：
+    store     tick 寫入 DataStore
+    snapshot  process_dataframes 產生包含該 tick 的快照
+    rendered  update_charts 以該快照 (或更新的快照) 完成圖表 (不含瀏覽器傳輸與繪製)；
+              推播模式下走勢圖由瀏覽器端直接更新，伺服器端重繪只是定期校正，不列入此階段
+"""
+
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+
+from modules.telemetry import REGISTRY
+
+STAGES = ('store', 'snapshot', 'rendered')
+# 每個階段保留的最近樣本數 (滾動 p50/p99)
+LATENCY_WINDOW = 5000
+# 等待快照的 tick 上限 (快照停擺時避免無限累積)
+MAX_PENDING = 50000
+
+TICK_LATENCY = REGISTRY.gauge(
+    'realtime_tick_latency_seconds', '即時 tick 各階段延遲 (滾動分位數)')
+TICKS_TRACED = REGISTRY.counter(
+    'realtime_ticks_traced_total', '已追蹤延遲的 tick 數')
+
+
+def exchange_time_to_epoch(raw_time, today=None):
+    """
+    將行情的成交時間 (HHMMSS + 6 位微秒，前導零可省略) 轉為 epoch 秒數
+
+    Args:
+        raw_time: 行情成交時間欄位
+        today: 交易日期，預設為今天
+
+    Returns:
+        float: epoch 秒數，格式不符時返回 None
+    """
+    s = str(raw_time).strip()
+    if len(s) <= 6 or not s.isdigit():
+        return None
+    hhmmss = s[:-6].zfill(6)
+    micro = int(s[-6:])
+    today = today or datetime.now().date()
+    try:
+        ts = datetime(today.year, today.month, today.day,
+                      int(hhmmss[0:2]), int(hhmmss[2:4]), int(hhmmss[4:6]), micro)
+    except ValueError:
+        return None
+    return ts.timestamp()
+
+
+def _format_seconds(seconds: float) -> str:
+    return f"{seconds * 1000:.0f}ms" if abs(seconds) < 1 else f"{seconds:.1f}s"
+
+
+class LatencyTracker:
+    """
+    tick 延遲追蹤器
+
+    流程:
+        on_store(exchange_ts)     tick 入庫時呼叫 (redis 執行緒)，依序編號
+        sequence                  擷取快照資料時讀取，標記已納入快照的最後一筆 tick
+        on_snapshot(version, upto)  產生新快照後呼叫 (processing 執行緒)
+        on_render(version)        callback 以某版本快照完成圖表後呼叫
+
+    Args:
+        window: 每個階段保留的樣本數
+        track_render: 是否追蹤 rendered 階段 (推播模式為 False)
+    """
+
+    def __init__(self, window: int = LATENCY_WINDOW, track_render: bool = True):
+        self.stages = STAGES if track_render else tuple(s for s in STAGES if s != 'rendered')
+        self._samples = {stage: deque(maxlen=window) for stage in self.stages}
+        # 已入庫、尚未進入快照的 tick: [(序號, 交易所時間)]
+        self._pending = deque(maxlen=MAX_PENDING)
+        self._sequence = 0
+        # 已進入快照、尚未畫面更新的批次: [(version, exchange_ts ndarray)]
+        self._unrendered = deque()
+        self._lock = threading.Lock()
+
+    def on_store(self, exchange_ts: float):
+        now = time.time()
+        with self._lock:
+            self._samples['store'].append(now - exchange_ts)
+            self._sequence += 1
+            self._pending.append((self._sequence, exchange_ts))
+
+    @property
+    def sequence(self) -> int:
+        """最後一筆已入庫 tick 的序號"""
+        return self._sequence
+
+    def on_snapshot(self, version: int, upto: int = None):
+        """
+        結算已進入快照的 tick；擷取快照資料後才入庫的 tick 留給下一次快照
+
+        Args:
+            version: 快照版本
+            upto: 擷取快照資料時的 sequence，預設為目前全部
+        """
+        now = time.time()
+        batch = []
+        pending = self._pending
+        with self._lock:
+            upto = self._sequence if upto is None else upto
+            while pending and pending[0][0] <= upto:
+                batch.append(pending.popleft()[1])
+        if not batch:
+            return
+        exchange_ts = np.asarray(batch)
+        with self._lock:
+            self._samples['snapshot'].extend((now - exchange_ts).tolist())
+            if 'rendered' in self._samples:
+                self._unrendered.append((version, exchange_ts))
+        TICKS_TRACED.inc(len(batch))
+
+    def on_render(self, version: int):
+        """
+        記錄畫面更新延遲；同一批 tick 只計入第一次被畫出的時間
+        (較新的快照包含先前所有 tick，因此一併結算較舊的批次)
+        """
+        if 'rendered' not in self._samples:
+            self.export()
+            return
+        now = time.time()
+        with self._lock:
+            while self._unrendered and self._unrendered[0][0] <= version:
+                _, exchange_ts = self._unrendered.popleft()
+                self._samples['rendered'].extend((now - exchange_ts).tolist())
+        self.export()
+
+    def percentiles(self, stage: str, quantiles=(50, 99)) -> dict:
+        """
+        Returns:
+            dict: {quantile: 秒數}，尚無樣本時返回空字典
+        """
+        with self._lock:
+            values = np.fromiter(self._samples[stage], dtype=float)
+        if values.size == 0:
+            return {}
+        return dict(zip(quantiles, np.percentile(values, quantiles).tolist()))
+
+    def summary(self) -> dict:
+        """各階段的 p50 / p99"""
+        return {stage: self.percentiles(stage) for stage in self.stages}
+
+    def export(self):
+        """更新 /metrics 上的分位數 gauge"""
+        for stage, values in self.summary().items():
+            for q, seconds in values.items():
+                TICK_LATENCY.set(round(seconds, 4), stage=stage, quantile=f"0.{q:02d}")
+
+    def format_summary(self) -> str:
+        """標題列顯示用文字"""
+        labels = {'store': '入庫', 'snapshot': '快照', 'rendered': '畫面'}
+        parts = []
+        for stage, values in self.summary().items():
+            if values:
+                parts.append(f"{labels[stage]} {_format_seconds(values[50])}/{_format_seconds(values[99])}")
+        return "延遲 p50/p99 " + " · ".join(parts) if parts else "延遲: 等待行情..."
+
+
+__all__ = [
+    'STAGES',
+    'LatencyTracker',
+    'exchange_time_to_epoch',
+]
@@ -0,0 +1,400 @@
+"""
+盤中暫定評分模組 - 以最新成交價作為暫定收盤價，逐 tick O(1) 更新均線與 MACD
+
+每日評分 (precompute_scores.py) 收盤後寫出各股的延續狀態 (種子)：
+    前 9 / 19 / 59 日收盤價總和、EMA12 / EMA26 與 MACD，以及營收 / 族群 / 成交值三項分數。
+盤中每筆 tick 只需以種子加上最新價計算：
+    MA_n  = (前 n-1 日總和 + 價格) / n
+    EMA_n = α·價格 + (1-α)·昨日 EMA_n，α = 2 / (n+1)
+    MACD  = EMA12 - EMA26，MACD 強勢為 MACD > 0 且大於昨日 MACD
+每分鐘發布一次暫定 70 分評分，不必重跑每日流程。
+
+熱門族群 (族群 10 日漲幅前五大) 同樣以種子接續：各族群 10 日前的平均股價 (基準) 與成分股昨收，
+盤中只對有新成交的股票調整所屬族群的價格總和，每次快照重新排序。
+"""
+
+import threading
+from types import MappingProxyType
+
+import numpy as np
+import pandas as pd
+
+SCORE_SEED_FILE = 'live_score_seed.parquet'
+SECTOR_SEED_FILE = 'live_sector_seed.parquet'
+MA_WINDOWS = (10, 20, 60)
+MACD_FAST = 12
+MACD_SLOW = 26
+# 成交值活絡：今日未收盤，延續前 9 日是否進入前 30 大 (今日補足 10 日)
+VOLUME_CARRY_DAYS = 9
+# 熱門族群：族群平均股價 N 日漲幅前幾名
+SECTOR_RETURN_DAYS = 10
+HOT_SECTOR_COUNT = 5
+
+SEED_COLUMNS = [
+    'close', 'sum9', 'sum19', 'sum59', 'ema_fast', 'ema_slow', 'macd',
+    'ma_bullish', 'macd_bullish', 'score_revenue', 'score_sector', 'score_volume', 'valid',
+]
+
+
+def build_score_seed(close: pd.DataFrame, score_revenue: pd.Series, score_sector: pd.Series,
+                     score_volume: pd.Series, valid: pd.Series) -> pd.DataFrame:
+    """
+    由日收盤價建立盤中評分種子 (最後一個交易日的延續狀態)
+
+    Args:
+        close: 日收盤價 (日期 x 股票)，最後一列為最近交易日
+        score_revenue: 各股營收分數 (0 / 10)
+        score_sector: 各股族群分數 (0 / 10)
+        score_volume: 各股成交值分數 (0 / 10)
+        valid: 各股是否符合月均成交值門檻
+
+    Returns:
+        pd.DataFrame: index 為股票代碼，欄位為 SEED_COLUMNS；attrs['seed_date'] 為種子日期
+    """
+    seed = pd.DataFrame(index=close.columns)
+    seed['close'] = close.iloc[-1]
+    # 任一日缺值則總和為 NaN，與 rolling(n).mean() 相同
+    for n in MA_WINDOWS:
+        seed[f'sum{n - 1}'] = close.iloc[-(n - 1):].sum(min_count=n - 1)
+
+    ema_fast = close.ewm(span=MACD_FAST, adjust=False).mean()
+    ema_slow = close.ewm(span=MACD_SLOW, adjust=False).mean()
+    macd = ema_fast - ema_slow
+    seed['ema_fast'] = ema_fast.iloc[-1]
+    seed['ema_slow'] = ema_slow.iloc[-1]
+    seed['macd'] = macd.iloc[-1]
+
+    # 種子日的技術面狀態，用來判斷盤中「新進」多排 / 強勢
+    ma = {n: close.iloc[-n:].sum(min_count=n) / n for n in MA_WINDOWS}
+    seed['ma_bullish'] = (ma[10] > ma[20]) & (ma[20] > ma[60])
+    seed['macd_bullish'] = (macd.iloc[-1] > 0) & (macd.iloc[-1] > macd.iloc[-2])
+
+    for name, values in (('score_revenue', score_revenue), ('score_sector', score_sector),
+                         ('score_volume', score_volume)):
+        seed[name] = values.reindex(close.columns).fillna(0).astype(int)
+    seed['valid'] = valid.reindex(close.columns).fillna(False).astype(bool)
+
+    seed.attrs['seed_date'] = close.index[-1].strftime('%Y-%m-%d')
+    return seed[SEED_COLUMNS]
+
+
+def build_sector_seed(close: pd.DataFrame, sector_stocks: dict) -> pd.DataFrame:
+    """
+    建立盤中熱門族群種子 (與每日評分相同的族群平均股價定義)
+
+    Args:
+        close: 日收盤價 (日期 x 股票)，最後一列為最近交易日
+        sector_stocks: {族群: [股票代碼, ...]} (已排除成分股不足的族群)
+
+    Returns:
+        pd.DataFrame: 欄位 sector / code / close (成分股昨收) / base (族群今日的 N 日前平均股價)；
+        attrs['seed_date'] 為種子日期
+    """
+    # 今日的 N 日前 = 歷史資料倒數第 N 列
+    base_row = close.iloc[-SECTOR_RETURN_DAYS]
+    last_row = close.iloc[-1]
+    frames = []
+    for sector, stocks in sector_stocks.items():
+        frames.append(pd.DataFrame({
+            'sector': sector,
+            'code': stocks,
+            'close': last_row.reindex(stocks).to_numpy(),
+            'base': base_row.reindex(stocks).mean(),
+        }))
+    seed = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=['sector', 'code', 'close', 'base'])
+    seed.attrs['seed_date'] = close.index[-1].strftime('%Y-%m-%d')
+    return seed
+
+
+def load_score_seed(path):
+    """
+    讀取盤中評分 / 熱門族群種子
+
+    Args:
+        path: 種子 parquet 路徑
+
+    Returns:
+        pd.DataFrame: 種子，檔案不存在時返回 None
+    """
+    try:
+        return pd.read_parquet(path)
+    except FileNotFoundError:
+        return None
+
+
+class LiveSectorRanking:
+    """
+    盤中族群 N 日漲幅排行
+
+    成分股的暫定收盤價 = 最新成交價 (尚未成交則為昨收)。update 只記錄有新成交的股票，
+    refresh (每次快照) 僅對這些股票以價差調整所屬族群的價格總和，成本與變動檔數成正比。
+    不在 columns 內的成分股 (不會收到 tick) 固定以昨收計入。
+
+    Args:
+        columns: 股票代碼 (欄位順序，與 DataStore 的 CategoryIndex 一致)
+        seed: build_sector_seed 建立的種子
+        top_n: 熱門族群數
+    """
+
+    def __init__(self, columns, seed: pd.DataFrame, top_n: int = HOT_SECTOR_COUNT):
+        self.columns = np.asarray(list(columns), dtype=object)
+        self.seed_date = seed.attrs.get('seed_date')
+        self.top_n = top_n
+        position = {symbol: i for i, symbol in enumerate(self.columns)}
+        n_stocks = len(self.columns)
+
+        self.sectors = np.asarray(pd.unique(seed['sector']), dtype=object)
+        sector_id = {sector: i for i, sector in enumerate(self.sectors)}
+        n_sectors = len(self.sectors)
+        self._base = seed.groupby('sector', sort=False)['base'].first().reindex(self.sectors).to_numpy(dtype=float)
+
+        # 族群價格總和 / 有價格的成分股數 (Python list，逐檔調整)
+        self._sum = [0.0] * n_sectors
+        self._count = [0] * n_sectors
+        member_sectors = [[] for _ in range(n_stocks)]
+        # 各欄位目前已計入總和的價格
+        self._applied = [np.nan] * n_stocks
+        for sector, code, last_close in zip(seed['sector'], seed['code'], seed['close']):
+            s = sector_id[sector]
+            pos = position.get(code)
+            if pos is not None:
+                member_sectors[pos].append(s)
+                self._applied[pos] = last_close
+            if last_close == last_close:  # 非 NaN
+                self._sum[s] += last_close
+                self._count[s] += 1
+        self._member_sectors = [tuple(s) for s in member_sectors]
+        self._member_mask = np.zeros((n_sectors, n_stocks), dtype=bool)
+        for pos, sector_ids in enumerate(self._member_sectors):
+            self._member_mask[list(sector_ids), pos] = True
+
+        # 自上次 refresh 後有新成交的欄位 -> 最新價
+        self._changed = {}
+        self._lock = threading.Lock()
+        self.ranking = pd.Series(dtype=float)
+        self.top = []
+
+    def update(self, pos: int, price: float):
+        """記錄單檔最新成交價 (不屬於任何族群的股票直接略過)"""
+        if self._member_sectors[pos] and price > 0:
+            with self._lock:
+                self._changed[pos] = price
+
+    def refresh(self) -> pd.Series:
+        """
+        套用自上次 refresh 後的價格變動並重新排序
+
+        Returns:
+            pd.Series: 族群 N 日漲幅 (%)，依漲幅由大到小排序
+        """
+        with self._lock:
+            changed, self._changed = self._changed, {}
+
+        total, count, applied = self._sum, self._count, self._applied
+        for pos, price in changed.items():
+            old = applied[pos]
+            if price == old:
+                continue
+            if old != old:  # NaN：昨收缺值，第一次有價格
+                for s in self._member_sectors[pos]:
+                    total[s] += price
+                    count[s] += 1
+            else:
+                delta = price - old
+                for s in self._member_sectors[pos]:
+                    total[s] += delta
+            applied[pos] = price
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            avg = np.array(total) / np.array(count)
+            returns = (avg / self._base - 1) * 100
+        ranking = pd.Series(returns, index=self.sectors).dropna().sort_values(ascending=False, kind='stable')
+        self.ranking = ranking
+        self.top = ranking.index[:self.top_n].tolist()
+        return ranking
+
+    def hot_mask(self) -> np.ndarray:
+        """
+        屬於目前熱門族群的欄位
+
+        Returns:
+            np.ndarray: bool 陣列 (欄位順序同 columns)；尚未排序時返回 None
+        """
+        if not self.top:
+            return None
+        sector_ids = np.flatnonzero(np.isin(self.sectors, self.top))
+        return self._member_mask[sector_ids].any(axis=0)
+
+
+class ProvisionalScorer:
+    """
+    盤中暫定評分器
+
+    逐 tick 狀態以 Python list 保存 (純量存取較快)，每分鐘第一筆 tick 到達時
+    發布上一分鐘結束時的評分快照。
+
+    Args:
+        columns: 股票代碼 (欄位順序，與 DataStore 的 CategoryIndex 一致)
+        seed: build_score_seed 建立的種子
+        get_label: 股票顯示名稱函數，預設直接使用代碼
+    """
+
+    def __init__(self, columns, seed: pd.DataFrame, get_label=None):
+        self.columns = np.asarray(list(columns), dtype=object)
+        self.seed_date = seed.attrs.get('seed_date')
+        self.get_label = get_label or str
+        seed = seed.reindex(self.columns)
+        n_stocks = len(self.columns)
+
+        self._sum9 = seed['sum9'].astype(float).tolist()
+        self._sum19 = seed['sum19'].astype(float).tolist()
+        self._sum59 = seed['sum59'].astype(float).tolist()
+        self._ema_fast = seed['ema_fast'].astype(float).tolist()
+        self._ema_slow = seed['ema_slow'].astype(float).tolist()
+        self._macd_prev = seed['macd'].astype(float).tolist()
+        self._alpha_fast = 2 / (MACD_FAST + 1)
+        self._alpha_slow = 2 / (MACD_SLOW + 1)
+
+        self._prev_ma = seed['ma_bullish'].fillna(False).to_numpy(dtype=bool)
+        self._prev_macd = seed['macd_bullish'].fillna(False).to_numpy(dtype=bool)
+        self._valid = seed['valid'].fillna(False).to_numpy(dtype=bool)
+        # 營收 + 成交值 (盤中不變)；族群分數有 sector_ranking 時改用盤中熱門族群
+        self._carried = seed[['score_revenue', 'score_volume']].fillna(0).sum(axis=1).to_numpy()
+        self._carried_sector = seed['score_sector'].fillna(0).to_numpy()
+        self.sector_ranking = None
+
+        # 逐 tick 更新的暫定狀態
+        self._price = [np.nan] * n_stocks
+        self._macd = [np.nan] * n_stocks
+        self._ma_bullish = [False] * n_stocks
+        self._macd_bullish = [False] * n_stocks
+
+        # 目前累積中的分鐘；auto_publish 為 False 時不於換分鐘時發布 (例如載入歷史 Log 時)
+        self._minute = None
+        self.auto_publish = True
+        # 發布新評分後呼叫的函數 (參數為評分快照)
+        self.listeners = []
+        self._publish_lock = threading.Lock()
+        self.published = None
+
+    def update(self, pos: int, time_str: str, price: float):
+        """
+        以最新成交價更新單檔暫定均線 / MACD (O(1))
+
+        Args:
+            pos: 股票欄位位置
+            time_str: 'HH:MM'
+            price: 成交價 (視為暫定收盤價)
+        """
+        minute = self._minute
+        if minute is None or time_str > minute:
+            self._minute = time_str
+            if minute is not None and self.auto_publish:
+                self.publish(minute)
+        if not price > 0:
+            return
+
+        self._price[pos] = price
+        ma10 = (self._sum9[pos] + price) / 10
+        ma20 = (self._sum19[pos] + price) / 20
+        ma60 = (self._sum59[pos] + price) / 60
+        self._ma_bullish[pos] = ma10 > ma20 > ma60
+
+        ema_fast = self._alpha_fast * price + (1 - self._alpha_fast) * self._ema_fast[pos]
+        ema_slow = self._alpha_slow * price + (1 - self._alpha_slow) * self._ema_slow[pos]
+        macd = ema_fast - ema_slow
+        self._macd[pos] = macd
+        self._macd_bullish[pos] = macd > 0 and macd > self._macd_prev[pos]
+
+    def publish(self, minute: str = None):
+        """
+        發布目前狀態的暫定評分快照
+
+        Args:
+            minute: 快照時間 'HH:MM'，預設為目前累積中的分鐘
+
+        Returns:
+            MappingProxyType: 唯讀快照，包含 time / seed_date / columns / price / macd /
+            ma_bullish / macd_bullish / score (無成交或未達成交值門檻為 NaN) /
+            new_ma / new_macd (盤中新進的欄位位置)
+        """
+        with self._publish_lock:
+            price = np.array(self._price)
+            ma_bullish = np.array(self._ma_bullish)
+            macd_bullish = np.array(self._macd_bullish)
+            traded = ~np.isnan(price)
+            scorable = traded & self._valid
+
+            hot = self.sector_ranking.hot_mask() if self.sector_ranking is not None else None
+            sector_score = self._carried_sector if hot is None else hot * 10
+            score = self._carried + sector_score + ma_bullish * 20 + macd_bullish * 20
+            score = np.where(scorable, score, np.nan)
+
+            snapshot = {
+                'time': minute or self._minute,
+                'seed_date': self.seed_date,
+                'columns': self.columns,
+                'price': price,
+                'macd': np.array(self._macd),
+                'ma_bullish': ma_bullish,
+                'macd_bullish': macd_bullish,
+                'score': score,
+                # 種子日未符合、盤中轉為符合的股票
+                'new_ma': (scorable & ma_bullish & ~self._prev_ma).nonzero()[0],
+                'new_macd': (scorable & macd_bullish & ~self._prev_macd).nonzero()[0],
+            }
+            for array in snapshot.values():
+                if isinstance(array, np.ndarray):
+                    array.flags.writeable = False
+            self.published = MappingProxyType(snapshot)
+
+        for listener in self.listeners:
+            try:
+                listener(self.published)
+            except Exception as e:
+                print(f"[WARN] 暫定評分 listener 失敗: {e}")
+        return self.published
+
+    def to_frame(self, snapshot=None, min_score: int = 0) -> pd.DataFrame:
+        """
+        暫定評分表 (依分數排序)
+
+        Args:
+            snapshot: 評分快照，預設為最近發布的快照
+            min_score: 最低分數
+
+        Returns:
+            pd.DataFrame: 欄位 代碼 / 名稱 / 暫定總分 / 最新價 / 均線多排 / MACD強勢 / 新進
+        """
+        snapshot = snapshot or self.published
+        if snapshot is None:
+            return pd.DataFrame(columns=['代碼', '名稱', '暫定總分', '最新價', '均線多排', 'MACD強勢', '新進'])
+
+        score = snapshot['score']
+        rows = np.flatnonzero(score >= min_score)
+        new_ma = np.isin(rows, snapshot['new_ma'])
+        new_macd = np.isin(rows, snapshot['new_macd'])
+        labels = np.where(new_ma & new_macd, '均線多排 / MACD強勢',
+                          np.where(new_ma, '均線多排', np.where(new_macd, 'MACD強勢', '')))
+
+        df = pd.DataFrame({
+            '代碼': self.columns[rows],
+            '名稱': [self.get_label(s) for s in self.columns[rows]],
+            '暫定總分': score[rows].astype(int),
+            '最新價': np.round(snapshot['price'][rows], 2),
+            '均線多排': snapshot['ma_bullish'][rows],
+            'MACD強勢': snapshot['macd_bullish'][rows],
+            '新進': labels,
+        })
+        return df.sort_values('暫定總分', ascending=False, kind='stable').reset_index(drop=True)
+
+
+__all__ = [
+    'SCORE_SEED_FILE',
+    'SECTOR_SEED_FILE',
+    'build_score_seed',
+    'build_sector_seed',
+    'load_score_seed',
+    'LiveSectorRanking',
+    'ProvisionalScorer',
+]
@@ -0,0 +1,223 @@
+"""
+分鐘 K 棒模組 - 逐 tick 累積每檔股票的 1 分鐘 OHLCV 與 VWAP (欄式陣列)
+
+所有欄位皆為 (盤中分鐘, 股票) 的 NumPy 陣列；每檔進行中的那一根 K 棒以 Python list 累積
+(純量存取較快)，換分鐘或讀取時才寫回陣列，每筆 tick 為 O(1)。
+5 / 15 分鐘等週期直接由 1 分鐘陣列 reshape 彙總，不需重新掃描 tick。
+"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+# 台股盤中時段 (含 13:30 收盤集合競價)
+SESSION_START = '09:00'
+SESSION_END = '13:30'
+# 支援的彙總週期 (分鐘)
+RESAMPLE_MINUTES = (1, 5, 15)
+
+BAR_FIELDS = ['open', 'high', 'low', 'close', 'volume', 'vwap']
+
+
+def _to_minutes(hhmm: str) -> int:
+    hour, minute = map(int, hhmm.split(':'))
+    return hour * 60 + minute
+
+
+def session_times(start: str = SESSION_START, end: str = SESSION_END) -> list:
+    """盤中每分鐘的 'HH:MM' 標籤"""
+    return [f"{m // 60:02d}:{m % 60:02d}" for m in range(_to_minutes(start), _to_minutes(end) + 1)]
+
+
+class MinuteBars:
+    """
+    1 分鐘 OHLCV / VWAP 欄式存儲
+
+    Args:
+        n_stocks: 股票數 (欄位數，與 DataStore 的 CategoryIndex 欄位順序一致)
+        start: 盤中開始時間 'HH:MM'
+        end: 盤中結束時間 'HH:MM' (早於 start / 晚於 end 的 tick 歸入第一 / 最後一根)
+    """
+
+    def __init__(self, n_stocks: int, start: str = SESSION_START, end: str = SESSION_END):
+        self.times = session_times(start, end)
+        self._start = _to_minutes(start)
+        n_minutes = len(self.times)
+        self._minute_index = {t: i for i, t in enumerate(self.times)}
+
+        self.open = np.full((n_minutes, n_stocks), np.nan)
+        self.high = np.full((n_minutes, n_stocks), np.nan)
+        self.low = np.full((n_minutes, n_stocks), np.nan)
+        self.close = np.full((n_minutes, n_stocks), np.nan)
+        self.volume = np.zeros((n_minutes, n_stocks))
+        # 成交金額 (價格 x 量)，VWAP = turnover / volume
+        self.turnover = np.zeros((n_minutes, n_stocks))
+        # 已有資料的最後一根 (-1 表示尚無資料)
+        self.last_minute = -1
+        self.lock = threading.Lock()
+
+        # 各股進行中的 K 棒：[分鐘, open, high, low, close, volume, turnover]，None 表示尚無
+        self._current = [None] * n_stocks
+
+    def minute_of(self, time_str: str) -> int:
+        """'HH:MM' 轉為分鐘列索引 (超出盤中時段則夾在頭尾)"""
+        idx = self._minute_index.get(time_str)
+        if idx is None:
+            idx = min(max(_to_minutes(time_str) - self._start, 0), len(self.times) - 1)
+        return idx
+
+    def update(self, pos: int, time_str: str, price: float, volume: float):
+        """
+        以一筆 tick 更新對應分鐘的 K 棒
+
+        Args:
+            pos: 股票欄位位置
+            time_str: 'HH:MM'
+            price: 成交價
+            volume: 成交量
+        """
+        m = self.minute_of(time_str)
+        with self.lock:
+            bar = self._current[pos]
+            if bar is not None and bar[0] == m:
+                if price > bar[2]:
+                    bar[2] = price
+                if price < bar[3]:
+                    bar[3] = price
+                bar[4] = price
+                bar[5] += volume
+                bar[6] += price * volume
+                return
+
+            if bar is not None and m < bar[0]:
+                # 延遲到達的舊分鐘 tick：直接更新陣列
+                self._update_array(m, pos, price, volume)
+                return
+
+            if bar is not None:
+                self._write_bar(pos, bar)
+            self._current[pos] = [m, price, price, price, price, volume, price * volume]
+            if m > self.last_minute:
+                self.last_minute = m
+
+    def _write_bar(self, pos: int, bar: list):
+        m, o, h, l, c, v, t = bar
+        self.open[m, pos] = o
+        self.high[m, pos] = h
+        self.low[m, pos] = l
+        self.close[m, pos] = c
+        self.volume[m, pos] = v
+        self.turnover[m, pos] = t
+
+    def _update_array(self, m: int, pos: int, price: float, volume: float):
+        if self.open[m, pos] != self.open[m, pos]:  # NaN：此分鐘第一筆
+            self.open[m, pos] = price
+            self.high[m, pos] = price
+            self.low[m, pos] = price
+        else:
+            self.high[m, pos] = max(self.high[m, pos], price)
+            self.low[m, pos] = min(self.low[m, pos], price)
+        self.close[m, pos] = price
+        self.volume[m, pos] += volume
+        self.turnover[m, pos] += price * volume
+
+    def _flush(self):
+        """將進行中的 K 棒寫回陣列 (需持有 lock)"""
+        for pos, bar in enumerate(self._current):
+            if bar is not None:
+                self._write_bar(pos, bar)
+
+    def close_matrix(self):
+        """
+        複製目前為止的分鐘收盤矩陣
+
+        Returns:
+            tuple: (times, close ndarray (分鐘, 股票))
+        """
+        with self.lock:
+            self._flush()
+            end = self.last_minute + 1
+            return self.times[:end], self.close[:end].copy()
+
+    def resample(self, minutes: int = 1, positions=None) -> dict:
+        """
+        彙總為 N 分鐘 K 棒
+
+        Args:
+            minutes: 週期 (1 / 5 / 15)
+            positions: 股票欄位位置陣列，None 表示全部
+
+        Returns:
+            dict: {'times': [...], 'open'/'high'/'low'/'close'/'volume'/'vwap': ndarray (K 棒, 股票)}
+        """
+        if minutes not in RESAMPLE_MINUTES:
+            raise ValueError(f"不支援的週期: {minutes} (可用 {RESAMPLE_MINUTES})")
+
+        cols = slice(None) if positions is None else positions
+        with self.lock:
+            self._flush()
+            end = self.last_minute + 1
+            o = self.open[:end, cols].copy()
+            h = self.high[:end, cols].copy()
+            l = self.low[:end, cols].copy()
+            c = self.close[:end, cols].copy()
+            v = self.volume[:end, cols].copy()
+            t = self.turnover[:end, cols].copy()
+        times = self.times[:end]
+
+        if minutes > 1 and end:
+            # 補齊到週期整數倍後 reshape 成 (K 棒, 週期, 股票)
+            n_bars = -(-end // minutes)
+            pad = n_bars * minutes - end
+            n_cols = o.shape[1]
+
+            def blocks(a, fill):
+                if pad:
+                    a = np.vstack([a, np.full((pad, n_cols), fill)])
+                return a.reshape(n_bars, minutes, n_cols)
+
+            o, h, l, c = (blocks(a, np.nan) for a in (o, h, l, c))
+            v, t = blocks(v, 0.0), blocks(t, 0.0)
+
+            valid = ~np.isnan(c)
+            first = valid.argmax(axis=1)
+            last = minutes - 1 - valid[:, ::-1, :].argmax(axis=1)
+            rows = np.arange(n_bars)[:, None]
+            cols_idx = np.arange(n_cols)[None, :]
+            o = o[rows, first, cols_idx]
+            c = c[rows, last, cols_idx]
+            # fmax / fmin 忽略 NaN，整段無成交時仍為 NaN
+            h = np.fmax.reduce(h, axis=1)
+            l = np.fmin.reduce(l, axis=1)
+            v = v.sum(axis=1)
+            t = t.sum(axis=1)
+            times = times[::minutes]
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            vwap = np.where(v > 0, t / v, np.nan)
+        return {'times': list(times), 'open': o, 'high': h, 'low': l, 'close': c, 'volume': v, 'vwap': vwap}
+
+    def get_bars(self, pos: int, minutes: int = 1) -> pd.DataFrame:
+        """
+        單一股票的盤中 K 棒 (只保留有成交的 K 棒)
+
+        Args:
+            pos: 股票欄位位置
+            minutes: 週期 (1 / 5 / 15)
+
+        Returns:
+            pd.DataFrame: index 為 'HH:MM'，欄位 open / high / low / close / volume / vwap
+        """
+        bars = self.resample(minutes, positions=np.asarray([pos]))
+        df = pd.DataFrame({field: bars[field][:, 0] for field in BAR_FIELDS}, index=bars['times'])
+        return df[df['volume'] > 0]
+
+
+__all__ = [
+    'SESSION_START',
+    'SESSION_END',
+    'RESAMPLE_MINUTES',
+    'MinuteBars',
+    'session_times',
+]
@@ -0,0 +1,183 @@
+"""
+效能量測模組 - 記錄各階段耗時、處理資料量與記憶體 (JSON lines)，並可選擇啟用 profiler
+"""
+
+import cProfile
+import json
+import pstats
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import psutil
+except ImportError:  # psutil 為選用套件
+    psutil = None
+
+
+def get_rss_mb() -> float:
+    """目前行程的常駐記憶體 (MB)，無法取得時返回 None"""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / 1024 / 1024
+    return None
+
+
+def get_peak_rss_mb() -> float:
+    """行程啟動以來的峰值常駐記憶體 (MB)，無法取得時返回 None"""
+    if psutil is not None:
+        info = psutil.Process().memory_info()
+        # Windows 提供 peak_wset；其他平台退回目前 RSS
+        peak = getattr(info, 'peak_wset', None)
+        if peak is not None:
+            return peak / 1024 / 1024
+    try:
+        import resource
+    except ImportError:
+        return get_rss_mb()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 單位為 KB，macOS 為 bytes
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+class StageTracer:
+    """
+    階段量測器 - 每個 span 記錄耗時、資料量 (rows x cols) 與峰值 RSS
+
+    用法:
+        tracer = StageTracer('precompute_all_scores', 'data/precompute_trace.jsonl')
+        with tracer.span('rolling_ma') as span:
+            ma10 = close.rolling(10).mean()
+            span['shape'] = close.shape
+        tracer.print_summary()
+    """
+
+    def __init__(self, run_name: str, log_path=None):
+        """
+        Args:
+            run_name: 執行名稱
+            log_path: JSON lines 輸出路徑，None 表示不寫檔
+        """
+        self.run_name = run_name
+        self.run_id = uuid.uuid4().hex[:8]
+        self.log_path = log_path
+        self.spans = []
+        self._started = time.perf_counter()
+
+    def _emit(self, record: dict):
+        self.spans.append(record)
+        if self.log_path is None:
+            return
+        with open(self.log_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    @contextmanager
+    def span(self, name: str, **fields):
+        """
+        量測一個階段
+
+        Args:
+            name: 階段名稱
+            **fields: 額外記錄的欄位
+
+        Yields:
+            dict: 可於區塊內設定 'shape' (rows, cols) 或其他欄位
+        """
+        info = dict(fields)
+        rss_before = get_rss_mb()
+        start = time.perf_counter()
+        error = None
+        try:
+            yield info
+        except Exception as e:
+            error = repr(e)
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            shape = info.pop('shape', None)
+            rss_after = get_rss_mb()
+            peak_rss = get_peak_rss_mb()
+            record = {
+                'run': self.run_name,
+                'run_id': self.run_id,
+                'stage': name,
+                'ts': datetime.now().isoformat(timespec='seconds'),
+                'duration_s': round(duration, 4),
+                'rows': int(shape[0]) if shape else None,
+                'cols': int(shape[1]) if shape and len(shape) > 1 else None,
+                'rss_delta_mb': round(rss_after - rss_before, 1) if rss_after is not None else None,
+                'peak_rss_mb': round(peak_rss, 1) if peak_rss is not None else None,
+                **info,
+            }
+            if error:
+                record['error'] = error
+            self._emit(record)
+
+    def print_summary(self):
+        """輸出各階段耗時摘要 (依耗時排序)"""
+        total = time.perf_counter() - self._started
+        print(f"\n[PERF] 階段耗時摘要 ({self.run_name}, run {self.run_id}, 總計 {total:.2f} 秒)")
+        print(f"   {'階段':<24} {'秒':>8} {'占比':>6} {'rows x cols':>14} {'峰值RSS(MB)':>12}")
+        for record in sorted(self.spans, key=lambda r: r['duration_s'], reverse=True):
+            share = record['duration_s'] / total * 100 if total else 0
+            size = f"{record['rows']} x {record['cols']}" if record['rows'] is not None else '-'
+            peak = f"{record['peak_rss_mb']:.1f}" if record['peak_rss_mb'] is not None else '-'
+            print(f"   {record['stage']:<24} {record['duration_s']:>8.3f} {share:>5.1f}% {size:>14} {peak:>12}")
+        if self.log_path is not None:
+            print(f"   - 明細: {self.log_path}")
+
+
+@contextmanager
+def profiled(tool: str = None, output_path=None):
+    """
+    以 cProfile 或 pyinstrument 量測區塊 (tool 為 None 時不做任何事)
+
+    Args:
+        tool: 'cprofile' / 'pyinstrument' / None
+        output_path: 結果輸出路徑 (cProfile 為 .prof，pyinstrument 為 .html)
+    """
+    if tool is None:
+        yield
+        return
+
+    if tool == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            print("[WARN] 未安裝 pyinstrument，改用 cProfile")
+            tool = 'cprofile'
+
+    if tool == 'pyinstrument':
+        profiler = Profiler()
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            if output_path:
+                with open(output_path, 'w', encoding='utf-8') as f:
+                    f.write(profiler.output_html())
+                print(f"[PERF] pyinstrument 報告: {output_path}")
+            else:
+                print(profiler.output_text(unicode=True))
+        return
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        if output_path:
+            profiler.dump_stats(output_path)
+            print(f"[PERF] cProfile 結果: {output_path} (可用 snakeviz 或 pstats 檢視)")
+        pstats.Stats(profiler).sort_stats('cumulative').print_stats(20)
+
+
+__all__ = [
+    'get_rss_mb',
+    'get_peak_rss_mb',
+    'StageTracer',
+    'profiled',
+]
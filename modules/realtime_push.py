@@ -0,0 +1,129 @@
+"""
+即時推播模組 - 以 Server-Sent Events 廣播 DataStore 快照差異
+
+每次 DataStore 產生新快照時只計算一次差異 (各股最新價與成交量)，
+所有連線的分頁共用同一份 payload，伺服器成本不再隨分頁數 x 輪詢頻率成長。
+
+payload 格式 (JSON):
+    {"v": 快照版本, "t": "HH:MM", "full": 是否為完整狀態, "rows": {代碼: [價格, 成交量]}}
+"""
+
+import json
+import threading
+
+# 沒有新快照時送出 keepalive 的間隔 (秒)，避免代理伺服器中斷連線
+KEEPALIVE_SECONDS = 15
+
+
+class SnapshotBroadcaster:
+    """
+    快照差異廣播器
+
+    Args:
+        store: DataStore，產生新快照後呼叫 on_snapshot
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._payload = None
+        self._last_rows = {}
+        self._subscribers = 0
+
+    @staticmethod
+    def _rows(snapshot):
+        """快照中有成交的股票最新價格與累積成交量"""
+        traded = (snapshot['volumes'] > 0).nonzero()[0]
+        return {
+            symbol: [price, volume]
+            for symbol, price, volume in zip(snapshot['columns'][traded].tolist(),
+                                             snapshot['prices'][traded].tolist(),
+                                             snapshot['volumes'][traded].tolist())
+        }
+
+    @staticmethod
+    def _time(snapshot):
+        times = snapshot['trend_times']
+        return times[-1] if times else None
+
+    def _full_payload(self):
+        snapshot = self.store.get_snapshot()
+        rows = self._rows(snapshot)
+        return {'v': snapshot['version'], 't': self._time(snapshot), 'full': True, 'rows': rows}, rows
+
+    def on_snapshot(self, version: int):
+        """DataStore 產生新快照後呼叫：計算差異並喚醒所有連線"""
+        if not self._subscribers:
+            return
+        snapshot = self.store.get_snapshot()
+        rows = self._rows(snapshot)
+        diff = {
+            symbol: values for symbol, values in rows.items()
+            if self._last_rows.get(symbol) != values
+        }
+        payload = {'v': snapshot['version'], 't': self._time(snapshot), 'full': False, 'rows': diff}
+        with self._cond:
+            self._last_rows = rows
+            self._seq += 1
+            self._payload = json.dumps(payload, separators=(',', ':'))
+            self._cond.notify_all()
+
+    def stream(self):
+        """
+        SSE 產生器：先送完整狀態，之後每個新快照送一次差異；
+        若連線落後 (錯過中間的差異) 則改送完整狀態
+        """
+        with self._cond:
+            self._subscribers += 1
+            full, rows = self._full_payload()
+            if not self._last_rows:
+                self._last_rows = rows
+            last_seq = self._seq
+        try:
+            yield f"data: {json.dumps(full, separators=(',', ':'))}\n\n"
+            while True:
+                with self._cond:
+                    self._cond.wait_for(lambda: self._seq != last_seq, timeout=KEEPALIVE_SECONDS)
+                    seq, payload = self._seq, self._payload
+                if seq == last_seq:
+                    yield ": keepalive\n\n"
+                    continue
+                if seq != last_seq + 1:
+                    full, _ = self._full_payload()
+                    payload = json.dumps(full, separators=(',', ':'))
+                last_seq = seq
+                yield f"data: {payload}\n\n"
+        finally:
+            with self._cond:
+                self._subscribers -= 1
+
+    @property
+    def subscribers(self) -> int:
+        return self._subscribers
+
+
+def register_stream_endpoint(server, broadcaster, path: str = '/realtime/stream'):
+    """
+    在 Flask server 上註冊 SSE 端點
+
+    Args:
+        server: Dash app 的 Flask server (app.server)
+        broadcaster: SnapshotBroadcaster
+        path: 端點路徑
+    """
+    from flask import Response, stream_with_context
+
+    @server.route(path)
+    def realtime_stream():
+        headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        return Response(stream_with_context(broadcaster.stream()),
+                        mimetype='text/event-stream', headers=headers)
+
+    return realtime_stream
+
+
+__all__ = [
+    'SnapshotBroadcaster',
+    'register_stream_endpoint',
+]
@@ -0,0 +1,355 @@
+"""
+即時資料存儲模組 - 彙整 Redis tick 並產生戰情室所需的 DataFrame
+"""
+
+import threading
+import time
+from collections import OrderedDict, defaultdict, deque
+from datetime import datetime
+from types import MappingProxyType
+
+import numpy as np
+import pandas as pd
+
+from modules.minute_bars import MinuteBars
+from modules.volume_profile import VOLUME_SPIKE_RATIO
+
+# 累積多少筆新 tick 就立即重建快照 (開盤 / 收盤集合競價時)
+REBUILD_MIN_TICKS = 500
+# 有新 tick 時，最晚多久內必須重建 (秒)
+REBUILD_MAX_DELAY = 2.0
+# 兩次重建的最短間隔 (秒)，避免爆量時連續重建佔滿 CPU
+REBUILD_MIN_INTERVAL = 0.5
+# 前端輪詢間隔範圍 (毫秒)；行情停止超過 POLL_IDLE_AFTER 秒即採用最長間隔
+POLL_MIN_MS = 500
+POLL_MAX_MS = 10000
+POLL_IDLE_AFTER = 30
+# 自訂族群位置陣列的快取上限 (各瀏覽器的自訂族群各自快取)
+CUSTOM_GROUP_CACHE_SIZE = 256
+
+TREEMAP_COLUMNS = ['category2', 'symbol', 'display_name', 'pct', 'volume', 'vol_ratio']
+_EMPTY_POSITIONS = np.empty(0, dtype=np.intp)
+
+
+class CategoryIndex:
+    """
+    族群 -> 欄位位置索引
+
+    趨勢矩陣的欄位順序固定為 columns，族群成分股以位置陣列表示，
+    取族群切片時直接以 NumPy fancy indexing (matrix[:, positions]) 取值。
+
+    Args:
+        columns: 股票代碼 (欄位順序)
+        stock_categories: {股票代碼: [族群, ...]}
+    """
+
+    def __init__(self, columns, stock_categories):
+        self.columns = np.asarray(list(columns), dtype=object)
+        self.position = {symbol: i for i, symbol in enumerate(self.columns)}
+
+        members = defaultdict(list)
+        for i, symbol in enumerate(self.columns):
+            for category in stock_categories.get(symbol, []):
+                members[category].append(i)
+        self.categories = np.asarray(sorted(members), dtype=object)
+        self.category_id = {category: i for i, category in enumerate(self.categories)}
+        self._positions = {
+            category: np.asarray(members[category], dtype=np.intp) for category in self.categories
+        }
+
+        # 攤平的 (族群 id, 股票位置) 配對：treemap 一次展開，不必逐檔逐族群建立紀錄
+        lengths = [len(self._positions[c]) for c in self.categories]
+        self.pair_category = np.repeat(np.arange(len(self.categories), dtype=np.intp), lengths)
+        self.pair_position = (np.concatenate([self._positions[c] for c in self.categories])
+                              if len(self.categories) else _EMPTY_POSITIONS)
+
+        self._custom = OrderedDict()
+        self._custom_lock = threading.Lock()
+
+    def positions(self, category) -> np.ndarray:
+        """內建族群的欄位位置陣列"""
+        return self._positions.get(category, _EMPTY_POSITIONS)
+
+    def positions_of(self, symbols) -> np.ndarray:
+        """任意股票清單的欄位位置陣列 (略過不在索引內的代碼)"""
+        position = self.position
+        return np.fromiter((position[s] for s in symbols if s in position), dtype=np.intp)
+
+    def group_positions(self, name, members) -> np.ndarray:
+        """
+        自訂族群 (custom-groups-store) 的欄位位置陣列，依 (名稱, 成分股) 快取
+
+        Args:
+            name: 族群名稱
+            members: 成分股代碼清單
+        """
+        key = (name, tuple(members))
+        with self._custom_lock:
+            cached = self._custom.get(key)
+            if cached is not None:
+                self._custom.move_to_end(key)
+                return cached
+        positions = np.unique(self.positions_of(members))
+        with self._custom_lock:
+            self._custom[key] = positions
+            while len(self._custom) > CUSTOM_GROUP_CACHE_SIZE:
+                self._custom.popitem(last=False)
+        return positions
+
+    def register_custom_groups(self, groups: dict):
+        """預先建立自訂族群的位置陣列 (custom-groups-store 變動時呼叫)"""
+        for name, members in (groups or {}).items():
+            self.group_positions(name, members)
+
+
+def _readonly(array: np.ndarray) -> np.ndarray:
+    array.setflags(write=False)
+    return array
+
+
+def _build_snapshot(version, index, trend_times, trend_values, has_data, ref_prices,
+                    prices, volumes, volume_ratio, df_treemap, sector_returns=None):
+    """
+    建立唯讀快照：陣列設為不可寫入，讀取端不需加鎖或複製
+
+    Returns:
+        MappingProxyType: version / created_at / columns / trend_times / trend_values /
+        has_data / ref_prices / prices / volumes / volume_ratio / volume_spike / df_trend /
+        df_treemap / sector_returns (族群暫定 N 日漲幅排行，未啟用時為空 Series)
+    """
+    volume_spike = volume_ratio >= VOLUME_SPIKE_RATIO
+    for array in (trend_values, has_data, ref_prices, prices, volumes, volume_ratio, volume_spike):
+        _readonly(array)
+    df_trend = pd.DataFrame(trend_values, index=trend_times, columns=index.columns, copy=False)
+    return MappingProxyType({
+        'version': version,
+        'created_at': datetime.now(),
+        'columns': index.columns,
+        'trend_times': tuple(trend_times),
+        'trend_values': trend_values,
+        'has_data': has_data,
+        'ref_prices': ref_prices,
+        'prices': prices,
+        'volumes': volumes,
+        'volume_ratio': volume_ratio,
+        'volume_spike': volume_spike,
+        'df_trend': df_trend,
+        'df_treemap': df_treemap,
+        'sector_returns': sector_returns if sector_returns is not None else pd.Series(dtype=float),
+    })
+
+
+def _ffill_rows(values: np.ndarray) -> np.ndarray:
+    """沿 axis 0 向下補值 (等同 DataFrame.ffill)"""
+    mask = np.isnan(values)
+    if not mask.any():
+        return values
+    idx = np.where(mask, 0, np.arange(values.shape[0])[:, None])
+    np.maximum.accumulate(idx, axis=0, out=idx)
+    return values[idx, np.arange(values.shape[1])]
+
+
+class DataStore:
+    """
+    即時 tick 存儲：累積每檔股票的 1 分鐘 OHLCV (bars) 與成交量，並定期產生圖表用的唯讀快照
+
+    process_dataframes 以單一參照替換發布新快照 (snapshot)，callback 取得一次後全程使用，
+    不需加鎖；可比較 snapshot['version'] 判斷是否有新資料。
+
+    Args:
+        stock_categories: {股票代碼: [族群, ...]}
+        yesterday_close: 昨收價 Series (index 為股票代碼)
+        get_label: 股票顯示名稱函數，預設直接使用代碼
+        latency: LatencyTracker，追蹤 tick 到快照的延遲 (None 表示不追蹤)
+    """
+
+    def __init__(self, stock_categories, yesterday_close, get_label=None, latency=None):
+        self.stock_categories = stock_categories
+        self.yesterday_close = yesterday_close
+        self.get_label = get_label or str
+        self.latency = latency
+        # 重建排程：update_raw 計數，wait_for_changes 等待
+        self.pending_ticks = 0
+        self._first_pending_at = None
+        self._has_ticks = threading.Event()
+        self._enough_ticks = threading.Event()
+        self._rebuild_times = deque(maxlen=20)
+        # 產生新快照後呼叫的函數 (參數為快照版本)，例如推播廣播
+        self.listeners = []
+        # 盤中暫定評分器 / 族群 N 日漲幅排行 (欄位順序需同 category_index.columns)，None 表示不計算
+        self.scorer = None
+        self.sector_ranking = None
+        # 過去 N 日累積成交量曲線 (VolumeProfile，欄位需對齊 category_index.columns)，None 表示不計算量比
+        self.volume_profile = None
+        # 保護逐 tick 陣列 (寫入端 update_raw，讀取端 process_dataframes 擷取)
+        self._tick_lock = threading.Lock()
+
+        # 固定欄位順序的族群索引；不在 universe 內的代碼不列入趨勢矩陣
+        universe = sorted(set(yesterday_close.index) | set(stock_categories))
+        self.category_index = CategoryIndex(universe, stock_categories)
+        n_stocks = len(universe)
+        self._labels = np.asarray([self.get_label(s) for s in universe], dtype=object)
+
+        # 逐 tick 增量維護：最新漲跌幅與累積成交量
+        # 逐筆更新用 Python list (純量存取比 ndarray 快)，產生快照時才轉為陣列
+        ref = pd.to_numeric(yesterday_close.reindex(universe), errors='coerce').to_numpy(dtype=float)
+        self._ref = np.where(ref > 0, ref, np.nan).tolist()
+        self._last_pct = [np.nan] * n_stocks
+        self._volume = [0.0] * n_stocks
+        self._price = [np.nan] * n_stocks
+        # 盤中 1 分鐘 K 棒 (欄位順序同 category_index.columns)
+        self.bars = MinuteBars(n_stocks)
+
+        # 目前發布中的快照 (單一參照替換)
+        self.snapshot = _build_snapshot(
+            0, self.category_index, [], np.empty((0, n_stocks)), np.zeros(n_stocks, dtype=bool),
+            np.full(n_stocks, np.nan), np.full(n_stocks, np.nan), np.zeros(n_stocks), np.full(n_stocks, np.nan),
+            pd.DataFrame(columns=TREEMAP_COLUMNS),
+        )
+
+    @property
+    def version(self) -> int:
+        """目前快照版本"""
+        return self.snapshot['version']
+
+    def get_snapshot(self):
+        """取得目前發布中的唯讀快照"""
+        return self.snapshot
+
+    def update_raw(self, symbol, time_str, price, volume, exchange_ts=None):
+        # 不在 universe 內的代碼不列入
+        pos = self.category_index.position.get(symbol)
+        if pos is None:
+            return
+
+        with self._tick_lock:
+            self._update_stock(pos, price, volume)
+        self.bars.update(pos, time_str, price, volume)
+        if self.scorer is not None:
+            self.scorer.update(pos, time_str, price)
+        if self.sector_ranking is not None:
+            self.sector_ranking.update(pos, price)
+
+        if exchange_ts is not None and self.latency is not None:
+            self.latency.on_store(exchange_ts)
+
+        # 計數與事件在同一把鎖內更新 (process_dataframes 於鎖內歸零並清除事件)，不會遺失更新
+        with self._tick_lock:
+            self.pending_ticks += 1
+            if self._first_pending_at is None:
+                self._first_pending_at = time.monotonic()
+            self._has_ticks.set()
+            if self.pending_ticks >= REBUILD_MIN_TICKS:
+                self._enough_ticks.set()
+
+    def _update_stock(self, pos: int, price: float, volume: int):
+        """更新單檔最新漲跌幅與成交量"""
+        self._volume[pos] += volume
+        self._price[pos] = price
+        ref = self._ref[pos]
+        if not ref > 0:
+            # 沒有昨收時以第一筆成交價為基準
+            if not price > 0:
+                return
+            ref = self._ref[pos] = price
+        self._last_pct[pos] = (price - ref) / ref * 100
+
+    def wait_for_changes(self, idle_timeout: float = None) -> bool:
+        """
+        等到需要重建快照為止：累積 REBUILD_MIN_TICKS 筆新 tick，
+        或第一筆未處理 tick 已等待 REBUILD_MAX_DELAY 秒；行情閒置時不佔 CPU
+
+        Args:
+            idle_timeout: 沒有任何新 tick 時最多等待秒數 (None 表示一直等)
+
+        Returns:
+            bool: 是否有新 tick 需要重建
+        """
+        if not self._has_ticks.wait(idle_timeout):
+            # 逾時仍有未處理 tick 時照樣重建，避免事件狀態異常時永遠不再重建
+            return self.pending_ticks > 0
+        first = self._first_pending_at or time.monotonic()
+        remaining = REBUILD_MAX_DELAY - (time.monotonic() - first)
+        if remaining > 0:
+            self._enough_ticks.wait(remaining)
+        return True
+
+    def suggested_poll_interval(self) -> int:
+        """
+        依近期快照重建頻率建議前端輪詢間隔 (毫秒)
+
+        Returns:
+            int: 介於 POLL_MIN_MS 與 POLL_MAX_MS 之間
+        """
+        times = list(self._rebuild_times)
+        if len(times) < 2 or time.monotonic() - times[-1] > POLL_IDLE_AFTER:
+            return POLL_MAX_MS
+        gap_ms = (times[-1] - times[0]) / (len(times) - 1) * 1000
+        # 取整到 250ms，避免每次 callback 都微調 interval
+        gap_ms = round(gap_ms / 250) * 250
+        return int(min(max(gap_ms, POLL_MIN_MS), POLL_MAX_MS))
+
+    def process_dataframes(self):
+        # 在鎖內清除計數並擷取逐 tick 陣列 (只複製，不做計算)：之後進來的 tick 會觸發下一次重建
+        with self._tick_lock:
+            self.pending_ticks = 0
+            self._first_pending_at = None
+            self._has_ticks.clear()
+            self._enough_ticks.clear()
+            pct = np.array(self._last_pct)
+            volume = np.array(self._volume)
+            prices = np.array(self._price)
+            ref = np.array(self._ref)
+            # update_raw 先寫入資料才入庫編號，此序號以前的 tick 都已包含在擷取的陣列中
+            traced = self.latency.sequence if self.latency is not None else None
+        session_times, close = self.bars.close_matrix()
+
+        # 只保留有成交的分鐘
+        observed = ~np.isnan(close).all(axis=1)
+        if not observed.any(): return
+
+        index = self.category_index
+        trend_times = [t for t, keep in zip(session_times, observed) if keep]
+
+        # 量比：今日累積量 / 過去 N 日同一時間的平均累積量
+        if self.volume_profile is not None:
+            volume_ratio = self.volume_profile.ratios(volume, self.volume_profile.minute_of(trend_times[-1]))
+        else:
+            volume_ratio = np.full(len(volume), np.nan)
+
+        # 1. Treemap Data：以 (族群, 股票位置) 配對陣列一次展開
+        pair_pos = index.pair_position
+        traded = volume[pair_pos] > 0
+        pair_pos = pair_pos[traded]
+        new_df_treemap = pd.DataFrame({
+            'category2': index.categories[index.pair_category[traded]],
+            'symbol': index.columns[pair_pos],
+            'display_name': self._labels[pair_pos],
+            'pct': np.nan_to_num(pct[pair_pos]),
+            'volume': volume[pair_pos],
+            'vol_ratio': volume_ratio[pair_pos],
+        }, columns=TREEMAP_COLUMNS)
+
+        # 2. Trend Data：分鐘收盤矩陣 (time x stock) 向下補值
+        trend_values = _ffill_rows(close[observed])
+        has_data = ~np.isnan(trend_values).all(axis=0)
+        # 基準價：昨收，沒有昨收則用當日第一筆價格，再沒有則 100
+        ref_prices = np.where(np.isnan(ref), 100.0, ref)
+
+        # 3. 族群暫定 N 日漲幅：只套用上次快照後有成交的股票
+        sector_returns = self.sector_ranking.refresh() if self.sector_ranking is not None else None
+
+        version = self.snapshot['version'] + 1
+        self.snapshot = _build_snapshot(
+            version, index, trend_times, trend_values, has_data, ref_prices,
+            prices, volume, volume_ratio, new_df_treemap, sector_returns,
+        )
+        self._rebuild_times.append(time.monotonic())
+
+        if self.latency is not None:
+            self.latency.on_snapshot(version, traced)
+        for listener in self.listeners:
+            listener(version)
+
+
+__all__ = ['DataStore', 'CategoryIndex']
@@ -0,0 +1,206 @@
+"""
+評分事件模組 - 總分跨越門檻的事件表 (日期, 股票, 前一日總分, 當日總分, 新增 / 失去的評分項目)
+
+使用者關心的是「變化」：新達到 70 分、跌破 50 分。預計算時直接比較相鄰兩日產生事件，
+查詢「本週新進」只需讀取事件表，不必再比對兩整天的 total_score。
+
+事件以 append-only 方式存成目錄下的多個 parquet 分段 (每次預計算只附加新日期)：
+    {events_dir}/{起始YYYYMMDD}_{結束YYYYMMDD}.parquet
+需要以新規則重建時刪除整個目錄再執行預計算即可。
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from modules.score_index import COMPONENT_ALIASES, COMPONENT_TABLES
+
+SCORE_EVENTS_DIR = 'score_events'
+# 跨越任一門檻 (上穿或下穿) 即產生事件
+EVENT_LEVELS = (50, 60, 70)
+# 無評分 (未達月均成交值門檻) 視為此分數，進入 / 離開有效名單也會跨越門檻
+MISSING_SCORE = -1
+# 分段數超過此值時合併為單一檔案
+MAX_PARTS = 30
+
+# 評分項目位元順序 (gained / lost 欄位的 bit)
+COMPONENT_BITS = list(COMPONENT_TABLES)
+_COMPONENT_LABELS = {name: label for label, name in COMPONENT_ALIASES.items()}
+
+
+def component_names(mask: int) -> list:
+    """
+    位元遮罩轉為評分項目中文名稱
+
+    Args:
+        mask: gained / lost 欄位值
+
+    Returns:
+        list: 例如 ['均線多排', 'MACD強勢']
+    """
+    return [_COMPONENT_LABELS[name] for bit, name in enumerate(COMPONENT_BITS) if int(mask) >> bit & 1]
+
+
+def build_events(total_score: pd.DataFrame, components: dict) -> pd.DataFrame:
+    """
+    比較相鄰交易日產生跨越門檻事件
+
+    Args:
+        total_score: 總分 (日期 x 股票)，無評分為 NaN
+        components: {項目名稱: 分數 DataFrame}，名稱同 COMPONENT_TABLES，值 > 0 視為成立
+
+    Returns:
+        pd.DataFrame: 欄位 date / code / old_score / new_score / gained / lost，
+        依日期、代碼排序 (第一個日期沒有前一日可比較，不產生事件)
+    """
+    values = total_score.to_numpy(dtype=float)
+    scores = np.where(np.isnan(values), MISSING_SCORE, values).astype(np.int8)
+
+    bits = np.zeros(scores.shape, dtype=np.uint8)
+    for bit, name in enumerate(COMPONENT_BITS):
+        if name in components:
+            frame = components[name].reindex(index=total_score.index, columns=total_score.columns)
+            bits |= (frame.to_numpy(dtype=float) > 0).astype(np.uint8) << bit
+
+    old, new = scores[:-1], scores[1:]
+    crossed = np.zeros(new.shape, dtype=bool)
+    for level in EVENT_LEVELS:
+        crossed |= (old >= level) != (new >= level)
+
+    rows, cols = np.nonzero(crossed)
+    old_bits, new_bits = bits[:-1][rows, cols], bits[1:][rows, cols]
+    return pd.DataFrame({
+        'date': total_score.index[rows + 1],
+        'code': pd.Categorical(total_score.columns[cols]),
+        'old_score': old[rows, cols],
+        'new_score': new[rows, cols],
+        'gained': new_bits & ~old_bits,
+        'lost': old_bits & ~new_bits,
+    })
+
+
+class ScoreEventLog:
+    """
+    Append-only 評分事件存儲
+
+    Args:
+        path: 事件目錄 (不存在時於第一次 append 建立)
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+
+    def _parts(self) -> list:
+        if not os.path.isdir(self.path):
+            return []
+        return sorted(name for name in os.listdir(self.path) if name.endswith('.parquet'))
+
+    @property
+    def last_date(self):
+        """已存事件涵蓋的最後日期 (由分段檔名取得，不需讀檔)，無資料時為 None"""
+        parts = self._parts()
+        if not parts:
+            return None
+        return pd.Timestamp(parts[-1][:-len('.parquet')].split('_')[1])
+
+    def append(self, events: pd.DataFrame, through=None) -> int:
+        """
+        附加事件 (只保留晚於已存最後日期的部分，已存事件不會被改寫)
+
+        Args:
+            events: build_events 的結果
+            through: 此次計算涵蓋的最後日期，預設為 events 的最後日期
+                (沒有事件的日期也要記錄為已涵蓋，避免下次重複附加)
+
+        Returns:
+            int: 附加的事件數
+        """
+        last = self.last_date
+        if last is not None:
+            events = events[events['date'] > last]
+        if through is None:
+            if events.empty:
+                return 0
+            through = events['date'].max()
+        through = pd.Timestamp(through)
+        if last is not None and through <= last:
+            return 0
+
+        os.makedirs(self.path, exist_ok=True)
+        first = events['date'].min() if not events.empty else through
+        if last is not None:
+            first = max(first, last + pd.Timedelta(days=1))
+        name = f"{first.strftime('%Y%m%d')}_{through.strftime('%Y%m%d')}.parquet"
+        events.to_parquet(os.path.join(self.path, name), index=False)
+
+        if len(self._parts()) > MAX_PARTS:
+            self.compact()
+        return len(events)
+
+    def compact(self):
+        """合併所有分段為單一檔案"""
+        parts = self._parts()
+        if len(parts) <= 1:
+            return
+        events = self.read()
+        first = parts[0].split('_')[0]
+        through = parts[-1][:-len('.parquet')].split('_')[1]
+        merged = os.path.join(self.path, f"{first}_{through}.parquet")
+        tmp = merged + '.tmp'
+        events.to_parquet(tmp, index=False)
+        # 合併檔就位後才移除被取代的分段，中途失敗不會遺失事件
+        os.replace(tmp, merged)
+        for name in parts:
+            path = os.path.join(self.path, name)
+            if path != merged:
+                os.remove(path)
+
+    def read(self, start=None, end=None) -> pd.DataFrame:
+        """
+        讀取事件 (只讀取與日期區間重疊的分段)
+
+        Args:
+            start: 起始日期 (含)
+            end: 結束日期 (含)
+
+        Returns:
+            pd.DataFrame: 欄位同 build_events
+        """
+        start = None if start is None else pd.Timestamp(start)
+        end = None if end is None else pd.Timestamp(end)
+        frames = []
+        for name in self._parts():
+            first, through = (pd.Timestamp(d) for d in name[:-len('.parquet')].split('_'))
+            if (start is not None and through < start) or (end is not None and first > end):
+                continue
+            frames.append(pd.read_parquet(os.path.join(self.path, name)))
+        if not frames:
+            return pd.DataFrame(columns=['date', 'code', 'old_score', 'new_score', 'gained', 'lost'])
+
+        events = pd.concat(frames, ignore_index=True)
+        events['code'] = events['code'].astype(str)
+        if start is not None:
+            events = events[events['date'] >= start]
+        if end is not None:
+            events = events[events['date'] <= end]
+        return events.reset_index(drop=True)
+
+    def entrants(self, level: int = 70, start=None, end=None) -> pd.DataFrame:
+        """期間內由低於 level 上穿到 level 以上的事件"""
+        events = self.read(start, end)
+        return events[(events['old_score'] < level) & (events['new_score'] >= level)].reset_index(drop=True)
+
+    def dropouts(self, level: int = 50, start=None, end=None) -> pd.DataFrame:
+        """期間內由 level 以上跌破 level 的事件"""
+        events = self.read(start, end)
+        return events[(events['old_score'] >= level) & (events['new_score'] < level)].reset_index(drop=True)
+
+
+__all__ = [
+    'SCORE_EVENTS_DIR',
+    'EVENT_LEVELS',
+    'ScoreEventLog',
+    'build_events',
+    'component_names',
+]
@@ -0,0 +1,246 @@
+"""
+評分歷史索引模組 - 以股票為主的總分時間序列與各分數門檻的連續區段 (regime)
+
+total_score.parquet 為 (日期 x 股票)，查單一股票的歷史需逐欄掃描；
+此索引將總分轉置為 (股票, 日期) 的連續 int8 陣列，並預先計算每個門檻 (例如 >= 60)
+的連續區段，單一股票的歷史、首次達標與連續天數查詢只需讀取該股票自己的資料。
+"""
+
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+SCORE_HISTORY_FILE = 'score_history.npz'
+# 預先計算連續區段的分數門檻
+REGIME_LEVELS = (40, 50, 60, 70)
+# 無評分 (未達月均成交值門檻) 的存放值
+MISSING_SCORE = -1
+SPARKLINE_DAYS = 20
+SPARK_CHARS = '▁▂▃▄▅▆▇█'
+MAX_SCORE = 70
+
+
+def _runs(mask: np.ndarray):
+    """
+    各列 True 連續區段的起訖位置
+
+    Args:
+        mask: (股票, 日期) bool
+
+    Returns:
+        tuple: (indptr, starts, ends)，第 i 檔股票的區段為 starts[indptr[i]:indptr[i+1]]，
+        ends 為區段最後一天 (含)
+    """
+    n_rows, n_cols = mask.shape
+    padded = np.zeros((n_rows, n_cols + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask
+    edges = np.diff(padded, axis=1)
+    start_rows, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(start_rows, minlength=n_rows), out=indptr[1:])
+    return indptr, starts.astype(np.int32), (ends - 1).astype(np.int32)
+
+
+class ScoreHistoryIndex:
+    """
+    評分歷史索引
+
+    Args:
+        dates: 交易日 (DatetimeIndex)
+        columns: 股票代碼
+        scores: (股票, 日期) int8，無評分為 MISSING_SCORE
+        regimes: {門檻: (indptr, starts, ends)}，None 表示由 scores 計算
+    """
+
+    def __init__(self, dates, columns, scores: np.ndarray, regimes: dict = None):
+        self.dates = pd.DatetimeIndex(dates)
+        self.columns = np.asarray(list(columns), dtype=object)
+        self.position = {symbol: i for i, symbol in enumerate(self.columns)}
+        self.scores = np.ascontiguousarray(scores, dtype=np.int8)
+        if regimes is None:
+            regimes = {level: _runs(self.scores >= level) for level in REGIME_LEVELS}
+        self.regimes = regimes
+
+    @classmethod
+    def from_frame(cls, total_score: pd.DataFrame):
+        """
+        由 total_score (日期 x 股票) 建立索引
+
+        Returns:
+            ScoreHistoryIndex
+        """
+        values = total_score.to_numpy(dtype=float)
+        scores = np.where(np.isnan(values), MISSING_SCORE, values).astype(np.int8).T
+        return cls(total_score.index, total_score.columns, scores)
+
+    def merge(self, newer):
+        """
+        合併較新的索引 (日期取聯集，重疊日期以 newer 為準；股票取聯集，缺少的日期為無評分)
+
+        預計算每次只重算最近一段期間，合併後首次達標與連續區段以完整歷史計算。
+
+        Args:
+            newer: ScoreHistoryIndex
+
+        Returns:
+            ScoreHistoryIndex: 連續區段重新計算
+        """
+        kept = ~self.dates.isin(newer.dates)
+        n_kept = int(kept.sum())
+        dates = self.dates[kept].append(newer.dates)
+        order = np.argsort(dates.values, kind='stable')
+        columns = pd.Index(sorted(set(self.columns) | set(newer.columns)))
+
+        scores = np.full((len(columns), len(dates)), MISSING_SCORE, dtype=np.int8)
+        scores[columns.get_indexer(self.columns), :n_kept] = self.scores[:, kept]
+        scores[columns.get_indexer(newer.columns), n_kept:] = newer.scores
+        return ScoreHistoryIndex(dates[order], columns, scores[:, order])
+
+    def save(self, path):
+        """存成壓縮 npz"""
+        arrays = {}
+        for level, (indptr, starts, ends) in self.regimes.items():
+            arrays[f"regime_{level}_indptr"] = indptr
+            arrays[f"regime_{level}_starts"] = starts
+            arrays[f"regime_{level}_ends"] = ends
+        np.savez_compressed(
+            path,
+            dates=self.dates.values.astype('datetime64[D]'),
+            columns=self.columns.astype(str),
+            scores=self.scores,
+            **arrays,
+        )
+
+    @classmethod
+    def load(cls, path):
+        """
+        讀取索引
+
+        Returns:
+            ScoreHistoryIndex: 檔案不存在時返回 None
+        """
+        try:
+            f = np.load(path)
+        except FileNotFoundError:
+            return None
+        with f:
+            levels = sorted({int(key.split('_')[1]) for key in f.files if key.startswith('regime_')})
+            regimes = {
+                level: (f[f"regime_{level}_indptr"], f[f"regime_{level}_starts"], f[f"regime_{level}_ends"])
+                for level in levels
+            }
+            return cls(f['dates'], f['columns'].tolist(), f['scores'], regimes)
+
+    def _pos(self, stock_code: str) -> int:
+        try:
+            return self.position[stock_code]
+        except KeyError:
+            raise KeyError(f"找不到 {stock_code} 的評分歷史") from None
+
+    def _end(self, date) -> int:
+        """date (或之前最近的交易日) 之後的位置 (切片終點)"""
+        if date is None:
+            return len(self.dates)
+        return int(self.dates.searchsorted(pd.Timestamp(date), side='right'))
+
+    def history(self, stock_code: str, start=None, end=None) -> pd.Series:
+        """
+        單一股票的每日總分
+
+        Returns:
+            pd.Series: index 為日期，無評分為 NaN
+        """
+        row = self.scores[self._pos(stock_code)]
+        first = 0 if start is None else int(self.dates.searchsorted(pd.Timestamp(start)))
+        last = self._end(end)
+        values = row[first:last].astype(float)
+        values[values == MISSING_SCORE] = np.nan
+        return pd.Series(values, index=self.dates[first:last], name=stock_code)
+
+    def _segments(self, stock_code: str, level: int):
+        if level not in self.regimes:
+            raise KeyError(f"未預先計算門檻 {level} (可用: {sorted(self.regimes)})")
+        indptr, starts, ends = self.regimes[level]
+        pos = self._pos(stock_code)
+        return starts[indptr[pos]:indptr[pos + 1]], ends[indptr[pos]:indptr[pos + 1]]
+
+    def regime_table(self, stock_code: str, level: int) -> pd.DataFrame:
+        """
+        總分 >= level 的所有連續區段
+
+        Returns:
+            pd.DataFrame: 欄位 start / end / days (交易日數)
+        """
+        s, e = self._segments(stock_code, level)
+        return pd.DataFrame({'start': self.dates[s], 'end': self.dates[e], 'days': e - s + 1})
+
+    def first_reach(self, stock_code: str, level: int) -> dict:
+        """
+        首次達到 level 的日期與該次維持的交易日數
+
+        Returns:
+            dict: {'date', 'days'}，從未達到時返回 None
+        """
+        s, e = self._segments(stock_code, level)
+        if not len(s):
+            return None
+        return {'date': self.dates[s[0]], 'days': int(e[0] - s[0] + 1)}
+
+    def current_streak(self, stock_code: str, level: int, date=None) -> int:
+        """截至 date (預設最新) 連續維持 >= level 的交易日數"""
+        s, e = self._segments(stock_code, level)
+        last = self._end(date) - 1
+        k = int(np.searchsorted(s, last, side='right')) - 1
+        if last < 0 or k < 0 or e[k] < last:
+            return 0
+        return int(last - s[k] + 1)
+
+    def sparkline(self, stock_code: str, days: int = SPARKLINE_DAYS, end=None) -> str:
+        """
+        最近 N 個交易日的總分走勢 (▁ 到 █，無評分以 · 表示)
+
+        Returns:
+            str: 找不到股票時返回空字串
+        """
+        pos = self.position.get(stock_code)
+        if pos is None:
+            return ''
+        last = self._end(end)
+        row = self.scores[pos, max(last - days, 0):last]
+        chars = []
+        for score in row.tolist():
+            if score == MISSING_SCORE:
+                chars.append('·')
+            else:
+                chars.append(SPARK_CHARS[min(score * len(SPARK_CHARS) // (MAX_SCORE + 1), len(SPARK_CHARS) - 1)])
+        return ''.join(chars)
+
+
+@lru_cache(maxsize=2)
+def _load_cached(path: str, mtime: float):
+    return ScoreHistoryIndex.load(path)
+
+
+def load_score_history(path):
+    """
+    讀取評分歷史索引 (檔案更新後自動重新載入)
+
+    Returns:
+        ScoreHistoryIndex: 檔案不存在時返回 None
+    """
+    path = str(path)
+    if not os.path.exists(path):
+        return None
+    return _load_cached(path, os.path.getmtime(path))
+
+
+__all__ = [
+    'SCORE_HISTORY_FILE',
+    'REGIME_LEVELS',
+    'SPARKLINE_DAYS',
+    'ScoreHistoryIndex',
+    'load_score_history',
+]
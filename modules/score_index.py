@@ -0,0 +1,347 @@
+"""
+評分位元索引模組 - 每個評分項目、每個交易日一列 bitset (股票 universe 壓成 np.packbits)
+
+篩選條件直接在 uint8 位元列上做 AND / OR / NOT，「過去 N 日任一天 / 每一天」
+則對連續 N 列做 bitwise OR / AND 歸約，不必載入多個寬 parquet 再以 pandas 組合。
+
+用法:
+    index = ScoreBitmapIndex.load('data/score_bitmaps.npz')
+    # MACD 強勢且熱門族群，但過去 5 日都不是均線多排
+    index.query('MACD強勢 & 熱門族群 & ~any(均線多排, 5)', '2024-12-20')
+    # 也可直接組合運算式
+    index.query((C('macd') & C('sector')) & ~C('ma').any(5))
+"""
+
+import ast
+from abc import ABC, abstractmethod
+
+import numpy as np
+import pandas as pd
+
+SCORE_BITMAP_FILE = 'score_bitmaps.npz'
+
+# 評分項目 -> precompute_scores 輸出的 parquet 名稱
+COMPONENT_TABLES = {
+    'ma': 'score_ma',
+    'macd': 'score_macd',
+    'revenue': 'score_revenue',
+    'sector': 'score_sector',
+    'volume': 'score_volume',
+}
+# 查詢字串可用的中文名稱
+COMPONENT_ALIASES = {
+    '均線多排': 'ma',
+    'MACD強勢': 'macd',
+    '營收成長': 'revenue',
+    '熱門族群': 'sector',
+    '成交熱絡': 'volume',
+    '有效': 'valid',
+}
+
+
+class Term(ABC):
+    """
+    篩選運算式節點 (以 C('名稱') 建立，支援 & | ~ 與 .any(n) / .all(n))
+
+    evaluate 返回 (日期數, 位元組數) 的 uint8 位元矩陣，每列對應一個交易日。
+    """
+
+    def __and__(self, other):
+        return _Binary(np.bitwise_and, self, other)
+
+    def __or__(self, other):
+        return _Binary(np.bitwise_or, self, other)
+
+    def __invert__(self):
+        return _Not(self)
+
+    def any(self, days: int):
+        """過去 days 個交易日 (含當日) 任一天成立"""
+        return _Window('any', self, days)
+
+    def all(self, days: int):
+        """過去 days 個交易日 (含當日) 每一天都成立"""
+        return _Window('all', self, days)
+
+    @abstractmethod
+    def evaluate(self, index, start: int, stop: int) -> np.ndarray:
+        """返回 [start, stop) 列的位元矩陣"""
+
+
+class C(Term):
+    """單一評分項目"""
+
+    def __init__(self, name: str):
+        self.name = COMPONENT_ALIASES.get(name, name)
+
+    def evaluate(self, index, start, stop):
+        return index.bits(self.name)[start:stop]
+
+    def __repr__(self):
+        return f"C({self.name!r})"
+
+
+class _Binary(Term):
+    def __init__(self, op, left, right):
+        self.op, self.left, self.right = op, left, right
+
+    def evaluate(self, index, start, stop):
+        return self.op(self.left.evaluate(index, start, stop), self.right.evaluate(index, start, stop))
+
+
+class _Not(Term):
+    def __init__(self, term):
+        self.term = term
+
+    def evaluate(self, index, start, stop):
+        # 補數後清除 universe 之外的填充位元
+        return np.bitwise_and(np.invert(self.term.evaluate(index, start, stop)), index.universe_mask)
+
+
+class _Window(Term):
+    def __init__(self, mode: str, term, days: int):
+        if days < 1:
+            raise ValueError(f"視窗天數必須 >= 1: {days}")
+        self.mode, self.term, self.days = mode, term, days
+
+    def evaluate(self, index, start, stop):
+        # 多取前 days-1 列，資料起點之前的部分以實際可得的天數計算
+        first = max(start - (self.days - 1), 0)
+        rows = self.term.evaluate(index, first, stop)
+        # 各位元沿日期的累積成立次數，視窗內次數 = 兩端累積值相減 (不逐列迴圈)
+        counts = np.zeros((len(rows) + 1, rows.shape[1] * 8), dtype=np.int32)
+        np.cumsum(np.unpackbits(rows, axis=1), axis=0, out=counts[1:])
+        ends = np.arange(start - first + 1, stop - first + 1)
+        begins = np.maximum(ends - self.days, 0)
+        window = counts[ends] - counts[begins]
+        if self.mode == 'any':
+            flags = window > 0
+        else:
+            flags = window == (ends - begins)[:, None]
+        return np.packbits(flags, axis=1)
+
+
+class _QueryParser(ast.NodeVisitor):
+    """查詢字串 -> Term (只允許名稱、& | ~、any(名稱, N) / all(名稱, N))"""
+
+    def parse(self, expression: str) -> Term:
+        try:
+            tree = ast.parse(expression, mode='eval')
+        except SyntaxError as e:
+            raise ValueError(f"無法解析查詢: {expression}") from e
+        return self.visit(tree.body)
+
+    def visit_Name(self, node):
+        return C(node.id)
+
+    def visit_BinOp(self, node):
+        if isinstance(node.op, ast.BitAnd):
+            return self.visit(node.left) & self.visit(node.right)
+        if isinstance(node.op, ast.BitOr):
+            return self.visit(node.left) | self.visit(node.right)
+        raise ValueError(f"不支援的運算子: {type(node.op).__name__}")
+
+    def visit_BoolOp(self, node):
+        terms = [self.visit(value) for value in node.values]
+        result = terms[0]
+        for term in terms[1:]:
+            result = result & term if isinstance(node.op, ast.And) else result | term
+        return result
+
+    def visit_UnaryOp(self, node):
+        if isinstance(node.op, (ast.Invert, ast.Not)):
+            return ~self.visit(node.operand)
+        raise ValueError(f"不支援的運算子: {type(node.op).__name__}")
+
+    def visit_Call(self, node):
+        func = getattr(node.func, 'id', None)
+        if func not in ('any', 'all') or len(node.args) != 2 or not isinstance(node.args[1], ast.Constant):
+            raise ValueError("視窗條件格式為 any(條件, N) 或 all(條件, N)")
+        term = self.visit(node.args[0])
+        return term.any(int(node.args[1].value)) if func == 'any' else term.all(int(node.args[1].value))
+
+    def generic_visit(self, node):
+        raise ValueError(f"不支援的查詢語法: {type(node).__name__}")
+
+
+def parse_query(expression: str) -> Term:
+    """
+    解析查詢字串
+
+    Args:
+        expression: 例如 'MACD強勢 & 熱門族群 & ~any(均線多排, 5)'
+
+    Returns:
+        Term
+    """
+    return _QueryParser().parse(expression)
+
+
+class ScoreBitmapIndex:
+    """
+    評分位元索引
+
+    Args:
+        dates: 交易日 (DatetimeIndex)
+        columns: 股票代碼 (位元順序)
+        bitmaps: {項目名稱: (日期數, ceil(股票數 / 8)) uint8}
+    """
+
+    def __init__(self, dates, columns, bitmaps: dict):
+        self.dates = pd.DatetimeIndex(dates)
+        self.columns = np.asarray(list(columns), dtype=object)
+        self._bitmaps = dict(bitmaps)
+        self.universe_mask = np.packbits(np.ones(len(self.columns), dtype=bool))
+
+    @classmethod
+    def from_frames(cls, frames: dict):
+        """
+        由評分 DataFrame 建立索引
+
+        Args:
+            frames: {項目名稱: DataFrame (日期 x 股票)}，值 > 0 視為成立；
+                名稱為 'valid' 時以非 NaN 視為成立 (例如 total_score)
+
+        Returns:
+            ScoreBitmapIndex
+        """
+        dates = None
+        columns = set()
+        for df in frames.values():
+            dates = df.index if dates is None else dates.union(df.index)
+            columns.update(df.columns)
+        columns = sorted(columns)
+
+        bitmaps = {}
+        for name, df in frames.items():
+            aligned = df.reindex(index=dates, columns=columns)
+            flags = aligned.notna().to_numpy() if name == 'valid' else (aligned.to_numpy(dtype=float) > 0)
+            bitmaps[name] = np.packbits(flags, axis=1)
+        return cls(dates, columns, bitmaps)
+
+    def merge(self, newer):
+        """
+        合併較新的索引 (日期取聯集，重疊日期以 newer 為準；股票取聯集)
+
+        預計算每次只重算最近一段期間，合併後索引可涵蓋多年歷史。
+
+        Args:
+            newer: ScoreBitmapIndex
+
+        Returns:
+            ScoreBitmapIndex
+        """
+        kept = ~self.dates.isin(newer.dates)
+        dates = self.dates[kept].append(newer.dates)
+        order = np.argsort(dates.values, kind='stable')
+        columns = sorted(set(self.columns) | set(newer.columns))
+
+        def aligned(index, name, rows):
+            # rows: 要保留的日期 (bool)，展開為對齊合併後欄位的 bool 矩陣
+            flags = np.zeros((int(rows.sum()), len(columns)), dtype=bool)
+            if name in index._bitmaps:
+                position = pd.Index(columns).get_indexer(index.columns)
+                bits = index._bitmaps[name][rows]
+                flags[:, position] = np.unpackbits(bits, axis=1, count=len(index.columns)).astype(bool)
+            return flags
+
+        bitmaps = {}
+        for name in dict.fromkeys(list(self._bitmaps) + list(newer._bitmaps)):
+            flags = np.concatenate([
+                aligned(self, name, kept),
+                aligned(newer, name, np.ones(len(newer.dates), dtype=bool)),
+            ])
+            bitmaps[name] = np.packbits(flags[order], axis=1)
+        return ScoreBitmapIndex(dates[order], columns, bitmaps)
+
+    def save(self, path):
+        """存成壓縮 npz"""
+        np.savez_compressed(
+            path,
+            dates=self.dates.values.astype('datetime64[D]'),
+            columns=self.columns.astype(str),
+            **{f"bits_{name}": bits for name, bits in self._bitmaps.items()},
+        )
+
+    @classmethod
+    def load(cls, path):
+        """
+        讀取索引
+
+        Returns:
+            ScoreBitmapIndex: 檔案不存在時返回 None
+        """
+        try:
+            f = np.load(path)
+        except FileNotFoundError:
+            return None
+        with f:
+            bitmaps = {key[len('bits_'):]: f[key] for key in f.files if key.startswith('bits_')}
+            return cls(f['dates'], f['columns'].tolist(), bitmaps)
+
+    @property
+    def components(self) -> list:
+        return list(self._bitmaps)
+
+    def bits(self, name: str) -> np.ndarray:
+        """單一項目的位元矩陣"""
+        try:
+            return self._bitmaps[name]
+        except KeyError:
+            raise KeyError(f"未知的評分項目: {name} (可用: {', '.join(self._bitmaps)})") from None
+
+    def date_position(self, date=None) -> int:
+        """指定日期 (或之前最近的交易日) 的列位置，None 表示最新"""
+        if date is None:
+            return len(self.dates) - 1
+        pos = self.dates.searchsorted(pd.Timestamp(date), side='right') - 1
+        if pos < 0:
+            raise KeyError(f"{date} 之前沒有資料")
+        return int(pos)
+
+    def _unpack(self, row: np.ndarray) -> np.ndarray:
+        return np.unpackbits(row, count=len(self.columns)).astype(bool)
+
+    def query(self, expression, date=None) -> list:
+        """
+        查詢指定日期符合條件的股票
+
+        Args:
+            expression: 查詢字串或 Term
+            date: 日期，None 表示最新 (非交易日取之前最近的交易日)
+
+        Returns:
+            list: 股票代碼
+        """
+        term = parse_query(expression) if isinstance(expression, str) else expression
+        pos = self.date_position(date)
+        row = term.evaluate(self, pos, pos + 1)[0]
+        return self.columns[self._unpack(row)].tolist()
+
+    def query_range(self, expression, start=None, end=None) -> pd.DataFrame:
+        """
+        查詢一段期間每日符合條件的股票
+
+        Returns:
+            pd.DataFrame: bool (日期 x 股票)
+        """
+        term = parse_query(expression) if isinstance(expression, str) else expression
+        first = 0 if start is None else int(self.dates.searchsorted(pd.Timestamp(start)))
+        last = self.date_position(end) + 1
+        rows = term.evaluate(self, first, last)
+        flags = np.unpackbits(rows, axis=1, count=len(self.columns)).astype(bool)
+        return pd.DataFrame(flags, index=self.dates[first:last], columns=self.columns)
+
+    def count(self, expression, start=None, end=None) -> pd.Series:
+        """每日符合條件的股票數"""
+        return self.query_range(expression, start, end).sum(axis=1)
+
+
+__all__ = [
+    'SCORE_BITMAP_FILE',
+    'COMPONENT_TABLES',
+    'C',
+    'Term',
+    'ScoreBitmapIndex',
+    'parse_query',
+]
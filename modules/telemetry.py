@@ -0,0 +1,221 @@
+"""
+遙測模組 - Dash callback 延遲 / 回應大小 / 錯誤次數統計，並以 Prometheus 文字格式輸出於 /metrics
+"""
+
+import bisect
+import functools
+import threading
+import time
+
+# callback 延遲分桶 (秒)
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# 回應大小分桶 (bytes)
+PAYLOAD_BUCKETS = (1_000, 10_000, 50_000, 100_000, 500_000, 1_000_000, 5_000_000)
+
+
+def _format_labels(labels: tuple) -> str:
+    if not labels:
+        return ''
+    pairs = ','.join(f'{key}="{value}"' for key, value in labels)
+    return '{' + pairs + '}'
+
+
+class Counter:
+    """累計計數器"""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list:
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(key)} {value}')
+        return lines
+
+
+class Gauge:
+    """即時數值"""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = value
+
+    def render(self) -> list:
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} gauge']
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(key)} {value}')
+        return lines
+
+
+class Histogram:
+    """分桶直方圖 (累積分桶，與 Prometheus histogram 相同)"""
+
+    def __init__(self, name: str, help_text: str, buckets: tuple):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list:
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    labels = _format_labels(key + (('le', bound),))
+                    lines.append(f'{self.name}_bucket{labels} {cumulative}')
+                lines.append(f'{self.name}_bucket{_format_labels(key + (("le", "+Inf"),))} {series[-1]}')
+                lines.append(f'{self.name}_sum{_format_labels(key)} {series[-2]:.6f}')
+                lines.append(f'{self.name}_count{_format_labels(key)} {series[-1]}')
+        return lines
+
+
+class MetricsRegistry:
+    """指標註冊表"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, name: str, factory):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = factory()
+            return self._metrics[name]
+
+    def counter(self, name: str, help_text: str = '') -> Counter:
+        return self._get_or_create(name, lambda: Counter(name, help_text))
+
+    def gauge(self, name: str, help_text: str = '') -> Gauge:
+        return self._get_or_create(name, lambda: Gauge(name, help_text))
+
+    def histogram(self, name: str, help_text: str = '', buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        return self._get_or_create(name, lambda: Histogram(name, help_text, buckets))
+
+    def render(self) -> str:
+        """輸出 Prometheus 文字格式"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+# 全域註冊表 (整個 process 共用)
+REGISTRY = MetricsRegistry()
+
+CALLBACK_LATENCY = REGISTRY.histogram(
+    'dash_callback_latency_seconds', 'Dash callback 執行時間', LATENCY_BUCKETS)
+CALLBACK_PAYLOAD = REGISTRY.histogram(
+    'dash_callback_payload_bytes', 'Dash callback 回應大小', PAYLOAD_BUCKETS)
+CALLBACK_ERRORS = REGISTRY.counter(
+    'dash_callback_errors_total', 'Dash callback 例外次數')
+
+
+def instrument_callback(name: str = None):
+    """
+    callback 量測裝飾器 (放在 @callback 之下)
+
+    記錄執行時間與例外次數；回應大小由 register_metrics_endpoint 安裝的
+    after_request hook 取得，避免重複序列化。
+
+    Args:
+        name: 指標上的 callback 名稱，預設使用函數名稱
+    """
+    def decorator(func):
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                # PreventUpdate 是正常的流程控制，不算錯誤
+                if type(e).__name__ != 'PreventUpdate':
+                    CALLBACK_ERRORS.inc(callback=label)
+                raise
+            finally:
+                CALLBACK_LATENCY.observe(time.perf_counter() - start, callback=label)
+                _mark_request(label)
+
+        return wrapper
+
+    return decorator
+
+
+def _mark_request(label: str):
+    """在目前的 Flask request 記下 callback 名稱，供 after_request 統計回應大小"""
+    try:
+        from flask import g
+        g.telemetry_callback = label
+    except RuntimeError:
+        # 不在 request context 內 (例如直接呼叫或背景執行)
+        pass
+
+
+def register_metrics_endpoint(server, path: str = '/metrics'):
+    """
+    在 Flask server 上註冊 /metrics 並安裝回應大小統計
+
+    Args:
+        server: Dash app 的 Flask server (app.server)
+        path: 端點路徑
+    """
+    from flask import Response, g
+
+    @server.route(path)
+    def metrics():
+        return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+    @server.after_request
+    def record_payload_size(response):
+        label = getattr(g, 'telemetry_callback', None)
+        if label is not None and response.status_code == 200 and not response.direct_passthrough:
+            CALLBACK_PAYLOAD.observe(len(response.get_data()), callback=label)
+        return response
+
+    return metrics
+
+
+__all__ = [
+    'REGISTRY',
+    'MetricsRegistry',
+    'Counter',
+    'Gauge',
+    'Histogram',
+    'instrument_callback',
+    'register_metrics_endpoint',
+]
@@ -0,0 +1,199 @@
+"""
+量比模組 - 以過去 N 日的盤中累積成交量曲線判斷今日量能是否異常
+
+曲線為 (盤中分鐘, 股票) 的 float32 陣列：第 m 分鐘為過去 N 日「開盤到該分鐘」累積成交量的平均。
+盤中量比 = 今日累積成交量 / 同一時間點的平均累積成交量，每檔只需一次查表 (O(1))。
+
+歷史 Log 目錄結構 (每日一個子目錄，檔案格式與當日 Log 相同)：
+    {log_root}/{YYYYMMDD}/{股票代碼}.log
+"""
+
+import os
+
+import numpy as np
+
+from modules.minute_bars import session_times
+
+VOLUME_PROFILE_FILE = 'volume_profile.npz'
+# 建立曲線使用的交易日數
+PROFILE_DAYS = 20
+# 量比達此倍數視為爆量
+VOLUME_SPIKE_RATIO = 2.0
+
+
+def _parse_trade_volume(line: str):
+    """
+    解析一行 Log (與 real_time_panel.process_line_data 相同格式)
+
+    Returns:
+        tuple: ('HH:MM', 成交量)，非成交資料返回 None
+    """
+    parts = [x.strip() for x in line.split(',')]
+    if len(parts) < 6 or parts[0].lower() != 'trade' or int(parts[3]) == 1:
+        return None
+    raw = parts[2]
+    if len(raw) <= 6:
+        return None
+    prefix = raw[:-6].zfill(6)
+    return f"{prefix[0:2]}:{prefix[2:4]}", int(parts[5])
+
+
+def list_log_days(log_root: str, days: int = PROFILE_DAYS, before: str = None) -> list:
+    """
+    最近 N 個交易日的 Log 子目錄
+
+    Args:
+        log_root: 歷史 Log 根目錄
+        days: 交易日數
+        before: 只取早於此日期 (YYYYMMDD) 的目錄，預設不限
+
+    Returns:
+        list: 子目錄完整路徑 (由舊到新)
+    """
+    names = sorted(
+        name for name in os.listdir(log_root)
+        if len(name) == 8 and name.isdigit() and os.path.isdir(os.path.join(log_root, name))
+        and (before is None or name < before)
+    )
+    return [os.path.join(log_root, name) for name in names[-days:]]
+
+
+class VolumeProfile:
+    """
+    盤中累積成交量曲線
+
+    Args:
+        columns: 股票代碼 (欄位順序)
+        curves: (盤中分鐘, 股票) 平均累積成交量，無歷史資料為 NaN
+        times: 分鐘標籤 'HH:MM'
+        n_days: 建立曲線使用的交易日數
+    """
+
+    def __init__(self, columns, curves: np.ndarray, times=None, n_days: int = 0):
+        self.columns = np.asarray(list(columns), dtype=object)
+        self.times = list(times) if times is not None else session_times()
+        self.curves = np.asarray(curves, dtype=np.float32)
+        self.n_days = n_days
+        self._minute_index = {t: i for i, t in enumerate(self.times)}
+
+    @classmethod
+    def build(cls, day_dirs: list, columns=None):
+        """
+        由每日 Log 建立曲線
+
+        Args:
+            day_dirs: 每日 Log 子目錄 (見 list_log_days)
+            columns: 股票代碼，預設為各日 Log 檔名的聯集
+
+        Returns:
+            VolumeProfile
+        """
+        if columns is None:
+            columns = sorted({
+                name[:-4] for day_dir in day_dirs for name in os.listdir(day_dir) if name.endswith('.log')
+            })
+        times = session_times()
+        minute_index = {t: i for i, t in enumerate(times)}
+        n_minutes, n_stocks = len(times), len(columns)
+
+        # 逐日累加，不保留每日矩陣
+        total = np.zeros((n_minutes, n_stocks))
+        count = np.zeros(n_stocks)
+        for day_dir in day_dirs:
+            day = np.zeros((n_minutes, n_stocks))
+            for pos, symbol in enumerate(columns):
+                path = os.path.join(day_dir, f"{symbol}.log")
+                if not os.path.exists(path):
+                    continue
+                with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+                    for line in f:
+                        try:
+                            trade = _parse_trade_volume(line)
+                        except ValueError:
+                            continue
+                        if trade is None:
+                            continue
+                        time_str, volume = trade
+                        m = minute_index.get(time_str)
+                        if m is None:
+                            m = 0 if time_str < times[0] else n_minutes - 1
+                        day[m, pos] += volume
+            # 當日無成交 (停牌 / 無 Log) 的股票不列入平均
+            traded = day.sum(axis=0) > 0
+            total[:, traded] += np.cumsum(day[:, traded], axis=0)
+            count[traded] += 1
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            curves = np.where(count > 0, total / count, np.nan)
+        return cls(columns, curves, times, len(day_dirs))
+
+    def save(self, path):
+        """存成壓縮 npz"""
+        np.savez_compressed(
+            path, columns=self.columns.astype(str), times=np.asarray(self.times),
+            curves=self.curves, n_days=self.n_days,
+        )
+
+    @classmethod
+    def load(cls, path, columns=None):
+        """
+        讀取曲線
+
+        Args:
+            path: volume_profile.npz 路徑
+            columns: 對齊的股票代碼順序 (例如 DataStore 的欄位)，缺少的股票為 NaN
+
+        Returns:
+            VolumeProfile: 檔案不存在時返回 None
+        """
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as f:
+            stored = f['columns'].tolist()
+            curves = f['curves']
+            times = f['times'].tolist()
+            n_days = int(f['n_days'])
+        if columns is not None:
+            position = {symbol: i for i, symbol in enumerate(stored)}
+            src = np.asarray([position.get(symbol, -1) for symbol in columns], dtype=np.intp)
+            aligned = np.full((len(times), len(src)), np.nan, dtype=np.float32)
+            found = src >= 0
+            aligned[:, found] = curves[:, src[found]]
+            curves, stored = aligned, list(columns)
+        return cls(stored, curves, times, n_days)
+
+    def minute_of(self, time_str: str) -> int:
+        """'HH:MM' 轉為曲線列索引 (超出盤中時段則夾在頭尾)"""
+        m = self._minute_index.get(time_str)
+        if m is None:
+            m = 0 if time_str < self.times[0] else len(self.times) - 1
+        return m
+
+    def ratio(self, pos: int, volume: float, minute: int) -> float:
+        """單檔量比 (無歷史資料時為 NaN)"""
+        expected = self.curves[minute, pos]
+        return volume / expected if expected > 0 else np.nan
+
+    def ratios(self, volumes: np.ndarray, minute: int) -> np.ndarray:
+        """
+        全部股票的量比
+
+        Args:
+            volumes: 今日累積成交量 (欄位順序同 columns)
+            minute: 目前的分鐘列索引
+
+        Returns:
+            np.ndarray: 量比，無歷史資料或平均為 0 時為 NaN
+        """
+        expected = self.curves[minute].astype(float)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(expected > 0, volumes / expected, np.nan)
+
+
+__all__ = [
+    'VOLUME_PROFILE_FILE',
+    'PROFILE_DAYS',
+    'VOLUME_SPIKE_RATIO',
+    'VolumeProfile',
+    'list_log_days',
+]
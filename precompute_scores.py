@@ -1,7 +1,10 @@
 """
 預計算評分系統 - 批次計算所有日期的評分並存成 parquet
-用法: python precompute_scores.py [天數]
+用法: python precompute_scores.py [天數] [--profile [cprofile|pyinstrument]]
 範例: python precompute_scores.py 60  # 計算最近60天
+      python precompute_scores.py 60 --profile  # 另外輸出 cProfile 結果
+
+每次執行的階段耗時會附加到 data/precompute_trace.jsonl，並於結束時輸出摘要。
 """
 
 import pandas as pd
@@ -9,10 +12,22 @@ import numpy as np
 from datetime import datetime, timedelta
 import sys
 import os
+import argparse
 from pathlib import Path
 
 from finlab import data, login
 
+from modules.profiling import StageTracer, profiled
+from modules.data_fetcher import MARKET_DATASETS, fetch_datasets
+from modules.industry_registry import get_registry
+from modules.compact import categorical_columns, compact_prices, frame_nbytes, score_frame, total_score_frame
+from modules.score_index import SCORE_BITMAP_FILE, ScoreBitmapIndex
+from modules.score_history import SCORE_HISTORY_FILE, ScoreHistoryIndex
+from modules.score_events import SCORE_EVENTS_DIR, ScoreEventLog, build_events
+from modules.alerts import ALERT_LOG_FILE, ALERT_RULES_FILE, AlertEngine, LogSink, check_daily, load_rules
+from modules.live_scoring import (SCORE_SEED_FILE, SECTOR_SEED_FILE, VOLUME_CARRY_DAYS,
+                                  build_score_seed, build_sector_seed)
+
 # Finlab 登入
 env_path = Path(__file__).parent / '.env'
 if env_path.exists():
@@ -30,12 +45,15 @@ data.set_universe('TSE_OTC')
 INDUSTRY_CSV = r'C:\Users\user\Documents\_12_BO_strategy\產業分類資料庫.csv'
 OUTPUT_DIR = Path(__file__).parent / 'data'
 OUTPUT_DIR.mkdir(exist_ok=True)
+TRACE_FILE = 'precompute_trace.jsonl'
+# 暖機列數：MA60 需 60 個交易日，之前的均線 / 月均成交值尚無法計算，評分不具意義
+WARMUP_ROWS = 60
 
 
 def calculate_macd(close_df, fast=12, slow=26, signal=9):
-    """批次計算所有股票的 MACD"""
-    ema_fast = close_df.ewm(span=fast, adjust=False).mean()
-    ema_slow = close_df.ewm(span=slow, adjust=False).mean()
+    """批次計算所有股票的 MACD (EMA 與 app 指標快取相同先轉為精簡型別再相減)"""
+    ema_fast = compact_prices(close_df.ewm(span=fast, adjust=False).mean())
+    ema_slow = compact_prices(close_df.ewm(span=slow, adjust=False).mean())
     macd_line = ema_fast - ema_slow
     return macd_line
 
@@ -48,26 +66,35 @@ def precompute_all_scores(days=60):
         days: 要計算的天數 (預設60天)
     """
 
+    tracer = StageTracer('precompute_all_scores', OUTPUT_DIR / TRACE_FILE)
+
     print(f"\n{'='*60}")
     print(f"  預計算評分系統 - 計算最近 {days} 天")
     print(f"{'='*60}\n")
 
-    # 設定資料起始日 (多抓一些確保有足夠資料計算 MA60)
+    # 資料起始日 (多抓一些確保有足夠資料計算 MA60)
     start_date = (datetime.now() - timedelta(days=days + 120)).strftime('%Y-%m-%d')
-    data.truncate_start = start_date
 
     print("[INFO] 載入資料中...")
 
     # =====================
-    # 1. 載入所有資料 (一次性)
+    # 1. 載入所有資料 (一次性，各資料集並行下載)
     # =====================
-    close = data.get('price:收盤價')
-    trade_value = data.get('price:成交金額')
-    revenue_yoy = data.get('monthly_revenue:去年同月增減(%)')
+    with tracer.span('load_datasets') as span:
+        timings = {}
+        tables = fetch_datasets(MARKET_DATASETS, start=start_date, align=('close', 'trade_value'), timings=timings)
+        # 價格 / 成交值 / 營收轉為精簡型別後再進行所有計算
+        close = compact_prices(tables['close'])
+        trade_value = compact_prices(tables['trade_value'])
+        revenue_yoy = compact_prices(tables['revenue_yoy'])
+        span['shape'] = close.shape
+        span['datasets'] = timings
+        span['bytes'] = frame_nbytes([close, trade_value, revenue_yoy])
 
     # 讀取產業分類
-    industry_df = pd.read_csv(INDUSTRY_CSV)
-    industry_df['代碼'] = industry_df['代碼'].astype(str)
+    with tracer.span('load_industry_registry') as span:
+        registry = get_registry(INDUSTRY_CSV)
+        span['shape'] = (len(registry.sectors), len(registry.codes))
 
     print(f"[INFO] 資料範圍: {close.index[0].strftime('%Y-%m-%d')} ~ {close.index[-1].strftime('%Y-%m-%d')}")
     print(f"[INFO] 股票數量: {len(close.columns)}")
@@ -78,19 +105,23 @@ def precompute_all_scores(days=60):
     print("[CALC] 計算技術指標...")
 
     # 均線
-    ma10 = close.rolling(10).mean()
-    ma20 = close.rolling(20).mean()
-    ma60 = close.rolling(60).mean()
+    with tracer.span('rolling_ma') as span:
+        ma10 = compact_prices(close.rolling(10).mean())
+        ma20 = compact_prices(close.rolling(20).mean())
+        ma60 = compact_prices(close.rolling(60).mean())
 
-    # 均線多頭: MA10 > MA20 > MA60
-    ma_bullish = (ma10 > ma20) & (ma20 > ma60)
+        # 均線多頭: MA10 > MA20 > MA60
+        ma_bullish = (ma10 > ma20) & (ma20 > ma60)
+        span['shape'] = close.shape
 
     # MACD
-    macd_line = calculate_macd(close)
-    macd_prev = macd_line.shift(1)
+    with tracer.span('macd') as span:
+        macd_line = calculate_macd(close)
+        macd_prev = macd_line.shift(1)
 
-    # MACD > 0 且向上彎
-    macd_bullish = (macd_line > 0) & (macd_line > macd_prev)
+        # MACD > 0 且向上彎
+        macd_bullish = (macd_line > 0) & (macd_line > macd_prev)
+        span['shape'] = close.shape
 
     # =====================
     # 3. 預計算基本面指標
@@ -98,89 +129,94 @@ def precompute_all_scores(days=60):
     print("[CALC] 計算基本面指標...")
 
     # 營收 YoY > 20% (向前填充到每個交易日)
-    revenue_aligned = revenue_yoy.reindex(close.index, method='ffill')
-    revenue_good = revenue_aligned > 20
+    with tracer.span('revenue_align') as span:
+        revenue_aligned = revenue_yoy.reindex(close.index, method='ffill')
+        revenue_good = revenue_aligned > 20
+        span['shape'] = revenue_aligned.shape
 
     # =====================
     # 4. 計算月均成交值篩選
     # =====================
     print("[CALC] 計算月均成交值...")
-    avg_trade_20d = trade_value.rolling(20).mean()
-    valid_stocks_mask = avg_trade_20d >= 3e8  # >= 3億
+    with tracer.span('avg_trade_20d') as span:
+        avg_trade_20d = compact_prices(trade_value.rolling(20).mean())
+        valid_stocks_mask = avg_trade_20d >= 3e8  # >= 3億
+        span['shape'] = trade_value.shape
 
     # =====================
     # 5. 計算成交值前30大 (過去10天任一天)
     # =====================
     print("[CALC] 計算成交值排名...")
 
-    # 每天的成交值排名
-    trade_rank = trade_value.rank(axis=1, ascending=False)
-    top30_daily = trade_rank <= 30
+    with tracer.span('trade_rank') as span:
+        # 每天的成交值排名
+        trade_rank = trade_value.rank(axis=1, ascending=False)
+        top30_daily = trade_rank <= 30
 
-    # 過去10天任一天進入前30
-    top30_10d = top30_daily.rolling(10).max().fillna(0).astype(bool)
+        # 過去10天任一天進入前30
+        top30_10d = top30_daily.rolling(10).max().fillna(0).astype(bool)
+        span['shape'] = trade_value.shape
 
     # =====================
     # 6. 計算產業趨勢 (過去10天漲幅前五大)
     # =====================
     print("[CALC] 計算產業趨勢...")
 
-    # 建立股票->族群對照表
-    stock_to_sectors = industry_df.groupby('代碼')['細產業別'].apply(list).to_dict()
-    all_sectors = industry_df['細產業別'].unique()
-
-    # 計算每個族群每天的平均股價
-    sector_avg_price = {}
-    sector_stocks_map = {}
+    with tracer.span('sector_price') as span:
+        # 族群 -> 成分股 (只保留有股價資料、至少 2 檔的族群)
+        sector_stocks_map = registry.sector_stocks(universe=close.columns, min_size=2)
 
-    for sector in all_sectors:
-        stocks_in_sector = industry_df[industry_df['細產業別'] == sector]['代碼'].tolist()
-        stocks_in_sector = [s for s in stocks_in_sector if s in close.columns]
-        if len(stocks_in_sector) >= 2:
-            sector_avg_price[sector] = close[stocks_in_sector].mean(axis=1)
-            sector_stocks_map[sector] = stocks_in_sector
+        # 計算每個族群每天的平均股價
+        sector_avg_price = {
+            sector: close[stocks_in_sector].mean(axis=1)
+            for sector, stocks_in_sector in sector_stocks_map.items()
+        }
 
-    sector_price_df = pd.DataFrame(sector_avg_price)
+        sector_price_df = pd.DataFrame(sector_avg_price)
 
-    # 計算族群10日漲跌幅
-    sector_return_10d = (sector_price_df / sector_price_df.shift(10) - 1) * 100
+        # 計算族群10日漲跌幅
+        sector_return_10d = (sector_price_df / sector_price_df.shift(10) - 1) * 100
 
-    # 每天的前五大族群
-    sector_rank = sector_return_10d.rank(axis=1, ascending=False)
-    top5_sectors_daily = sector_rank <= 5
+        # 每天的前五大族群
+        sector_rank = sector_return_10d.rank(axis=1, ascending=False)
+        top5_sectors_daily = sector_rank <= 5
+        span['shape'] = sector_price_df.shape
 
     # 建立每天的熱門族群股票集合
     print("[CALC] 建立熱門族群對照表...")
-    hot_sector_stocks = pd.DataFrame(False, index=close.index, columns=close.columns)
+    with tracer.span('hot_sector_loop') as span:
+        hot_sector_stocks = pd.DataFrame(False, index=close.index, columns=close.columns)
 
-    for date in close.index:
-        if date in top5_sectors_daily.index:
-            hot_sectors_today = top5_sectors_daily.loc[date]
-            hot_sectors_today = hot_sectors_today[hot_sectors_today].index.tolist()
+        for date in close.index:
+            if date in top5_sectors_daily.index:
+                hot_sectors_today = top5_sectors_daily.loc[date]
+                hot_sectors_today = hot_sectors_today[hot_sectors_today].index.tolist()
 
-            for sector in hot_sectors_today:
-                if sector in sector_stocks_map:
-                    for stock in sector_stocks_map[sector]:
-                        if stock in hot_sector_stocks.columns:
-                            hot_sector_stocks.loc[date, stock] = True
+                for sector in hot_sectors_today:
+                    if sector in sector_stocks_map:
+                        for stock in sector_stocks_map[sector]:
+                            if stock in hot_sector_stocks.columns:
+                                hot_sector_stocks.loc[date, stock] = True
+        span['shape'] = hot_sector_stocks.shape
 
     # =====================
     # 7. 計算總分
     # =====================
     print("[CALC] 計算總分...")
 
-    # 各項分數
-    score_ma = ma_bullish.astype(int) * 20
-    score_macd = macd_bullish.astype(int) * 20
-    score_revenue = revenue_good.astype(int) * 10
-    score_sector = hot_sector_stocks.astype(int) * 10
-    score_volume = top30_10d.astype(int) * 10
+    with tracer.span('total_score') as span:
+        # 各項分數
+        score_ma = score_frame(ma_bullish, 20)
+        score_macd = score_frame(macd_bullish, 20)
+        score_revenue = score_frame(revenue_good, 10)
+        score_sector = score_frame(hot_sector_stocks, 10)
+        score_volume = score_frame(top30_10d, 10)
 
-    # 總分
-    total_score = score_ma + score_macd + score_revenue + score_sector + score_volume
-
-    # 套用月均成交值篩選 (不符合的設為 NaN)
-    total_score = total_score.where(valid_stocks_mask)
+        # 總分，套用月均成交值篩選 (不符合的設為 NaN)
+        total_score = total_score_frame([score_ma, score_macd, score_revenue, score_sector, score_volume],
+                                        valid_stocks_mask)
+        span['shape'] = total_score.shape
+        span['bytes'] = frame_nbytes([total_score, score_ma, score_macd, score_revenue, score_sector, score_volume])
 
     # =====================
     # 8. 儲存結果
@@ -189,6 +225,8 @@ def precompute_all_scores(days=60):
 
     # 只保留最近 N 天
     recent_dates = close.index[-days:]
+    # 累積式的索引 / 歷史 / 事件另外排除暖機期 (暖機期的評分不具意義，不應寫入長期紀錄)
+    scored_dates = close.index[max(len(close.index) - days, WARMUP_ROWS):]
 
     # 儲存各項資料
     output_data = {
@@ -205,13 +243,84 @@ def precompute_all_scores(days=60):
 
     for name, df in output_data.items():
         output_path = OUTPUT_DIR / f'{name}.parquet'
-        df.to_parquet(output_path)
+        with tracer.span(f'write_{name}') as span:
+            df.to_parquet(output_path)
+            span['shape'] = df.shape
+            span['bytes'] = output_path.stat().st_size
         print(f"   - {name}.parquet ({df.shape})")
 
     # 儲存族群漲幅
-    sector_return_10d.loc[recent_dates].to_parquet(OUTPUT_DIR / 'sector_return_10d.parquet')
+    with tracer.span('write_sector_return_10d') as span:
+        compact_prices(sector_return_10d.loc[recent_dates]).to_parquet(OUTPUT_DIR / 'sector_return_10d.parquet')
+        span['shape'] = (len(recent_dates), sector_return_10d.shape[1])
     print(f"   - sector_return_10d.parquet")
 
+    # 評分項目位元索引 (本次的暖機後日期併入既有索引，累積多年歷史供多條件篩選)
+    with tracer.span('write_score_bitmaps') as span:
+        components = {
+            'ma': score_ma, 'macd': score_macd, 'revenue': score_revenue,
+            'sector': score_sector, 'volume': score_volume, 'valid': total_score,
+        }
+        bitmap_index = ScoreBitmapIndex.from_frames({name: df.loc[scored_dates] for name, df in components.items()})
+        stored = ScoreBitmapIndex.load(OUTPUT_DIR / SCORE_BITMAP_FILE)
+        if stored is not None:
+            bitmap_index = stored.merge(bitmap_index)
+        bitmap_index.save(OUTPUT_DIR / SCORE_BITMAP_FILE)
+        span['shape'] = (len(bitmap_index.dates), len(bitmap_index.columns))
+    print(f"   - {SCORE_BITMAP_FILE}")
+
+    # 以股票為主的總分歷史與連續區段 (單一股票軌跡查詢、排行榜走勢欄)
+    with tracer.span('write_score_history') as span:
+        # 只取暖機後日期，併入既有歷史 (首次達標 / 連續天數不受本次計算視窗影響)
+        history_index = ScoreHistoryIndex.from_frame(total_score.loc[scored_dates])
+        stored = ScoreHistoryIndex.load(OUTPUT_DIR / SCORE_HISTORY_FILE)
+        if stored is not None:
+            history_index = stored.merge(history_index)
+        history_index.save(OUTPUT_DIR / SCORE_HISTORY_FILE)
+        span['shape'] = history_index.scores.shape
+    print(f"   - {SCORE_HISTORY_FILE}")
+
+    # 跨越門檻事件 (只附加上次預計算之後的日期；暖機期的 NaN -> 分數變化不是真正的跨越)
+    with tracer.span('write_score_events') as span:
+        events = build_events(total_score.loc[scored_dates], {
+            'ma': score_ma, 'macd': score_macd, 'revenue': score_revenue,
+            'sector': score_sector, 'volume': score_volume,
+        })
+        appended = ScoreEventLog(OUTPUT_DIR / SCORE_EVENTS_DIR).append(events, through=total_score.index[-1])
+        span['events'] = appended
+    print(f"   - {SCORE_EVENTS_DIR}/ (新增 {appended} 筆事件)")
+
+    # 每日門檻提醒 (有 data/alert_rules.json 時)：最新交易日轉為成立的規則寫入 alerts.log
+    alert_rules = load_rules(OUTPUT_DIR / ALERT_RULES_FILE)
+    if alert_rules:
+        with tracer.span('daily_alerts') as span:
+            engine = AlertEngine(total_score.columns, alert_rules, [LogSink(OUTPUT_DIR / ALERT_LOG_FILE)])
+            alerts = check_daily(engine, total_score, {
+                'ma': score_ma, 'macd': score_macd, 'revenue': score_revenue,
+                'sector': score_sector, 'volume': score_volume,
+            })
+            span['alerts'] = len(alerts)
+        print(f"   - {ALERT_LOG_FILE} (觸發 {len(alerts)} 筆提醒)")
+
+    # 盤中暫定評分的延續狀態 (real_time_panel 以最新價接續計算)
+    with tracer.span('write_live_score_seed') as span:
+        seed = build_score_seed(
+            close,
+            score_revenue.iloc[-1],
+            score_sector.iloc[-1],
+            top30_daily.iloc[-VOLUME_CARRY_DAYS:].any().astype(int) * 10,
+            valid_stocks_mask.iloc[-1],
+        )
+        seed.to_parquet(OUTPUT_DIR / SCORE_SEED_FILE)
+        span['shape'] = seed.shape
+    print(f"   - {SCORE_SEED_FILE}")
+
+    with tracer.span('write_live_sector_seed') as span:
+        sector_seed = categorical_columns(build_sector_seed(close, sector_stocks_map), ['sector', 'code'])
+        sector_seed.to_parquet(OUTPUT_DIR / SECTOR_SEED_FILE)
+        span['shape'] = sector_seed.shape
+    print(f"   - {SECTOR_SEED_FILE}")
+
     # 儲存元資料
     meta = {
         'last_update': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
@@ -229,9 +338,18 @@ def precompute_all_scores(days=60):
     print(f"   - 輸出目錄: {OUTPUT_DIR}")
     print(f"{'='*60}\n")
 
+    tracer.print_summary()
+
     return output_data
 
 
 if __name__ == '__main__':
-    days = int(sys.argv[1]) if len(sys.argv) > 1 else 60
-    precompute_all_scores(days)
+    parser = argparse.ArgumentParser(description='預計算評分系統')
+    parser.add_argument('days', nargs='?', type=int, default=60, help='要計算的天數')
+    parser.add_argument('--profile', nargs='?', const='cprofile', choices=['cprofile', 'pyinstrument'],
+                        help='啟用 profiler (預設 cprofile)')
+    args = parser.parse_args()
+
+    suffix = 'html' if args.profile == 'pyinstrument' else 'prof'
+    with profiled(args.profile, OUTPUT_DIR / f'precompute_profile.{suffix}'):
+        precompute_all_scores(args.days)
@@ -0,0 +1,52 @@
+"""
+預計算量比曲線 - 由過去 N 日的盤中 Log 建立各股累積成交量曲線
+用法: python precompute_volume_profile.py [Log根目錄] [--days N]
+範例: python precompute_volume_profile.py D:/pub_sub_data/archive --days 20
+
+Log 根目錄下每日一個子目錄 (YYYYMMDD)，結果寫入 data/volume_profile.npz，
+real_time_panel.py 啟動時載入並計算盤中量比。
+"""
+
+import argparse
+import time
+from datetime import datetime
+from pathlib import Path
+
+from modules.volume_profile import PROFILE_DAYS, VOLUME_PROFILE_FILE, VolumeProfile, list_log_days
+
+OUTPUT_DIR = Path(__file__).parent / 'data'
+OUTPUT_DIR.mkdir(exist_ok=True)
+DEFAULT_LOG_ROOT = 'D:/pub_sub_data/archive'
+
+
+def precompute_volume_profile(log_root: str = DEFAULT_LOG_ROOT, days: int = PROFILE_DAYS):
+    """
+    建立並儲存量比曲線 (不含今日)
+
+    參數:
+        log_root: 歷史 Log 根目錄
+        days: 使用的交易日數
+    """
+    started = time.time()
+    day_dirs = list_log_days(log_root, days, before=datetime.now().strftime('%Y%m%d'))
+    if not day_dirs:
+        print(f"[ERROR] {log_root} 下找不到每日 Log 目錄 (YYYYMMDD)")
+        return None
+
+    print(f"[INFO] 使用 {len(day_dirs)} 個交易日: {Path(day_dirs[0]).name} ~ {Path(day_dirs[-1]).name}")
+    profile = VolumeProfile.build(day_dirs)
+
+    output_path = OUTPUT_DIR / VOLUME_PROFILE_FILE
+    profile.save(output_path)
+    print(f"[DONE] {output_path} ({profile.curves.shape[0]} 分鐘 x {profile.curves.shape[1]} 檔，"
+          f"耗時 {time.time() - started:.1f} 秒)")
+    return profile
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='預計算量比曲線')
+    parser.add_argument('log_root', nargs='?', default=DEFAULT_LOG_ROOT, help='歷史 Log 根目錄')
+    parser.add_argument('--days', type=int, default=PROFILE_DAYS, help='使用的交易日數')
+    args = parser.parse_args()
+
+    precompute_volume_profile(args.log_root, args.days)
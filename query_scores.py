@@ -1,7 +1,16 @@
 """
 快速查詢評分 - 從預計算的 parquet 讀取
 用法: python query_scores.py [日期]
+      python query_scores.py --screen "條件" [日期]
+      python query_scores.py --history 股票代碼 [門檻]
+      python query_scores.py --events [天數] [門檻]
 範例: python query_scores.py 2024-12-20
+      python query_scores.py --screen "MACD強勢 & 熱門族群 & ~any(均線多排, 5)"
+      python query_scores.py --history 3017 60
+      python query_scores.py --events 5 70  # 最近 5 個交易日新達到 70 分 / 跌破 50 分
+
+篩選條件可用: 均線多排 / MACD強勢 / 營收成長 / 熱門族群 / 成交熱絡 / 有效 (符合月均成交值)，
+以 & | ~ 組合，any(條件, N) / all(條件, N) 表示過去 N 個交易日任一天 / 每一天成立。
 """
 
 import pandas as pd
@@ -10,6 +19,12 @@ from datetime import datetime
 from pathlib import Path
 import sys
 import json
+import time
+
+from modules.score_index import COMPONENT_TABLES, SCORE_BITMAP_FILE, ScoreBitmapIndex
+from modules.score_history import SCORE_HISTORY_FILE, SPARKLINE_DAYS, ScoreHistoryIndex
+from modules.score_events import SCORE_EVENTS_DIR, ScoreEventLog, component_names
+from modules.industry_registry import get_registry
 
 DATA_DIR = Path(__file__).parent / 'data'
 INDUSTRY_CSV = r'C:\Users\user\Documents\_12_BO_strategy\產業分類資料庫.csv'
@@ -64,9 +79,7 @@ def query_scores(target_date: str = None, top_n: int = 50):
     sector_return = data['sector_return_10d']
 
     # 讀取產業分類
-    industry_df = pd.read_csv(INDUSTRY_CSV)
-    industry_df['代碼'] = industry_df['代碼'].astype(str)
-    stock_to_sectors = industry_df.groupby('代碼')['細產業別'].apply(list).to_dict()
+    registry = get_registry(INDUSTRY_CSV)
 
     # 決定目標日期
     available_dates = total_score.index.strftime('%Y-%m-%d').tolist()
@@ -120,7 +133,7 @@ def query_scores(target_date: str = None, top_n: int = 50):
         if score_revenue.get(stock, 0) > 0:
             details.append("營收強(+10)")
         if score_sector.get(stock, 0) > 0:
-            sectors = stock_to_sectors.get(stock, [])
+            sectors = registry.sectors_of(stock)
             hot_sectors = [s for s in sectors if s in top5_sectors.index]
             if hot_sectors:
                 details.append(f"熱門族群(+10):{','.join(hot_sectors)}")
@@ -163,6 +176,144 @@ def query_scores(target_date: str = None, top_n: int = 50):
     return df_result
 
 
+def load_bitmap_index():
+    """載入評分位元索引；尚未建立時由各項分數 parquet 建立"""
+    index = ScoreBitmapIndex.load(DATA_DIR / SCORE_BITMAP_FILE)
+    if index is not None:
+        return index
+
+    print(f"[WARN] 找不到 {SCORE_BITMAP_FILE}，由 parquet 建立 (重新執行 precompute_scores.py 即會產生)")
+    frames = {}
+    for name, table in {**COMPONENT_TABLES, 'valid': 'total_score'}.items():
+        path = DATA_DIR / f'{table}.parquet'
+        if not path.exists():
+            print(f"[ERROR] 找不到 {table}.parquet，請先執行 precompute_scores.py")
+            return None
+        frames[name] = pd.read_parquet(path)
+    return ScoreBitmapIndex.from_frames(frames)
+
+
+def screen_stocks(expression: str, target_date: str = None):
+    """
+    多條件篩選
+
+    參數:
+        expression: 篩選條件，例如 "MACD強勢 & 熱門族群 & ~any(均線多排, 5)"
+        target_date: 目標日期 (格式: YYYY-MM-DD)，若為 None 則使用最新日期
+
+    回傳:
+        list: 符合條件的股票代碼
+    """
+    index = load_bitmap_index()
+    if index is None:
+        return None
+
+    try:
+        start = time.perf_counter()
+        date = index.dates[index.date_position(target_date)]
+        stocks = index.query(expression, date)
+        elapsed = (time.perf_counter() - start) * 1000
+    except (KeyError, ValueError) as e:
+        print(f"[ERROR] {e}")
+        return None
+
+    print(f"\n[SCREEN] {expression}")
+    print(f"[DATE] {date.strftime('%Y-%m-%d')}，符合 {len(stocks)} 檔 ({elapsed:.1f} ms)")
+    for i in range(0, len(stocks), 10):
+        print("   " + ' '.join(f"{s:>6}" for s in stocks[i:i + 10]))
+    return stocks
+
+
+def load_history_index():
+    """載入評分歷史索引；尚未建立時由 total_score.parquet 建立"""
+    index = ScoreHistoryIndex.load(DATA_DIR / SCORE_HISTORY_FILE)
+    if index is not None:
+        return index
+
+    print(f"[WARN] 找不到 {SCORE_HISTORY_FILE}，由 total_score.parquet 建立 (重新執行 precompute_scores.py 即會產生)")
+    path = DATA_DIR / 'total_score.parquet'
+    if not path.exists():
+        print("[ERROR] 找不到 total_score.parquet，請先執行 precompute_scores.py")
+        return None
+    return ScoreHistoryIndex.from_frame(pd.read_parquet(path))
+
+
+def stock_history(stock_code: str, level: int = 60):
+    """
+    單一股票的評分軌跡
+
+    參數:
+        stock_code: 股票代碼
+        level: 分數門檻 (需為預先計算的門檻)
+
+    回傳:
+        DataFrame: 總分 >= level 的連續區段
+    """
+    index = load_history_index()
+    if index is None:
+        return None
+
+    try:
+        start = time.perf_counter()
+        regimes = index.regime_table(stock_code, level)
+        streak = index.current_streak(stock_code, level)
+        spark = index.sparkline(stock_code)
+        latest = index.history(stock_code).iloc[-1]
+        elapsed = (time.perf_counter() - start) * 1000
+    except KeyError as e:
+        print(f"[ERROR] {e.args[0]}")
+        return None
+
+    print(f"\n[HISTORY] {stock_code}  ({index.dates[0].strftime('%Y-%m-%d')} ~ {index.dates[-1].strftime('%Y-%m-%d')}，{elapsed:.1f} ms)")
+    print(f"   最新總分: {'-' if pd.isna(latest) else int(latest)}")
+    print(f"   近{SPARKLINE_DAYS}日走勢: {spark}")
+    if regimes.empty:
+        print(f"   從未達到 {level} 分")
+        return regimes
+
+    first = regimes.iloc[0]
+    print(f"   首次達到 {level} 分: {first['start'].strftime('%Y-%m-%d')}，維持 {first['days']} 個交易日")
+    print(f"   目前連續 {streak} 個交易日 >= {level} 分")
+    print(f"\n   {'起始':<12}{'結束':<12}{'天數':>4}")
+    for row in regimes.itertuples():
+        print(f"   {row.start.strftime('%Y-%m-%d'):<12}{row.end.strftime('%Y-%m-%d'):<12}{row.days:>4}")
+    return regimes
+
+
+def recent_events(days: int = 5, level: int = 70, drop_level: int = 50):
+    """
+    最近 N 個交易日的新進 / 跌出名單 (讀取事件表，不比對整天的分數)
+
+    參數:
+        days: 交易日數
+        level: 新進門檻
+        drop_level: 跌出門檻
+
+    回傳:
+        tuple: (新進事件, 跌出事件) DataFrame
+    """
+    log = ScoreEventLog(DATA_DIR / SCORE_EVENTS_DIR)
+    if log.last_date is None:
+        print(f"[ERROR] 找不到 {SCORE_EVENTS_DIR}，請先執行 precompute_scores.py")
+        return None
+
+    # 以事件表最後日期往前推 N 個交易日 (以工作日近似，避免載入完整日期索引)
+    end = log.last_date
+    start = end - pd.offsets.BDay(days - 1)
+    entrants = log.entrants(level, start, end)
+    dropouts = log.dropouts(drop_level, start, end)
+
+    print(f"\n[EVENTS] {start.strftime('%Y-%m-%d')} ~ {end.strftime('%Y-%m-%d')}")
+    for title, events, key in ((f"新達到 {level} 分", entrants, 'gained'), (f"跌破 {drop_level} 分", dropouts, 'lost')):
+        print(f"\n{title}: {len(events)} 筆")
+        for row in events.itertuples():
+            old = '-' if row.old_score < 0 else row.old_score
+            new = '-' if row.new_score < 0 else row.new_score
+            changed = ' / '.join(component_names(getattr(row, key)))
+            print(f"   {row.date.strftime('%Y-%m-%d')} {row.code:>6} {old:>3} -> {new:>3}  {changed}")
+    return entrants, dropouts
+
+
 def list_available_dates():
     """列出可用的日期"""
     data = load_data()
@@ -178,6 +329,13 @@ if __name__ == '__main__':
     if len(sys.argv) > 1:
         if sys.argv[1] == '--list':
             list_available_dates()
+        elif sys.argv[1] == '--screen' and len(sys.argv) > 2:
+            screen_stocks(sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else None)
+        elif sys.argv[1] == '--history' and len(sys.argv) > 2:
+            stock_history(sys.argv[2], int(sys.argv[3]) if len(sys.argv) > 3 else 60)
+        elif sys.argv[1] == '--events':
+            recent_events(int(sys.argv[2]) if len(sys.argv) > 2 else 5,
+                          int(sys.argv[3]) if len(sys.argv) > 3 else 70)
         else:
             query_scores(sys.argv[1])
     else:
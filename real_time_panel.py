@@ -7,7 +7,8 @@ import numpy as np
 from datetime import datetime, timedelta
 import dash
 from dash import Dash, dcc, html, ctx, State
-from dash.dependencies import Input, Output
+from dash.exceptions import PreventUpdate
+from dash.dependencies import Input, Output, ClientsideFunction
 import plotly.graph_objects as go
 import plotly.express as px
 from collections import defaultdict
@@ -17,6 +18,29 @@ import json # 用來處理 Store 資料
 from finlab import data, login
 from finlab.markets.tw import TWMarket
 from finlab.dataframe import FinlabDataFrame
+
+from modules.realtime_store import DataStore, REBUILD_MIN_INTERVAL
+from modules.data_fetcher import fetch_datasets
+from modules.industry_registry import get_registry
+from modules.latency import LatencyTracker, exchange_time_to_epoch
+from modules.realtime_push import SnapshotBroadcaster, register_stream_endpoint
+from modules.volume_profile import VOLUME_PROFILE_FILE, VOLUME_SPIKE_RATIO, VolumeProfile
+from modules.live_scoring import (SCORE_SEED_FILE, SECTOR_SEED_FILE, HOT_SECTOR_COUNT, LiveSectorRanking,
+                                  ProvisionalScorer, load_score_seed)
+from modules.alerts import (ALERT_LOG_FILE, ALERT_RULES_FILE, AlertEngine, LogSink, RedisStreamSink,
+                            WebhookSink, load_rules)
+
+try:
+    from dash_extensions import EventSource
+except ImportError:  # dash-extensions 為選用套件，未安裝時沿用 dcc.Interval 輪詢
+    EventSource = None
+
+# 推播模式：伺服器以 SSE 廣播快照差異，瀏覽器端更新走勢圖
+PUSH_ENABLED = EventSource is not None
+PUSH_PATH = '/realtime/stream'
+# 推播模式下伺服器端完整重繪 (標籤、排行、熱力圖) 的間隔 (毫秒)
+PUSH_REFRESH_MS = 15000
+from modules.telemetry import instrument_callback, register_metrics_endpoint
 #finlab token 
 login('Y8qx8Zs1zTnNk7McQPGpR4Lb9jv29EMQpiOMAxyBpmcIK4mYc2vODIvD8PuXLctw')
 
@@ -48,12 +72,15 @@ REDIS_HOST = '192.168.100.130'
 LOG_DIR = "D:/pub_sub_data"  # <--- 設定 Log 路徑
 
 # (原本的 Finlab 資料撈取邏輯保持不變)
-data.set_universe('TSE_OTC')
-data.truncate_start = (datetime.now()-timedelta(days=14)).strftime('%Y-%m-%d')
-
-close = data.get('price:收盤價')
-vol = data.get('price:成交股數')/1000
-stock_trades = data.get('price:成交金額')
+# 三個資料集並行下載並對齊日期 / 欄位
+tables = fetch_datasets({
+    'close': 'price:收盤價',
+    'vol': 'price:成交股數',
+    'stock_trades': 'price:成交金額',
+}, start=datetime.now() - timedelta(days=14), universe='TSE_OTC', align=('close', 'vol', 'stock_trades'))
+close = tables['close']
+vol = tables['vol']/1000
+stock_trades = tables['stock_trades']
 
 CHANNELS = list(vol.columns)
 
@@ -62,16 +89,8 @@ limited_up = yesterday_limit_up_price==close
 YESTERDAY_CLOSE = close[vol.gt(500)|stock_trades.gt(3*10**8)].iloc[-1].dropna()
 TARGET_STOCKS = YESTERDAY_CLOSE.index
 
-cats_df = pd.read_csv('stock_category.csv')
-cats_df['代碼'] = cats_df['代碼'].astype(str)
-
-cats_df = cats_df.query('代碼 in @TARGET_STOCKS')
-
-mask = cats_df.groupby("細產業別")["代碼"].transform("nunique") > 2
-cats_df = cats_df[mask]
-
-selected_show = YESTERDAY_CLOSE.index
-STOCK_CATEGORIES = cats_df.query('代碼 in @selected_show')[['代碼','細產業別']].drop_duplicates().groupby(['代碼'])['細產業別'].agg(list).to_dict()
+# 只保留目標股票中至少 3 檔的族群
+STOCK_CATEGORIES = get_registry('stock_category.csv').stock_to_sectors(universe=TARGET_STOCKS, min_size=3)
 STOCK_CATEGORIES = defaultdict(lambda: [], STOCK_CATEGORIES)
 
 for s in limited_up[limited_up&(vol.gt(500)|stock_trades.gt(2*10**8))].iloc[-1].dropna().index:
@@ -113,97 +132,61 @@ def parse_time_str_varlen(t):
 # ==========================================
 # 2. 全域資料管理
 # ==========================================
-class DataStore:
-    def __init__(self):
-        self.lock = threading.Lock()
-        self.raw_data = {}
-        self.df_trend = pd.DataFrame()
-        self.df_treemap = pd.DataFrame()
-        self.last_update = datetime.now()
-
-    def update_raw(self, symbol, time_str, price, volume):
-        if symbol not in self.raw_data:
-            self.raw_data[symbol] = {
-                'history': [], 'latest': None, 'snapshot': {'volume': 0, 'price': 0}
-            }
-        
-        stock_data = self.raw_data[symbol]
-        stock_data['snapshot']['price'] = price
-        stock_data['snapshot']['volume'] += volume
-
-        latest = stock_data['latest']
-        if latest and latest['ts'] != time_str:
-            stock_data['history'].append(latest.copy())
-            if len(stock_data['history']) > 600: 
-                stock_data['history'] = stock_data['history'][-600:] 
-            latest = None
-
-        if latest is None:
-            stock_data['latest'] = {'ts': time_str, 'close': price}
-        else:
-            stock_data['latest']['close'] = price
-
-    def process_dataframes(self):
-        try:
-            current_data = list(self.raw_data.items())
-        except RuntimeError:
-            return
-
-        if not current_data: return
-
-        # 1. Treemap Data
-        tm_records = []
-        for stock, data in current_data:
-            snap = data.get('snapshot')
-            if not snap or snap['volume'] == 0: continue
-            
-            cat_list = STOCK_CATEGORIES.get(stock, []) 
-            
-            current_price = snap['price']
-            ref_price = YESTERDAY_CLOSE.get(stock, current_price)
-            pct = (current_price - ref_price) / ref_price * 100 if ref_price else 0
-            display_name = get_label(stock)
-
-            for cat in cat_list:
-                tm_records.append({
-                    'category2': cat, 'symbol': stock, 'display_name': display_name, 
-                    'pct': pct, 'volume': snap['volume']
-                })
-        
-        if tm_records:
-            new_df_treemap = pd.DataFrame(tm_records)
-        else:
-            new_df_treemap = pd.DataFrame(columns=['category2', 'symbol', 'display_name', 'pct', 'volume'])
-
-        # 2. Trend Data
-        trend_records = []
-        for stock, data in current_data:
-            rows = data['history'].copy()
-            if data['latest']: rows.append(data['latest'])
-            for row in rows:
-                trend_records.append({'time': row['ts'], 'stock': stock, 'close': row['close']})
-        
-        if trend_records:
-            df = pd.DataFrame(trend_records)
-            df = df.drop_duplicates(subset=['time', 'stock'], keep='last')
-            new_df_trend = df.pivot(index='time', columns='stock', values='close').sort_index()
-            if not new_df_trend.empty: 
-                new_df_trend = new_df_trend.ffill()
-        else:
-            new_df_trend = pd.DataFrame()
-
-        with self.lock:
-            self.df_treemap = new_df_treemap
-            self.df_trend = new_df_trend
-            self.last_update = datetime.now()
-
-store = DataStore()
+# 推播模式下走勢圖由瀏覽器端更新，伺服器端重繪不代表畫面延遲，不追蹤 rendered 階段
+latency = LatencyTracker(track_render=not PUSH_ENABLED)
+store = DataStore(STOCK_CATEGORIES, YESTERDAY_CLOSE, get_label, latency=latency)
+broadcaster = SnapshotBroadcaster(store)
+store.listeners.append(broadcaster.on_snapshot)
+
+# 盤中暫定評分：以最新價為暫定收盤價接續昨日的均線 / MACD (種子由 precompute_scores.py 寫出)
+SCORE_SEED_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', SCORE_SEED_FILE)
+score_seed = load_score_seed(SCORE_SEED_PATH)
+if score_seed is None:
+    print(f"⚠️ 找不到 {SCORE_SEED_PATH}，停用盤中暫定評分 (請先執行 precompute_scores.py)")
+    scorer = None
+else:
+    scorer = ProvisionalScorer(store.category_index.columns, score_seed, get_label)
+    store.scorer = scorer
+    if score_seed.attrs.get('seed_date', '') >= datetime.now().strftime('%Y-%m-%d'):
+        print(f"⚠️ 評分種子日期為 {score_seed.attrs.get('seed_date')}，已包含今日收盤，暫定評分僅供參考")
+
+# 熱門族群：昨日為止的族群 10 日基準價接續盤中價格
+sector_seed = load_score_seed(os.path.join(os.path.dirname(SCORE_SEED_PATH), SECTOR_SEED_FILE))
+if sector_seed is None:
+    sector_ranking = None
+else:
+    sector_ranking = LiveSectorRanking(store.category_index.columns, sector_seed)
+    store.sector_ranking = sector_ranking
+    if scorer is not None:
+        scorer.sector_ranking = sector_ranking
+
+# 量比：過去 N 日盤中累積成交量曲線 (precompute_volume_profile.py 產生)
+volume_profile = VolumeProfile.load(os.path.join(os.path.dirname(SCORE_SEED_PATH), VOLUME_PROFILE_FILE),
+                                    store.category_index.columns)
+if volume_profile is None:
+    print("⚠️ 找不到量比曲線，停用量比 (請先執行 precompute_volume_profile.py)")
+else:
+    store.volume_profile = volume_profile
+
+# 門檻提醒：data/alert_rules.json 的規則於每次快照 / 暫定評分發布時只檢查有變動的股票
+alert_rules = load_rules(os.path.join(os.path.dirname(SCORE_SEED_PATH), ALERT_RULES_FILE))
+if alert_rules:
+    alert_sinks = [LogSink(os.path.join(os.path.dirname(SCORE_SEED_PATH), ALERT_LOG_FILE))]
+    if os.environ.get('ALERT_WEBHOOK_URL'):
+        alert_sinks.append(WebhookSink(os.environ['ALERT_WEBHOOK_URL']))
+    if os.environ.get('ALERT_REDIS_STREAM'):
+        alert_sinks.append(RedisStreamSink(redis.Redis(host=REDIS_HOST, port=6379, db=0, socket_timeout=5),
+                                           os.environ['ALERT_REDIS_STREAM']))
+    alert_engine = AlertEngine(store.category_index.columns, alert_rules, alert_sinks)
+    alert_engine.attach(store, LIMITED_UP_PRICE.reindex(store.category_index.columns).to_numpy(dtype=float))
+    print(f"🔔 門檻提醒已啟用 ({len(alert_engine)} 條規則)")
 
 # ==========================================
 # 3. 資料處理與載入
 # ==========================================
 
-def process_line_data(line):
+def process_line_data(line, trace=True):
+    """解析一行行情；trace=True 時記錄交易所時間供延遲追蹤 (載入歷史 Log 時關閉)"""
     try:
         parts = [x.strip() for x in line.split(',')]
         if len(parts) < 6: return
@@ -219,7 +202,8 @@ def process_line_data(line):
         price = float(parts[4]) / 10000.0
         volume = int(parts[5])
         
-        store.update_raw(symbol, time_str, price, volume)
+        exchange_ts = exchange_time_to_epoch(parts[2]) if trace else None
+        store.update_raw(symbol, time_str, price, volume, exchange_ts)
     except Exception:
         pass
 
@@ -229,18 +213,25 @@ def preload_data_from_logs():
     count = 0
     target_stocks = all_stocks_list
     
+    # Log 依股票逐檔載入，時間不連續，載入完成後才發布暫定評分
+    if scorer is not None:
+        scorer.auto_publish = False
+
     for stock in target_stocks:
         file_path = os.path.join(LOG_DIR, f"{stock}.log")
         if os.path.exists(file_path):
             try:
                 with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
                     for line in f:
-                        process_line_data(line)
+                        process_line_data(line, trace=False)
                         count += 1
             except Exception as e:
                 print(f"Error reading {stock}.log: {e}")
                 
     store.process_dataframes()
+    if scorer is not None:
+        scorer.publish()
+        scorer.auto_publish = True
     print(f"✅ 歷史資料載入完成! 處理了 {count} 筆資料，耗時 {time.time()-start_time:.2f} 秒")
 
 # ==========================================
@@ -265,12 +256,16 @@ def redis_worker():
             continue
 
 def processing_worker():
+    # 有足夠新 tick 或等待超過上限才重建；行情閒置時不重建
     while True:
+        if not store.wait_for_changes(idle_timeout=60):
+            continue
+        started = time.monotonic()
         try:
             store.process_dataframes()
         except Exception as e:
             print(f"Processing Error: {e}")
-        time.sleep(2)
+        time.sleep(max(0, REBUILD_MIN_INTERVAL - (time.monotonic() - started)))
 
 # 啟動流程
 preload_data_from_logs()
@@ -283,6 +278,9 @@ t2.start()
 # 5. Dash App Layout
 # ==========================================
 app = Dash(__name__)
+# callback 延遲 / 回應大小 / 錯誤次數 (Prometheus 格式)
+register_metrics_endpoint(app.server)
+register_stream_endpoint(app.server, broadcaster, PUSH_PATH)
 
 # 自定義樣式：彈出視窗 (Modal)
 modal_style = {
@@ -297,6 +295,12 @@ modal_content_style = {
 
 app.layout = html.Div([
     dcc.Store(id='custom-groups-store', storage_type='local'), 
+    # 最新漲跌幅向量，長條圖 / 圓餅圖於瀏覽器端繪製
+    dcc.Store(id='latest-row-store'),
+    # 此分頁最後繪製的快照版本 (版本未變時輪詢直接跳過)
+    dcc.Store(id='rendered-version'),
+    # 此分頁最後顯示的暫定評分時間
+    dcc.Store(id='live-score-time'),
     
     # 🔥 Modal 改版
     html.Div(id='group-modal', style=modal_style, children=[
@@ -369,10 +373,16 @@ app.layout = html.Div([
                 options=[{'label': get_label(s), 'value': s} for s in all_stocks_list],
                 value=[], multi=True, placeholder="疊加比較...", style={'width': '200px'}
             )
-        ], style={'display': 'flex', 'alignItems': 'center'})
+        ], style={'display': 'flex', 'alignItems': 'center'}),
+
+        # tick 延遲 (交易所時間 → 入庫 / 快照 / 畫面)
+        html.Div(id='latency-display', style={'marginLeft': 'auto', 'fontSize': '12px', 'color': '#666', 'whiteSpace': 'nowrap'})
 
     ], style={'flex': '0 0 60px', 'display': 'flex', 'alignItems': 'center', 'padding': '10px', 'background': '#f8f9fa', 'borderBottom': '1px solid #ddd'}),
 
+    # 盤中暫定評分 (每分鐘更新)
+    html.Div(id='live-score-panel', style={'flex': '0 0 auto', 'padding': '4px 10px', 'fontSize': '13px', 'background': '#fffdf5', 'borderBottom': '1px solid #ddd', 'whiteSpace': 'nowrap', 'overflow': 'hidden', 'textOverflow': 'ellipsis'}),
+
     # Content
     html.Div([
         # Left
@@ -416,7 +426,10 @@ app.layout = html.Div([
 
     ], style={'flex': '1', 'display': 'flex', 'overflow': 'hidden'}),
 
-    dcc.Interval(id='interval-component', interval=2000, n_intervals=0)
+    dcc.Interval(id='interval-component', interval=PUSH_REFRESH_MS if PUSH_ENABLED else 2000, n_intervals=0),
+
+    # 推播模式：SSE 差異 -> live-snapshot -> clientside 更新走勢圖
+    *([EventSource(id='push-stream', url=PUSH_PATH), dcc.Store(id='live-snapshot')] if PUSH_ENABLED else [])
 
 ], style={'display': 'flex', 'flexDirection': 'column', 'height': '100vh', 'width': '100vw', 'margin': 0, 'fontFamily': 'Arial'})
 
@@ -530,6 +543,8 @@ def update_all_dropdowns(custom_data):
     modal_options = [] # Modal 裡的選單只要自訂的
     
     if custom_data:
+        # 預先建立自訂族群的欄位位置陣列
+        store.category_index.register_custom_groups(custom_data)
         for name in custom_data.keys():
             custom_options.append({'label': f"★ {name}", 'value': name})
             modal_options.append({'label': name, 'value': name})
@@ -576,38 +591,57 @@ def update_main_category(clickData, selector_value):
 @app.callback(
     [Output('main-graph', 'figure'),
      Output('live-treemap', 'figure'),
-     Output('pie-graph', 'figure'),
-     Output('bar-graph', 'figure')],
+     Output('latest-row-store', 'data'),
+     Output('latency-display', 'children'),
+     Output('interval-component', 'interval'),
+     Output('rendered-version', 'data')],
     [Input('interval-component', 'n_intervals'),
      Input('category-dropdown', 'value'),
      Input('focus-dropdown', 'value'),
      Input('treemap-scope', 'value'),
-     Input('custom-groups-store', 'data')]
+     Input('custom-groups-store', 'data')],
+    [State('interval-component', 'interval'),
+     State('rendered-version', 'data')]
 )
-def update_charts(n, selected_category, selected_focus, treemap_scope, custom_groups):
+@instrument_callback()
+def update_charts(n, selected_category, selected_focus, treemap_scope, custom_groups, current_interval, rendered_version):
     
     empty_fig = go.Figure(layout=dict(title="Waiting for data...", xaxis={'visible':False}, yaxis={'visible':False}))
 
-    with store.lock:
-        df_tree = store.df_treemap.copy()
-        df_trend = store.df_trend.copy()
-        
+    # 輪詢間隔跟著快照重建頻率調整 (爆量時加快、閒置時放慢)
+    poll_interval = store.suggested_poll_interval()
+    if PUSH_ENABLED or poll_interval == current_interval:
+        poll_interval = dash.no_update
+
+    # 取得一次唯讀快照並全程使用；輪詢觸發且版本未變時只更新輪詢間隔 (閒置時得以放慢)
+    snapshot = store.get_snapshot()
+    snapshot_version = snapshot['version']
+    if ctx.triggered_id == 'interval-component' and snapshot_version == rendered_version:
+        if poll_interval is dash.no_update:
+            raise PreventUpdate
+        return (dash.no_update,) * 4 + (poll_interval, dash.no_update)
+
+    df_tree = snapshot['df_treemap']
+    trend_values = snapshot['trend_values']
+    trend_times = list(snapshot['trend_times'])
+    has_data = snapshot['has_data']
+    ref_values = snapshot['ref_prices']
+    volumes = snapshot['volumes']
+    index = store.category_index
+
     custom_groups = custom_groups or {}
     
-    # 建立成交量查詢表
-    vol_map = {}
-    if not df_tree.empty:
-        vol_map = df_tree.drop_duplicates('symbol').set_index('symbol')['volume'].to_dict()
-
     # --- 判斷目前選的族群 ---
     is_custom = selected_category in custom_groups
     
     if is_custom:
         category_stocks = custom_groups[selected_category]
         filter_stocks = category_stocks
+        category_pos = index.group_positions(selected_category, category_stocks)
     else:
         category_stocks = CATEGORY_TO_STOCKS.get(selected_category, [])
         filter_stocks = None 
+        category_pos = index.positions(selected_category)
 
     # 1. Treemap (保持不變)
     if df_tree.empty:
@@ -626,6 +660,11 @@ def update_charts(n, selected_category, selected_focus, treemap_scope, custom_gr
         if df_tree_filtered.empty:
             fig_tree = empty_fig
         else:
+            # 爆量 (量比 >= VOLUME_SPIKE_RATIO) 的股票於名稱後加上標記
+            spike = df_tree_filtered['vol_ratio'] >= VOLUME_SPIKE_RATIO
+            if spike.any():
+                df_tree_filtered = df_tree_filtered.assign(
+                    display_name=df_tree_filtered['display_name'].where(~spike, df_tree_filtered['display_name'] + ' 🔥'))
             try:
                 path = ['symbol', 'display_name'] if is_custom and treemap_scope == 'focus' else ['category2', 'display_name']
                 fig_tree = px.treemap(
@@ -633,13 +672,14 @@ def update_charts(n, selected_category, selected_focus, treemap_scope, custom_gr
                     path=path, 
                     values='volume',              
                     color='pct', color_continuous_scale='RdYlGn_r', range_color=[-5, 5],
-                    custom_data=['pct']
+                    custom_data=['pct', 'vol_ratio']
                 )
                 colors = [(0, "green"), (0.5, "white"), (1, "red")]
                 fig_tree.update_layout(coloraxis_colorscale=colors, margin=dict(t=0, l=0, r=0, b=0), uirevision='constant')
                 fig_tree.update_traces(
                     texttemplate="%{label}<br>%{customdata[0]:.2f}%",
-                    hovertemplate='<b>%{label}</b><br>Change: %{customdata[0]:.2f}%<br>Vol: %{value}',
+                    hovertemplate='<b>%{label}</b><br>Change: %{customdata[0]:.2f}%<br>Vol: %{value}'
+                                  + ('<br>量比: %{customdata[1]:.2f}' if volume_profile is not None else ''),
                     textposition="middle center", textfont=dict(size=14, color='black')
                 )
             except Exception as e:
@@ -647,31 +687,30 @@ def update_charts(n, selected_category, selected_focus, treemap_scope, custom_gr
 
     # 2. Trend Chart
     user_picks = selected_focus if selected_focus else []
-    target_stocks = list(set(category_stocks + user_picks))
-    target_stocks = [s for s in target_stocks if s in df_trend.columns]
-
-    if df_trend.empty or not target_stocks:
-        return empty_fig, fig_tree, empty_fig, empty_fig
-
-    df_filtered = df_trend[target_stocks]
-    
-    prev_closes = []
-    for s in target_stocks:
-        p = YESTERDAY_CLOSE.get(s)
-        if pd.isna(p) or p == 0:
-             valid_prices = df_filtered[s].dropna()
-             p = valid_prices.iloc[0] if not valid_prices.empty else 100
-        prev_closes.append(p)
-    
-    df_pct = ((df_filtered - pd.Series(prev_closes, index=target_stocks)) / pd.Series(prev_closes, index=target_stocks)) * 100
-    df_pct.sort_index(inplace=True)
+    # 族群與疊加股票的欄位位置，只保留有走勢資料的欄位
+    target_pos = np.union1d(category_pos, index.positions_of(user_picks))
+    target_pos = target_pos[has_data[target_pos]]
+
+    if not trend_times or not len(target_pos):
+        return empty_fig, fig_tree, None, latency.format_summary(), poll_interval, snapshot_version
+
+    target_stocks = index.columns[target_pos].tolist()
+    refs = ref_values[target_pos]
+    values = trend_values[:, target_pos]
+    df_filtered = pd.DataFrame(values, index=trend_times, columns=target_stocks)
+    df_pct = pd.DataFrame((values - refs) / refs * 100, index=trend_times, columns=target_stocks)
+    # 推播模式下瀏覽器端依昨收換算漲跌幅 (trace meta)
+    ref_prices = dict(zip(target_stocks, refs.tolist()))
+    vol_map = dict(zip(target_stocks, volumes[target_pos].tolist()))
 
     # 計算平均線
-    valid_cat_stocks = [s for s in category_stocks if s in df_pct.columns]
+    in_category = np.isin(target_pos, category_pos)
+    valid_cat_stocks = index.columns[target_pos[in_category]].tolist()
     if valid_cat_stocks:
-        avg_series = df_pct[valid_cat_stocks].mean(axis=1)
+        avg_series = df_pct.iloc[:, in_category].mean(axis=1)
     else:
         avg_series = df_pct.mean(axis=1)
+    avg_refs = {s: ref_prices[s] for s in (valid_cat_stocks or target_stocks)}
 
     avg_col_name = f'{selected_category} Avg'
     df_pct[avg_col_name] = avg_series
@@ -748,14 +787,16 @@ def update_charts(n, selected_category, selected_focus, treemap_scope, custom_gr
         if col == avg_col_name:
             val = df_pct[col].iloc[-1]
             fig_main.add_trace(go.Scatter(
-                x=df_pct.index, y=df_pct[col], mode='lines', 
+                x=list(df_pct.index), y=df_pct[col].tolist(), mode='lines', 
                 name=avg_col_name, line=dict(width=4, color='black'),
-                hoverinfo='all', hovertemplate=f'{avg_col_name}: %{{y:.2f}}%'
+                hoverinfo='all', hovertemplate=f'{avg_col_name}: %{{y:.2f}}%',
+                meta={'kind': 'avg_line', 'refs': avg_refs}
             ))
             fig_main.add_trace(go.Scatter(
                 x=[last_time], y=[val],
                 mode='markers', marker=dict(color='black', size=8),
-                showlegend=False, hoverinfo='skip'
+                showlegend=False, hoverinfo='skip',
+                meta={'kind': 'avg_marker', 'refs': avg_refs}
             ))
             labels_to_plot.append({'val': val, 'text': f"Avg {val:.2f}%", 'color': 'black'})
             continue
@@ -800,11 +841,12 @@ def update_charts(n, selected_category, selected_focus, treemap_scope, custom_gr
 
         if not is_limit_up and not is_limit_down:
             fig_main.add_trace(go.Scatter(
-                x=df_pct.index, y=df_pct[col], mode='lines', 
+                x=list(df_pct.index), y=df_pct[col].tolist(), mode='lines', 
                 name=label_name, 
                 line=dict(width=width, color=color), opacity=opacity,
                 showlegend=show, hovertemplate=f'{label_name}: %{{y:.2f}}%',
-                hoverinfo=hover_info
+                hoverinfo=hover_info,
+                meta={'kind': 'line', 'symbol': col, 'ref': ref_prices[col]}
             ))
 
         is_limit = is_limit_up or is_limit_down
@@ -820,7 +862,8 @@ def update_charts(n, selected_category, selected_focus, treemap_scope, custom_gr
             name=label_name if is_limit else None, 
             showlegend=(is_limit), 
             hoverinfo='skip' if not is_limit else 'all', 
-            hovertemplate=hover_template if is_limit else None
+            hovertemplate=hover_template if is_limit else None,
+            meta={'kind': 'marker', 'symbol': col, 'ref': ref_prices[col]}
         ))
         
         if is_highlighted or is_limit:
@@ -900,44 +943,91 @@ def update_charts(n, selected_category, selected_focus, treemap_scope, custom_gr
     )
 
     stats_row = df_pct.drop(columns=[avg_col_name], errors='ignore').iloc[-1]
-    up_count = (stats_row > 0).sum()
-    down_count = (stats_row < 0).sum()
-    flat_count = (stats_row == 0).sum()
-
-    fig_pie = go.Figure(data=[go.Pie(
-        labels=['Up', 'Down', 'Flat'], values=[up_count, down_count, flat_count],
-        hole=.5, marker=dict(colors=['#d62728', '#2ca02c', 'gray']),
-        textinfo='label+value', hoverinfo='label+percent'
-    )])
-    fig_pie.update_layout(title="Market Breadth", margin=dict(l=10, r=10, t=40, b=10), showlegend=False, uirevision='constant')
-
-    sorted_asc_bar = stats_row.sort_values(ascending=True)
-    bar_colors = ['#d62728' if v > 0 else '#2ca02c' for v in sorted_asc_bar.values]
-    num_stocks = len(sorted_asc_bar)
-    dynamic_height = max(300, 80 + num_stocks * 30)
-
-    y_labels = [get_label(s) for s in sorted_asc_bar.index]
-
-    fig_bar = go.Figure(go.Bar(
-        x=sorted_asc_bar.values, 
-        y=y_labels, 
-        orientation='h',
-        marker=dict(color=bar_colors),
-        text=[f"{v:.2f}%" for v in sorted_asc_bar.values], textposition='auto'
-    ))
-
-    fig_bar.update_layout(
-        title="Rankings",
-        margin=dict(l=100, r=40, t=40, b=20),
-        xaxis=dict(range=[-10, 10], zeroline=True, side='top'),
-        yaxis=dict(type='category', dtick=1),
-        template='plotly_white', uirevision='constant',
-        height=dynamic_height, autosize=False
-    )
+    stats_pos = index.positions_of(stats_row.index)
+    volume_ratio = snapshot['volume_ratio']
+    volume_spike = snapshot['volume_spike']
+    latest_row = {
+        'symbols': list(stats_row.index),
+        'labels': [get_label(s) for s in stats_row.index],
+        'refs': [ref_prices[s] for s in stats_row.index],
+        'pct': [None if pd.isna(v) else round(float(v), 3) for v in stats_row.values],
+        # 量比與爆量標記 (未載入量比曲線時為 None / False)
+        'vol_ratio': [None if pd.isna(r) else round(float(r), 2) for r in volume_ratio[stats_pos]],
+        'spike': volume_spike[stats_pos].tolist(),
+    }
+
+    latency.on_render(snapshot_version)
+    return fig_main, fig_tree, latest_row, latency.format_summary(), poll_interval, snapshot_version
+
+# --- 盤中暫定評分：只在新的一分鐘發布後更新 ---
+LIVE_SCORE_NAMES = 8
 
-    return fig_main, fig_tree, fig_pie, fig_bar
+@app.callback(
+    [Output('live-score-panel', 'children'),
+     Output('live-score-time', 'data')],
+    Input('interval-component', 'n_intervals'),
+    State('live-score-time', 'data')
+)
+@instrument_callback()
+def update_live_scores(n, rendered_key):
+    if scorer is None:
+        if rendered_key == 'disabled':
+            raise PreventUpdate
+        return "盤中暫定評分: 未找到評分種子 (請先執行 precompute_scores.py)", 'disabled'
+
+    published = scorer.published
+    hot = store.get_snapshot()['sector_returns'].head(HOT_SECTOR_COUNT)
+    hot_text = ', '.join(f"{sector} {ret:+.1f}%" for sector, ret in hot.items())
+    # 評分每分鐘發布，熱門族群每次快照更新；兩者都沒變時跳過
+    key = f"{published['time'] if published else ''}|{hot_text}"
+    if published is None or key == rendered_key:
+        raise PreventUpdate
+
+    df = scorer.to_frame(published)
+    new_ma = df[df['新進'].str.contains('均線')]
+    new_macd = df[df['新進'].str.contains('MACD')]
+
+    def names(rows):
+        shown = ', '.join(f"{name}({score})" for name, score in zip(rows['名稱'].head(LIVE_SCORE_NAMES), rows['暫定總分']))
+        more = f" 等 {len(rows)} 檔" if len(rows) > LIVE_SCORE_NAMES else ""
+        return (shown + more) if shown else "無"
+
+    return [
+        html.B(f"盤中暫定評分 {published['time'] or ''}", style={'marginRight': '10px'}),
+        html.Span(f"(延續 {published['seed_date']}，最新價視為收盤)", style={'color': '#888', 'marginRight': '15px'}),
+        html.Span(f"≥60分 {int((df['暫定總分'] >= 60).sum())} 檔", style={'marginRight': '15px', 'fontWeight': 'bold'}),
+        html.Span(f"🔥 熱門族群(10日): {hot_text or '計算中'}", style={'color': '#ff7f0e', 'marginRight': '15px'}),
+        html.Span(f"🆕 均線多排: {names(new_ma)}", style={'color': '#d62728', 'marginRight': '15px'}),
+        html.Span(f"🆕 MACD強勢: {names(new_macd)}", style={'color': '#007bff'}),
+    ], key
+
+# --- 長條圖 / 圓餅圖：瀏覽器端依最新漲跌幅向量繪製 (assets/realtime_clientside.js) ---
+app.clientside_callback(
+    ClientsideFunction(namespace='realtime', function_name='render_breadth'),
+    Output('bar-graph', 'figure'),
+    Output('pie-graph', 'figure'),
+    Input('latest-row-store', 'data'),
+    *([Input('live-snapshot', 'data')] if PUSH_ENABLED else []),
+)
+
+# --- 推播模式：瀏覽器端合併 SSE 差異並更新走勢圖 ---
+if PUSH_ENABLED:
+    app.clientside_callback(
+        ClientsideFunction(namespace='realtime', function_name='apply_push'),
+        Output('live-snapshot', 'data'),
+        Input('push-stream', 'message'),
+        State('live-snapshot', 'data'),
+    )
+    app.clientside_callback(
+        ClientsideFunction(namespace='realtime', function_name='patch_main_graph'),
+        Output('main-graph', 'figure', allow_duplicate=True),
+        Input('live-snapshot', 'data'),
+        State('main-graph', 'figure'),
+        prevent_initial_call=True,
+    )
 
 if __name__ == '__main__':
     print("🚀 戰情室啟動 (本機): http://127.0.0.1:8050/")
     print("📡 內網連線 (給同事): http://192.168.188.112:8050/")
+    print(f"🔄 更新模式: {'SSE 推播' if PUSH_ENABLED else '輪詢 (安裝 dash-extensions 可啟用推播)'}")
     app.run(host='0.0.0.0', port=8050, debug=True)
\ No newline at end of file
@@ -11,6 +11,9 @@ import sys
 
 from finlab import data, login
 
+from modules.data_fetcher import MARKET_DATASETS, fetch_datasets
+from modules.industry_registry import get_registry
+
 # Finlab 登入
 import os
 from pathlib import Path
@@ -54,38 +57,31 @@ def get_score(target_date: str = None):
         DataFrame: 評分結果
     """
 
-    # 先載入資料來找最新交易日
+    # 價格 / 營收資料集並行抓取 (往前抓 120 天確保有足夠資料計算 MA60)
     if target_date is None:
-        # 設定資料起始日 (往前抓 120 天)
-        start_date = (datetime.now() - timedelta(days=120)).strftime('%Y-%m-%d')
-        data.truncate_start = start_date
-
+        # 未指定日期時以最新交易日為目標，同一份資料直接使用
         print("\n[INFO] 載入資料中 (尋找最新交易日)...")
-        close_temp = data.get('price:收盤價')
-        target_date = close_temp.index[-1].strftime('%Y-%m-%d')
+        tables = fetch_datasets(MARKET_DATASETS, start=datetime.now() - timedelta(days=120),
+                                align=('close', 'trade_value'))
+        target_date = tables['close'].index[-1].strftime('%Y-%m-%d')
         print(f"[DATE] 自動選取最新交易日: {target_date}")
+        target_dt = pd.to_datetime(target_date)
+    else:
+        print("[INFO] 載入資料中...")
+        target_dt = pd.to_datetime(target_date)
+        tables = fetch_datasets(MARKET_DATASETS, start=target_dt - timedelta(days=120),
+                                align=('close', 'trade_value'))
 
     print(f"\n{'='*60}")
     print(f"  選股評分系統 - 目標日期: {target_date}")
     print(f"{'='*60}\n")
 
-    # 設定資料起始日 (往前抓 120 天確保有足夠資料計算 MA60)
-    target_dt = pd.to_datetime(target_date)
-    start_date = (target_dt - timedelta(days=120)).strftime('%Y-%m-%d')
-    data.truncate_start = start_date
-
-    print("[INFO] 載入資料中...")
-
-    # 取得價格資料
-    close = data.get('price:收盤價')
-    trade_value = data.get('price:成交金額')  # 成交金額
-
-    # 取得營收資料
-    revenue_yoy = data.get('monthly_revenue:去年同月增減(%)')
+    close = tables['close']
+    trade_value = tables['trade_value']  # 成交金額
+    revenue_yoy = tables['revenue_yoy']
 
     # 讀取產業分類
-    industry_df = pd.read_csv(INDUSTRY_CSV)
-    industry_df['代碼'] = industry_df['代碼'].astype(str)
+    registry = get_registry(INDUSTRY_CSV)
 
     # 確認目標日期存在於資料中
     if target_date not in close.index.strftime('%Y-%m-%d').tolist():
@@ -169,13 +165,7 @@ def get_score(target_date: str = None):
     sector_returns = {}
     sector_stocks = {}
 
-    for sector in industry_df['細產業別'].unique():
-        stocks_in_sector = industry_df[industry_df['細產業別'] == sector]['代碼'].tolist()
-        stocks_in_sector = [s for s in stocks_in_sector if s in close.columns]
-
-        if len(stocks_in_sector) < 2:
-            continue
-
+    for sector, stocks_in_sector in registry.sector_stocks(universe=close.columns, min_size=2).items():
         # 計算族群平均股價
         avg_price_today = close_today[stocks_in_sector].mean()
         avg_price_10d = close_10d_ago[stocks_in_sector].mean()
@@ -240,7 +230,7 @@ def get_score(target_date: str = None):
         if stock in hot_sector_stocks:
             score += 10
             # 找出該股票所屬的熱門族群
-            stock_sectors = industry_df[industry_df['代碼'] == stock]['細產業別'].tolist()
+            stock_sectors = registry.sectors_of(stock)
             hot_sectors = [s for s in stock_sectors if s in top5_sector_names]
             details.append(f"熱門族群(+10):{','.join(hot_sectors)}")
 